@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from functools import partial
 from typing import Iterator, Optional
 
 from fastapi import FastAPI
@@ -7,6 +8,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
 
 from .gino import Gino, GinoEngine
+from .pool import ReaderPool, parse_hosts
 from .settings.globals import GLOBALS
 
 READ_ENGINE: Optional[GinoEngine] = None
@@ -25,10 +27,16 @@ db = Gino(
     user=GLOBALS.database_config.username,
     password=GLOBALS.database_config.password,
     database=GLOBALS.database_config.database,
-    pool_min_size=5,
-    pool_max_size=10,
+    pool_min_size=GLOBALS.db_pool_min_size,
+    pool_max_size=GLOBALS.db_pool_max_size,
     kwargs=dict(
-        server_settings=dict(statement_timeout=f"{GLOBALS.sql_request_timeout}")
+        server_settings=dict(statement_timeout=f"{GLOBALS.sql_request_timeout}"),
+        max_inactive_connection_lifetime=GLOBALS.db_pool_max_idle_time,
+        pool_class=partial(
+            ReaderPool,
+            replicas=parse_hosts(GLOBALS.reader_replica_hosts),
+            health_check_interval=GLOBALS.db_health_check_interval,
+        ),
     ),
 )
 
@@ -0,0 +1,84 @@
+"""Caches for dynamically rendered tiles.
+
+Responses of dynamic vector and raster tile routes are cached by the
+canonical tile path and normalised query parameters. Entries expire
+according to the `Cache-Control` header computed by the route. Each
+worker keeps an in-process LRU cache. Optionally, a shared cache backend
+lets all workers reuse tiles rendered by any of them.
+"""
+
+import re
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+from ..settings.globals import GLOBALS
+from .backends import create_backend
+from .lru import CachedResponse, LRUTileCache
+from .shared import SharedTileCache
+
+DYNAMIC_TILE_REGEX = re.compile(
+    r"^/(?P<dataset>[^/]+)/(?P<version>[^/]+)/dynamic/(?P<z>\d+)/(?P<x>\d+)/(?P<y>[^/]+)\.(?P<ext>pbf|png)$"
+)
+MAX_AGE_REGEX = re.compile(r"max-age=(\d+)")
+Y_REGEX = re.compile(r"^(?P<y>\d+)(?P<scale>.*)$")
+
+# Neighbour tiles rendered along with the requested tile, by x, y, z.
+# Set by the tile cache middleware, which caches them after the request.
+neighbour_tiles: ContextVar[Optional[Dict[Tuple[int, int, int], bytes]]] = ContextVar(
+    "neighbour_tiles", default=None
+)
+
+tile_cache = LRUTileCache(
+    max_bytes=GLOBALS.tile_cache_size, max_item_bytes=GLOBALS.tile_cache_max_item_size
+)
+
+_backend = create_backend(GLOBALS.tile_cache_backend, GLOBALS.tile_cache_backend_url)
+shared_tile_cache: Optional[SharedTileCache] = (
+    SharedTileCache(_backend, GLOBALS.tile_cache_compression_level)
+    if _backend is not None
+    else None
+)
+
+
+def is_dynamic_tile(path: str) -> bool:
+    return DYNAMIC_TILE_REGEX.match(path) is not None
+
+
+def neighbour_tile_path(path: str, x: int, y: int, z: int) -> Optional[str]:
+    """Path of another tile of the same dataset, zoom and scale."""
+    match = DYNAMIC_TILE_REGEX.match(path)
+    if match is None:
+        return None
+    y_match = Y_REGEX.match(match.group("y"))
+    if y_match is None or int(match.group("z")) != z:
+        return None
+    dataset, version, ext = match.group("dataset", "version", "ext")
+    scale = y_match.group("scale")
+    return f"/{dataset}/{version}/dynamic/{z}/{x}/{y}{scale}.{ext}"
+
+
+def tile_cache_key(path: str, query_params: Iterable[Tuple[str, str]]) -> str:
+    """Build cache key from tile path and normalised query parameters.
+
+    Empty parameters are removed and remaining ones sorted, so that
+    equivalent requests share the same key.
+    """
+    params = sorted((key, value) for key, value in query_params if value != "")
+    query = "&".join(f"{key}={value}" for key, value in params)
+    return f"{path}?{query}"
+
+
+def max_age(cache_control: Optional[str]) -> int:
+    """Get max age in seconds from Cache-Control header value."""
+    if not cache_control or "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+
+    match = MAX_AGE_REGEX.search(cache_control)
+    return int(match.group(1)) if match else 0
+
+
+async def store_tile(key: str, cached: CachedResponse, ttl: float) -> None:
+    """Put tile into the in-process and the shared tile cache."""
+    tile_cache.set(key, cached, ttl)
+    if shared_tile_cache is not None:
+        await shared_tile_cache.set(key, cached, ttl)
@@ -0,0 +1,201 @@
+"""Storage backends for the shared tile cache.
+
+All backends store opaque bytes with a per entry TTL. The in-memory
+backend is a local stand-in which does not share entries across
+processes and is meant for development and tests.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+import asyncpg
+from fastapi.logger import logger
+
+
+class TileCacheBackend(ABC):
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def purge(self, prefix: str = "") -> int:
+        """Remove all entries with keys starting with prefix.
+
+        Returns number of removed entries.
+        """
+        ...
+
+
+class InMemoryBackend(TileCacheBackend):
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[bytes, float]] = dict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def purge(self, prefix: str = "") -> int:
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+
+class RedisBackend(TileCacheBackend):
+    """Backend for Redis or any server speaking the Redis protocol."""
+
+    def __init__(self, url: str, namespace: str = "tile_cache:") -> None:
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("Redis tile cache backend requires package `redis`.")
+
+        self.namespace = namespace
+        self._client = aioredis.from_url(url)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(self.namespace + key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._client.set(self.namespace + key, value, ex=max(int(ttl), 1))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self.namespace + key)
+
+    async def purge(self, prefix: str = "") -> int:
+        count = 0
+        async for key in self._client.scan_iter(match=f"{self.namespace}{prefix}*"):
+            count += await self._client.delete(key)
+        return count
+
+
+class PostgresBackend(TileCacheBackend):
+    """Backend storing entries in an UNLOGGED PostgreSQL table.
+
+    Unlogged tables skip the write ahead log, which makes writes cheap.
+    Content is lost after a database crash, which is fine for a cache.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        table: str = "tile_cache",
+        min_size: int = 1,
+        max_size: int = 5,
+        cleanup_interval: int = 1000,
+    ) -> None:
+        self.dsn = dsn
+        self.table = table
+        self.min_size = min_size
+        self.max_size = max_size
+        self.cleanup_interval = cleanup_interval
+
+        self._pool: Optional[asyncpg.Pool] = None
+        self._writes = 0
+
+    async def connect(self) -> None:
+        self._pool = await asyncpg.create_pool(
+            self.dsn, min_size=self.min_size, max_size=self.max_size
+        )
+        await self._pool.execute(
+            f"""CREATE UNLOGGED TABLE IF NOT EXISTS {self.table} (
+                    key text PRIMARY KEY,
+                    value bytea NOT NULL,
+                    expires_at timestamptz NOT NULL
+                )"""
+        )
+        await self._delete_expired()
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @property
+    def pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            raise RuntimeError("Postgres tile cache backend is not connected.")
+        return self._pool
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.pool.fetchval(
+            f"SELECT value FROM {self.table} WHERE key = $1 AND expires_at > now()",
+            key,
+        )
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.pool.execute(
+            f"""INSERT INTO {self.table} (key, value, expires_at)
+                VALUES ($1, $2, now() + make_interval(secs => $3))
+                ON CONFLICT (key) DO UPDATE
+                SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at""",
+            key,
+            value,
+            float(ttl),
+        )
+
+        self._writes += 1
+        if self._writes % self.cleanup_interval == 0:
+            await self._delete_expired()
+
+    async def delete(self, key: str) -> None:
+        await self.pool.execute(f"DELETE FROM {self.table} WHERE key = $1", key)
+
+    async def purge(self, prefix: str = "") -> int:
+        result = await self.pool.execute(
+            f"DELETE FROM {self.table} WHERE starts_with(key, $1)", prefix
+        )
+        return int(result.split()[-1])
+
+    async def _delete_expired(self) -> None:
+        result = await self.pool.execute(
+            f"DELETE FROM {self.table} WHERE expires_at <= now()"
+        )
+        logger.debug(f"Removed expired tiles from shared tile cache: {result}")
+
+
+def create_backend(
+    name: Optional[str], url: Optional[str]
+) -> Optional[TileCacheBackend]:
+    if not name:
+        return None
+    elif name == "memory":
+        return InMemoryBackend()
+    elif name in ("redis", "postgres") and not url:
+        raise RuntimeError(f"Tile cache backend `{name}` requires a backend URL.")
+    elif name == "redis":
+        return RedisBackend(url)  # type: ignore
+    elif name == "postgres":
+        return PostgresBackend(url)  # type: ignore
+    raise RuntimeError(f"Unknown tile cache backend `{name}`.")
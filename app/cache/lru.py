@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from ..utils.metrics import metrics
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    # Body compressed once per content encoding
+    encoded: Mapping[str, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+
+class _Entry(NamedTuple):
+    value: CachedResponse
+    size: int
+    expires_at: float
+
+
+class LRUTileCache:
+    """Byte-budgeted least recently used cache with per entry TTL.
+
+    Entries are evicted when they expire or when the total size of all
+    cached response bodies, including compressed variants, exceeds the
+    budget.
+    """
+
+    def __init__(
+        self, max_bytes: int, max_item_bytes: int, name: str = "tile_cache"
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.name = name
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, record=False) is not None
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def get(self, key: str, record: bool = True) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+
+        if record:
+            if entry is None:
+                self._misses += 1
+                metrics.increment(f"{self.name}.misses")
+            else:
+                self._hits += 1
+                metrics.increment(f"{self.name}.hits")
+            metrics.gauge(f"{self.name}.hit_rate", self.hit_rate)
+
+        if entry is None:
+            return None
+
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: CachedResponse, ttl: float) -> bool:
+        size = value.size + len(key)
+        if ttl <= 0 or size > self.max_item_bytes or size > self.max_bytes:
+            return False
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = _Entry(value, size, time.monotonic() + ttl)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            metrics.increment(f"{self.name}.evictions")
+
+        self._update_gauges()
+        return True
+
+    def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+            self._update_gauges()
+
+    def purge(self, prefix: str = "") -> int:
+        """Remove all entries with keys starting with prefix.
+
+        Returns number of removed entries.
+        """
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        self._update_gauges()
+        return len(keys)
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self._hits + self._misses
+        return self._hits / requests if requests else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _update_gauges(self) -> None:
+        metrics.gauge(f"{self.name}.entries", len(self._entries))
+        metrics.gauge(f"{self.name}.bytes", self._bytes)
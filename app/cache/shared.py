@@ -0,0 +1,125 @@
+import struct
+import time
+import zlib
+from typing import Optional, Tuple
+
+import orjson
+from fastapi.logger import logger
+
+from ..utils.metrics import metrics
+from .backends import TileCacheBackend
+from .lru import CachedResponse
+
+RAW = b"r"
+ZLIB = b"z"
+
+
+class SharedTileCache:
+    """Tile cache shared by all workers, backed by a pluggable backend.
+
+    Responses are serialized together with their expiry time and
+    compressed if that reduces their size. Backend errors are logged and
+    treated as cache misses so that the shared cache can never fail a
+    request.
+    """
+
+    def __init__(
+        self,
+        backend: TileCacheBackend,
+        compression_level: int = 6,
+        name: str = "shared_tile_cache",
+    ) -> None:
+        self.backend = backend
+        self.compression_level = compression_level
+        self.name = name
+
+    def init_app(self, app) -> None:
+        @app.on_event("startup")
+        async def startup():
+            await self.backend.connect()
+
+        @app.on_event("shutdown")
+        async def shutdown():
+            await self.backend.close()
+
+    async def get(self, key: str) -> Optional[Tuple[CachedResponse, float]]:
+        """Get cached response and its remaining TTL in seconds."""
+        try:
+            with metrics.timer(f"{self.name}.get"):
+                data = await self.backend.get(key)
+        except Exception as e:
+            metrics.increment(f"{self.name}.errors")
+            logger.error(f"Could not read {key} from shared tile cache: {e}")
+            return None
+
+        if data is None:
+            metrics.increment(f"{self.name}.misses")
+            return None
+
+        response, expires_at = loads(data)
+        ttl = expires_at - time.time()
+        if ttl <= 0:
+            metrics.increment(f"{self.name}.misses")
+            return None
+
+        metrics.increment(f"{self.name}.hits")
+        return response, ttl
+
+    async def set(self, key: str, response: CachedResponse, ttl: float) -> None:
+        if ttl <= 0:
+            return
+
+        data = dumps(response, time.time() + ttl, self.compression_level)
+        try:
+            with metrics.timer(f"{self.name}.set"):
+                await self.backend.set(key, data, int(ttl))
+        except Exception as e:
+            metrics.increment(f"{self.name}.errors")
+            logger.error(f"Could not write {key} to shared tile cache: {e}")
+
+    async def purge(self, prefix: str = "") -> int:
+        return await self.backend.purge(prefix)
+
+
+def dumps(response: CachedResponse, expires_at: float, compression_level: int) -> bytes:
+    encodings = list(response.encoded.items())
+    meta = orjson.dumps(
+        {
+            "status_code": response.status_code,
+            "headers": response.headers,
+            "expires_at": expires_at,
+            "encodings": [[name, len(data)] for name, data in encodings],
+        }
+    )
+    payload = b"".join(
+        [struct.pack("!I", len(meta)), meta, response.body]
+        + [data for _, data in encodings]
+    )
+
+    # Pre-compressed variants don't compress any further
+    if compression_level and not encodings:
+        compressed = zlib.compress(payload, compression_level)
+        if len(compressed) < len(payload):
+            return ZLIB + compressed
+    return RAW + payload
+
+
+def loads(data: bytes) -> Tuple[CachedResponse, float]:
+    payload = zlib.decompress(data[1:]) if data[:1] == ZLIB else data[1:]
+
+    (meta_size,) = struct.unpack("!I", payload[:4])
+    meta = orjson.loads(payload[4 : 4 + meta_size])
+
+    # Compressed variants are appended after the body
+    end = len(payload)
+    encoded = dict()
+    for name, size in reversed(meta.get("encodings", [])):
+        encoded[name] = payload[end - size : end]
+        end -= size
+    body = payload[4 + meta_size : end]
+
+    headers = [(name, value) for name, value in meta["headers"]]
+    return (
+        CachedResponse(meta["status_code"], headers, body, encoded),
+        meta["expires_at"],
+    )
@@ -1,12 +1,119 @@
-from typing import List
+import asyncio
+import re
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
 
+from async_lru import alru_cache
+from cachetools import LRUCache
 from fastapi.logger import logger
-from sqlalchemy.sql import Select
-from sqlalchemy.sql.elements import ColumnClause, TextClause
+from gino.dialects.asyncpg import AsyncpgDialect
+from sqlalchemy.sql import ClauseElement, Select
+from sqlalchemy.sql.elements import ColumnClause, Label, TextClause
 
 from ....application import db
+from ....cache import neighbour_tiles
 from ....models.types import Bounds
 from ....responses import VectorTileResponse
+from ....settings.globals import GLOBALS
+from ....utils.batching import MicroBatcher
+from ....utils.metrics import metrics
+from .admission import get_lane
+from .coverage import tile_xyz
+from .metatiles import (
+    Metatile,
+    Tile,
+    get_metatile,
+    metatile_bounds,
+    metatile_tiles,
+    tile_bounds,
+)
+from .overviews import Overview, get_source_table, tile_zoom
+
+# Parameters which differ between tiles of a batch, read from the tile
+# list instead
+TILE_PARAMS = ("left", "bottom", "right", "top", "margin")
+
+# Filter parameters which may differ between tiles of a batch as well,
+# by SQL type. Tiles clipped to a geostore each filter by the part of
+# the geostore which overlaps with the tile.
+TILE_FILTER_PARAMS: Dict[str, str] = {"geometry": "bytea"}
+PLACEHOLDER_REGEX = re.compile(r"\$(\d+)\b")
+
+# Name of the CTE which holds features of a metatile
+METATILE_TABLE = "metatile"
+
+# Same dialect and parameter style Gino uses to compile queries for asyncpg
+DIALECT = AsyncpgDialect(paramstyle="numeric")
+
+
+class MvtOptions(NamedTuple):
+    """Options for rendering features of a dataset into vector tiles.
+
+    `buffer` is the width of the area around the tile, in tile
+    coordinate units, from which features are included. Geometries are
+    cut at the buffered tile boundary if `clip` is set. If `exact` is
+    not set, features are selected by bounding box only, which saves the
+    costly intersection test for large polygons.
+
+    Lines and polygons can be generalised to tile resolution before
+    encoding. `simplify` is the simplification tolerance, `min_size` the
+    minimum width or height of features, both in tile coordinate units,
+    so that they scale with zoom level. `snap` snaps vertices to the
+    tile grid.
+
+    `overviews` lists zoom bands for which generalised overview tables
+    can be built, see `overviews` module. In zoom bands listed in
+    `metatiles`, blocks of neighbouring tiles are rendered together, see
+    `metatiles` module.
+    """
+
+    buffer: int = 0
+    clip: bool = False
+    exact: bool = True
+    simplify: float = 0
+    snap: bool = False
+    min_size: float = 0
+    overviews: Tuple[Overview, ...] = ()
+    metatiles: Tuple[Metatile, ...] = ()
+
+
+MVT_OPTIONS: Dict[str, MvtOptions] = {
+    "umd_modis_burned_areas": MvtOptions(
+        buffer=64,
+        clip=True,
+        simplify=0.5,
+        snap=True,
+        min_size=1,
+        overviews=(Overview(0, 5), Overview(6, 8)),
+        metatiles=(Metatile(9, 14),),
+    ),
+}
+
+
+class MvtTable(NamedTuple):
+    """Source table, tile bounds and filters of a vector tile query."""
+
+    schema_name: str
+    table_name: str
+    bbox: Bounds
+    extent: int
+    columns: List[ColumnClause]
+    filters: List[TextClause]
+    order_by: List[ColumnClause] = []
+    options: Optional[MvtOptions] = None
+
+
+class QueryTemplate(NamedTuple):
+    """Compiled SQL with positional parameters and their names."""
+
+    sql: str
+    param_names: Tuple[str, ...]
+
+
+query_templates: LRUCache = LRUCache(maxsize=512)
+
+# Metatiles being rendered, so that concurrent requests for tiles of the
+# same metatile share a single query
+inflight_metatiles: Dict[Hashable, "asyncio.Future[List[bytes]]"] = dict()
 
 
 def get_mvt_table(
@@ -17,41 +124,508 @@ def get_mvt_table(
     columns: List[ColumnClause],
     filters: List[TextClause],
     order_by: List[ColumnClause] = [],
+    options: Optional[MvtOptions] = None,
 ) -> Select:
 
     bounds: Select
 
     bounds = _get_bounds(*bbox)
+    options = options or mvt_options(schema_name)
 
     query: Select = _get_mvt_table(
-        schema_name, table_name, bounds, extent, columns, order_by
+        schema_name, table_name, bounds, extent, columns, order_by, options
     )
-    return _filter_mvt_table(query, *filters)
+    envelope_filter = _get_tile_envelope_filter(
+        options, _margin(bbox, extent, options.buffer)
+    )
+    if options.min_size:
+        filters = [_get_min_size_filter(extent, options.min_size), *filters]
+    return _filter_mvt_table(query, envelope_filter, *filters)
+
+
+def mvt_options(schema_name: str) -> MvtOptions:
+    return MVT_OPTIONS.get(schema_name, MvtOptions())
+
+
+async def route_mvt_table(table: MvtTable) -> MvtTable:
+    """Read from overview table of tile zoom level, if there is one."""
+    options = table.options or mvt_options(table.schema_name)
+    if not options.overviews:
+        return table
+
+    table_name = await get_source_table(
+        table.schema_name, table.table_name, tile_zoom(table.bbox), options.overviews
+    )
+    return table._replace(table_name=table_name)
 
 
-async def get_tile(query: Select, name: str, extent: int) -> VectorTileResponse:
+async def get_tile(table: MvtTable, name: str) -> VectorTileResponse:
     """Make SQL query to PostgreSQL and return vector tile in PBF format."""
-    query = _as_vector_tile(query, name, extent)
-    return await _get_tile(query)
+    table = await route_mvt_table(table)
+    return await _render_tile(("tile", name), _tile_builder(name), table)
 
 
 async def get_aggregated_tile(
-    query: Select,
+    table: MvtTable,
     columns: List[ColumnClause],
     group_by_columns: List[ColumnClause],
     name: str,
-    extent: int,
 ) -> VectorTileResponse:
     """Make SQL query to PostgreSQL and return vector tile in PBF format.
 
     This function makes a SQL query that aggregates point features based
     on proximity.
     """
-    query = _group_mvt_table(query, columns, group_by_columns).alias(
-        "grouped_mvt_table"
+    table = await route_mvt_table(table)
+
+    def build(table: MvtTable) -> Select:
+        query = get_mvt_table(*table)
+        query = _group_mvt_table(query, columns, group_by_columns).alias(
+            "grouped_mvt_table"
+        )
+        return _as_vector_tile(query, name=name, extent=table.extent)
+
+    prefix = (
+        "aggregated_tile",
+        name,
+        _clauses_key(columns),
+        _clauses_key(group_by_columns),
+    )
+    return await _render_tile(prefix, build, table)
+
+
+async def get_tiles(tables: List[MvtTable], name: str) -> List[bytes]:
+    """Render many vector tiles of the same query with few statements.
+
+    Tables must only differ in tile bounds and filter values. Tiles
+    which share source table and filter values, other than the filter
+    geometry, are rendered by a single statement, see
+    `get_batch_template`. Tiles are returned in order of tables.
+    """
+    routed = [await route_mvt_table(table) for table in tables]
+
+    batches: Dict[Hashable, List[int]] = dict()
+    for i, table in enumerate(routed):
+        key = (mvt_table_key(table), _get_filter_values(table))
+        batches.setdefault(key, list()).append(i)
+
+    tiles: List[bytes] = [b""] * len(tables)
+    for indices in batches.values():
+        batch = [routed[i] for i in indices]
+        key, template = _get_tile_template(batch[0], name)
+        for i, tile in zip(indices, await _get_batch_tiles(key, template, batch)):
+            tiles[i] = tile
+    return tiles
+
+
+def get_query_template(key: Hashable, build: Callable[[], Select]) -> QueryTemplate:
+    """Get compiled SQL for a query shape, building and compiling the
+    query only if the shape was not seen before."""
+    template = query_templates.get(key)
+    if template is not None:
+        metrics.increment("query_templates.hits")
+        return template
+
+    metrics.increment("query_templates.misses")
+    with metrics.timer("query_templates.compile"):
+        compiled = build().compile(dialect=DIALECT)
+    template = QueryTemplate(compiled.string, tuple(compiled.positiontup))
+    query_templates[key] = template
+    return template
+
+
+def get_batch_template(key: Hashable, template: QueryTemplate) -> QueryTemplate:
+    """Wrap tile query template to render a list of tiles at once.
+
+    Tile bounds, margin and filter geometry (if any) are passed as
+    arrays, one element per tile, which are unnested into a tile list.
+    The tile query is joined laterally, reading these from the tile list
+    instead of parameters. Returns one row with tile index and tile per
+    tile.
+    """
+    batch_key = ("batch", key)
+    batch = query_templates.get(batch_key)
+    if batch is not None:
+        return batch
+
+    tile_params = (
+        *TILE_PARAMS,
+        *(n for n in TILE_FILTER_PARAMS if n in template.param_names),
+    )
+    names: List[str] = list(
+        dict.fromkeys(n for n in template.param_names if n not in tile_params)
+    )
+
+    def replace(match: "re.Match") -> str:
+        name = template.param_names[int(match.group(1)) - 1]
+        if name in tile_params:
+            return f'tiles."{name}"'
+        return f"${names.index(name) + 1}"
+
+    sql = PLACEHOLDER_REGEX.sub(replace, template.sql)
+    columns = ("index", *tile_params)
+    types = {"index": "int", **TILE_FILTER_PARAMS}
+    arrays = ", ".join(
+        f"${len(names) + i + 1}::{types.get(column, 'float8')}[]"
+        for i, column in enumerate(columns)
+    )
+    sql = f"""SELECT tiles."index", tile.mvt
+FROM unnest({arrays}) AS tiles({", ".join(f'"{c}"' for c in columns)})
+CROSS JOIN LATERAL ({sql}) AS tile(mvt)"""
+
+    batch = QueryTemplate(sql, (*names, *(f"tiles_{c}" for c in columns)))
+    query_templates[batch_key] = batch
+    return batch
+
+
+def get_metatile_template(
+    key: Hashable,
+    build: Callable[[], Select],
+    table: MvtTable,
+    materialized: bool = False,
+) -> QueryTemplate:
+    """Wrap tile query to render all tiles of a metatile at once.
+
+    Features within the (buffered) metatile envelope which pass the
+    filters of table are selected once, into a CTE. build must return
+    the tile query reading from that CTE instead of the source table,
+    which is then batched over the tiles of the metatile, see
+    `get_batch_template`. Metatile bounds and margin are passed as
+    parameters `metatile_left`, ..., `metatile_margin`.
+
+    Unless the CTE is MATERIALIZED, PostgreSQL 12+ inlines it into the
+    tile query, so that each tile would scan the source table again.
+    """
+    metatile_key = (key, materialized)
+    metatile = query_templates.get(metatile_key)
+    if metatile is not None:
+        return metatile
+
+    batch = get_batch_template(key, get_query_template(key, build))
+
+    options = table.options or mvt_options(table.schema_name)
+    envelope = "ST_MakeEnvelope(:metatile_left, :metatile_bottom, :metatile_right, :metatile_top, 3857)"
+    if options.buffer:
+        envelope = f"ST_Expand({envelope}, :metatile_margin)"
+    src_table = db.table(table.table_name)
+    src_table.schema = table.schema_name
+    query = (
+        db.select([db.text("t.*")])
+        .select_from(src_table.alias("t"))
+        .where(db.text(f"t.geom_wm && {envelope}"))
+    )
+    for f in table.filters:
+        query = query.where(f)
+    compiled = query.compile(dialect=DIALECT)
+
+    names = list(batch.param_names)
+
+    def replace(match: "re.Match") -> str:
+        name = compiled.positiontup[int(match.group(1)) - 1]
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    cte = PLACEHOLDER_REGEX.sub(replace, compiled.string)
+    sql = f"""WITH {METATILE_TABLE} AS {"MATERIALIZED " if materialized else ""}({cte})
+{batch.sql}"""
+
+    metatile = QueryTemplate(sql, tuple(names))
+    query_templates[metatile_key] = metatile
+    return metatile
+
+
+def mvt_table_key(table: MvtTable) -> Hashable:
+    """Shape of an MVT table query, which is everything but the values
+    of bound parameters."""
+    return (
+        table.schema_name,
+        table.table_name,
+        table.extent,
+        _clauses_key(table.columns),
+        tuple(f.text for f in table.filters),
+        _clauses_key(table.order_by),
+        table.options or mvt_options(table.schema_name),
+    )
+
+
+def mvt_table_params(table: MvtTable) -> Dict[str, Any]:
+    """Values of bound parameters of an MVT table query."""
+    left, bottom, right, top = table.bbox
+    params: Dict[str, Any] = {
+        "left": left,
+        "bottom": bottom,
+        "right": right,
+        "top": top,
+    }
+    options = table.options or mvt_options(table.schema_name)
+    if options.buffer:
+        params["margin"] = _margin(table.bbox, table.extent, options.buffer)
+    for f in table.filters:
+        for name, bind in f._bindparams.items():
+            params[name] = bind.effective_value
+    return params
+
+
+def _clauses_key(clauses: List[ClauseElement]) -> Tuple[Hashable, ...]:
+    return tuple(_clause_key(clause) for clause in clauses)
+
+
+def _clause_key(clause: ClauseElement) -> Hashable:
+    if isinstance(clause, Label):
+        return clause.name, _clause_key(clause.element)
+    elif isinstance(clause, ColumnClause):
+        return clause.name, clause.is_literal
+    elif isinstance(clause, TextClause):
+        return clause.text
+    return str(clause)
+
+
+def _tile_builder(name: str) -> Callable[[MvtTable], Select]:
+    def build(table: MvtTable) -> Select:
+        query = get_mvt_table(*table)
+        return _as_vector_tile(query, name, table.extent)
+
+    return build
+
+
+def _get_tile_template(table: MvtTable, name: str) -> Tuple[Hashable, QueryTemplate]:
+    key = ("tile", name, mvt_table_key(table))
+    return key, get_query_template(key, lambda: _tile_builder(name)(table))
+
+
+async def _render_tile(
+    prefix: Tuple[Hashable, ...],
+    build: Callable[[MvtTable], Select],
+    table: MvtTable,
+) -> VectorTileResponse:
+    """Render tile of query built by build, keyed by prefix and table
+    shape, as part of a metatile or a micro-batch."""
+    metatile = _get_metatile(table)
+    if metatile is not None:
+        return await _get_metatile_tile(prefix, build, table, metatile)
+
+    key = (*prefix, mvt_table_key(table))
+    template = get_query_template(key, lambda: build(table))
+    return await _get_batched_tile(key, template, table)
+
+
+def _get_filter_values(table: MvtTable) -> Tuple[Tuple[str, Any], ...]:
+    """Parameter values which tiles of a batch must share."""
+    params = mvt_table_params(table)
+    return tuple(
+        (k, v)
+        for k, v in params.items()
+        if k not in TILE_PARAMS and k not in TILE_FILTER_PARAMS
+    )
+
+
+async def _get_batched_tile(
+    key: Hashable, template: QueryTemplate, table: MvtTable
+) -> VectorTileResponse:
+    """Render tile together with concurrent requests of the same query
+    shape and filter values, see `tile_batcher`."""
+    if not tile_batcher.enabled:
+        return await _get_admitted_tile(template, table)
+
+    tile = await tile_batcher.submit(
+        (key, _get_filter_values(table)), (template, table)
+    )
+    return VectorTileResponse(content=tile, status_code=200)
+
+
+async def _run_tile_batch(
+    batch_key: Hashable, items: List[Tuple[QueryTemplate, MvtTable]]
+) -> List[bytes]:
+    # Batches run in a task of their own, which must not reuse the
+    # connection of the request that happened to open the batch
+    key, _ = batch_key
+    template, table = items[0]
+    if len(items) == 1:
+        response = await _get_admitted_tile(template, table, reuse=False)
+        return [response.body]
+
+    tables = [table for _, table in items]
+    return await _get_batch_tiles(key, template, tables, reuse=False)
+
+
+tile_batcher: MicroBatcher = MicroBatcher(
+    _run_tile_batch,
+    window=GLOBALS.vector_tile_batch_window,
+    max_size=GLOBALS.vector_tile_batch_size,
+    name="tile_batches",
+)
+
+
+async def _get_admitted_tile(
+    template: QueryTemplate, table: MvtTable, reuse: bool = True
+) -> VectorTileResponse:
+    """Execute query template in the admission lane of its cost."""
+    params = mvt_table_params(table)
+    args = [params[name] for name in template.param_names]
+    lane = await get_lane(table.table_name, table.bbox, params, template.sql, args)
+    async with lane.admit():
+        return await _get_template_tile(template, params, reuse)
+
+
+async def _get_batch_tiles(
+    key: Hashable,
+    template: QueryTemplate,
+    tables: List[MvtTable],
+    reuse: bool = True,
+) -> List[bytes]:
+    """Render tiles which only differ in bounds with one statement."""
+    template = get_batch_template(key, template)
+    return await _fetch_batch_tiles(template, _batch_params(tables), tables, reuse)
+
+
+def _batch_params(tables: List[MvtTable]) -> Dict[str, Any]:
+    table = tables[0]
+    params = mvt_table_params(table)
+    params["tiles_index"] = list(range(len(tables)))
+    for i, param in enumerate(TILE_PARAMS[:4]):
+        params[f"tiles_{param}"] = [t.bbox[i] for t in tables]
+    options = table.options or mvt_options(table.schema_name)
+    params["tiles_margin"] = [_margin(t.bbox, t.extent, options.buffer) for t in tables]
+    for name in TILE_FILTER_PARAMS:
+        if name in params:
+            params[f"tiles_{name}"] = [mvt_table_params(t)[name] for t in tables]
+    return params
+
+
+async def _fetch_batch_tiles(
+    template: QueryTemplate,
+    params: Dict[str, Any],
+    tables: List[MvtTable],
+    reuse: bool = True,
+) -> List[bytes]:
+    """Execute batch template, returning tiles in order of tables."""
+    # The tile of lowest zoom is the most expensive one
+    costliest = min(tables, key=lambda t: tile_zoom(t.bbox))
+    args = [params[name] for name in template.param_names]
+    lane = await get_lane(
+        costliest.table_name,
+        costliest.bbox,
+        mvt_table_params(costliest),
+        template.sql,
+        args,
+    )
+
+    tiles: List[bytes] = [b""] * len(tables)
+    logger.debug(template.sql)
+    async with lane.admit():
+        async with db.acquire(reuse=reuse) as conn:
+            raw_connection = await conn.get_raw_connection()
+            for index, tile in await raw_connection.fetch(template.sql, *args):
+                tiles[index] = tile or b""
+    return tiles
+
+
+def _get_metatile(table: MvtTable) -> Optional[Metatile]:
+    """Metatile band of the tile zoom level, if tile is to be rendered as
+    part of a metatile.
+
+    Tiles clipped to a geometry are rendered on their own, as are tiles
+    requested outside of the tile cache, which can't take neighbours.
+    """
+    if neighbour_tiles.get() is None or "geometry" in mvt_table_params(table):
+        return None
+    options = table.options or mvt_options(table.schema_name)
+    return get_metatile(options.metatiles, tile_zoom(table.bbox))
+
+
+async def _get_metatile_tile(
+    prefix: Tuple[Hashable, ...],
+    build: Callable[[MvtTable], Select],
+    table: MvtTable,
+    metatile: Metatile,
+) -> VectorTileResponse:
+    """Render the metatile containing tile and hand neighbour tiles to
+    the tile cache.
+
+    Concurrent requests for tiles of the same metatile share a single
+    query. Neighbours are handed over by the request which started it.
+    """
+    tile = tile_xyz(table.bbox)
+    tiles = metatile_tiles(tile, metatile.size)
+    key = (*prefix, mvt_table_key(table), _get_filter_values(table), tiles[0])
+
+    neighbours: Optional[Dict[Tile, bytes]] = None
+    future = inflight_metatiles.get(key)
+    if future is None:
+        tables = [
+            table if t == tile else table._replace(bbox=tile_bounds(t)) for t in tiles
+        ]
+        # Runs in a task of its own, so that it completes for the other
+        # requests if this one is cancelled
+        future = asyncio.ensure_future(_render_metatile(prefix, build, tables))
+        inflight_metatiles[key] = future
+        future.add_done_callback(lambda _: inflight_metatiles.pop(key, None))
+        neighbours = neighbour_tiles.get()
+    else:
+        metrics.increment("metatiles.shared")
+
+    rendered = await asyncio.shield(future)
+    if neighbours is not None:
+        neighbours.update((t, mvt) for t, mvt in zip(tiles, rendered) if t != tile)
+    return VectorTileResponse(content=rendered[tiles.index(tile)], status_code=200)
+
+
+async def _render_metatile(
+    prefix: Tuple[Hashable, ...],
+    build: Callable[[MvtTable], Select],
+    tables: List[MvtTable],
+) -> List[bytes]:
+    """Render all tiles of a metatile with a single statement, see
+    `get_metatile_template`."""
+    metrics.increment("metatiles.renders")
+    table = tables[0]
+    options = table.options or mvt_options(table.schema_name)
+    # Tile query reading from the metatile CTE instead of the source table
+    cte_table = table._replace(
+        schema_name=None, table_name=METATILE_TABLE, options=options
+    )
+    template = get_metatile_template(
+        ("metatile", *prefix, mvt_table_key(table)),
+        lambda: build(cte_table),
+        table,
+        await _supports_materialized(),
     )
-    query = _as_vector_tile(query, name=name, extent=extent)
-    return await _get_tile(query)
+
+    params = _batch_params(tables)
+    bounds = metatile_bounds([t.bbox for t in tables])
+    for name, value in zip(TILE_PARAMS[:4], bounds):
+        params[f"metatile_{name}"] = value
+    params["metatile_margin"] = _margin(table.bbox, table.extent, options.buffer)
+
+    # Not reusing the connection of the request which started the metatile
+    return await _fetch_batch_tiles(template, params, tables, reuse=False)
+
+
+@alru_cache(maxsize=1)
+async def _supports_materialized() -> bool:
+    """Whether CTEs can be marked MATERIALIZED (PostgreSQL 12+)."""
+    async with db.acquire() as conn:
+        raw_connection = await conn.get_raw_connection()
+        return raw_connection.get_server_version().major >= 12
+
+
+async def _get_template_tile(
+    template: QueryTemplate, params: Dict[str, Any], reuse: bool = True
+) -> VectorTileResponse:
+    """Execute query template and return vector tile in PBF format.
+
+    asyncpg keeps a prepared statement per connection for each SQL
+    string, so that templates are parsed and planned only once per
+    connection. The ST_AsMVT bytes are fetched directly, skipping the
+    generic result processing of Gino.
+    """
+    args = [params[name] for name in template.param_names]
+    logger.debug(template.sql)
+    async with db.acquire(reuse=reuse) as conn:
+        raw_connection = await conn.get_raw_connection()
+        tile = await raw_connection.fetchval(template.sql, *args)
+    return VectorTileResponse(content=tile, status_code=200)
 
 
 async def _get_tile(query: Select) -> VectorTileResponse:
@@ -74,6 +648,59 @@ def _get_bounds(left: float, bottom: float, right: float, top: float) -> Select:
     return bounds
 
 
+def _margin(bbox: Bounds, extent: int, buffer: int) -> float:
+    """Width of tile buffer in map units."""
+    left, _, right, _ = bbox
+    return (right - left) * buffer / extent
+
+
+def _get_tile_envelope_filter(options: MvtOptions, margin: float) -> TextClause:
+    """Create filter for features within tile envelope.
+
+    The envelope is expanded by the tile buffer, same as
+    ST_TileEnvelope(..., margin) of PostGIS 3.1+ does. The explicit
+    bounding box test comes first, so that the planner uses the spatial
+    index before testing exact intersection.
+    """
+    envelope = "ST_Expand(bounds.geom, :margin)" if options.buffer else "bounds.geom"
+    bound_filter = f"t.geom_wm && {envelope}"
+    if options.exact:
+        bound_filter += f" AND ST_Intersects(t.geom_wm, {envelope})"
+
+    f: TextClause = db.text(bound_filter)
+    if options.buffer:
+        f = f.bindparams(margin=margin)
+    return f
+
+
+def _get_min_size_filter(extent: int, min_size: float) -> TextClause:
+    """Create filter for features larger than min size in tile units.
+
+    Only the bounding box of features is tested, which is cheap.
+    """
+    width = "ST_XMax(t.geom_wm) - ST_XMin(t.geom_wm)"
+    height = "ST_YMax(t.geom_wm) - ST_YMin(t.geom_wm)"
+    return db.text(f"GREATEST({width}, {height}) >= {_tile_unit(extent)} * {min_size}")
+
+
+def _tile_unit(extent: int) -> str:
+    """SQL expression for the size of one tile coordinate unit in map
+    units."""
+    return f"(ST_XMax(bounds.geom) - ST_XMin(bounds.geom)) / {extent}"
+
+
+def _generalize(geom: str, extent: int, options: MvtOptions) -> str:
+    """Wrap geometry expression to generalise geometries to tile
+    resolution."""
+    unit = _tile_unit(extent)
+    if options.simplify:
+        geom = f"ST_Simplify({geom}, {unit} * {options.simplify}, false)"
+    if options.snap:
+        origin = "ST_XMin(bounds.geom), ST_YMax(bounds.geom)"
+        geom = f"ST_SnapToGrid({geom}, {origin}, {unit}, {unit})"
+    return geom
+
+
 def _get_mvt_table(
     schema_name: str,
     table_name: str,
@@ -81,11 +708,14 @@ def _get_mvt_table(
     extent: int,
     columns: List[ColumnClause],
     order_by: List[ColumnClause] = [],
+    options: MvtOptions = MvtOptions(),
 ) -> Select:
     """Create MVT Geom query."""
 
+    geom = _generalize("t.geom_wm", extent, options)
+    clip = "true" if options.clip else "false"
     mvt_geom = db.literal_column(
-        f"ST_AsMVTGeom(t.geom_wm, bounds.geom::box2d, {extent}, 0,false)"
+        f"ST_AsMVTGeom({geom}, bounds.geom::box2d, {extent}, {options.buffer}, {clip})"
     ).label("geom")
     cols: List[ColumnClause] = list(columns)
     cols.append(mvt_geom)
@@ -94,10 +724,7 @@ def _get_mvt_table(
     src_table.schema = schema_name
     src_table = src_table.alias("t")
 
-    bound_filter = db.text("ST_Intersects(t.geom_wm, bounds.geom)")
-    query = (
-        db.select(cols).select_from(src_table).select_from(bounds).where(bound_filter)
-    )
+    query = db.select(cols).select_from(src_table).select_from(bounds)
 
     if order_by:
         query = query.order_by(*order_by)
@@ -0,0 +1,164 @@
+"""Admission control of vector tile queries.
+
+Tile queries are classified as cheap or expensive by their estimated
+cost and run in separate lanes, each with its own concurrency limit, so
+that a few expensive queries can't hold all database connections while
+cheap tiles starve. Queries which can't start within the queue timeout
+of their lane are shed with OverloadedError.
+
+Cost is estimated from tile zoom, queried date span and size of the
+geometry filter. If `admission_explain` is enabled, the planner cost of
+the query is used instead, which is cached per query shape and zoom.
+"""
+
+import asyncio
+import datetime
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional
+
+from cachetools import LRUCache
+
+from ....application import db
+from ....errors import OverloadedError
+from ....models.types import Bounds
+from ....settings.globals import GLOBALS
+from ....utils.metrics import metrics
+from .overviews import tile_zoom
+
+# Cost 1 is a tile of this zoom level, covering this many days
+REFERENCE_ZOOM = 10
+REFERENCE_DAYS = 7
+
+# Size of WKB geometry filter which doubles the cost
+REFERENCE_GEOMETRY_BYTES = 16 * 1024
+
+plan_costs: LRUCache = LRUCache(maxsize=1024)
+
+
+class Lane:
+    """Concurrency limit with a bounded queue wait."""
+
+    def __init__(self, name: str, concurrency: int, queue_timeout: float) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.increment(f"admission.{self.name}.shed")
+            raise OverloadedError(
+                f"Too many {self.name} tile queries. Please try again later.",
+                retry_after=self.retry_after,
+            )
+        finally:
+            self.waiting -= 1
+            metrics.observe(f"admission.{self.name}.wait", time.monotonic() - start)
+
+        self.running += 1
+        self._report()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+            self._report()
+
+    def _report(self) -> None:
+        metrics.gauge(f"admission.{self.name}.running", self.running)
+        metrics.gauge(f"admission.{self.name}.waiting", self.waiting)
+
+
+cheap_lane = Lane(
+    "cheap", GLOBALS.admission_cheap_concurrency, GLOBALS.admission_cheap_queue_timeout
+)
+expensive_lane = Lane(
+    "expensive",
+    GLOBALS.admission_expensive_concurrency,
+    GLOBALS.admission_expensive_queue_timeout,
+)
+
+
+async def get_lane(
+    table_name: str, bbox: Bounds, params: Dict[str, Any], sql: str, args: List[Any]
+) -> Lane:
+    """Lane to run tile query in, by estimated or planner cost."""
+    if GLOBALS.admission_explain:
+        # Plans of similar date spans are alike
+        days = _date_span(params)
+        key = (sql, tile_zoom(bbox), days and days.bit_length(), "geometry" in params)
+        cost = await get_plan_cost(key, sql, args)
+        expensive = cost > GLOBALS.admission_expensive_plan_cost
+    else:
+        cost = estimate_cost(table_name, bbox, params)
+        expensive = cost > GLOBALS.admission_expensive_cost
+    return expensive_lane if expensive else cheap_lane
+
+
+def estimate_cost(table_name: str, bbox: Bounds, params: Dict[str, Any]) -> float:
+    """Estimate cost of a tile query relative to a zoom 10 tile covering
+    one week.
+
+    Cost doubles with every zoom level below the reference zoom, and
+    grows linearly with the date span and the size of the geometry
+    filter. Overview and rollup tables hold generalised features, so
+    that zoom level does not matter for them.
+    """
+    cost = 1.0
+    if not _is_generalised(table_name):
+        cost *= 2.0 ** max(0, REFERENCE_ZOOM - tile_zoom(bbox))
+
+    days = _date_span(params)
+    if days is not None:
+        cost *= max(days, 1) / REFERENCE_DAYS
+
+    geometry = params.get("geometry")
+    if geometry is not None:
+        cost *= 1 + len(geometry) / REFERENCE_GEOMETRY_BYTES
+
+    return cost
+
+
+async def get_plan_cost(key: Hashable, sql: str, args: List[Any]) -> float:
+    """Planner cost of query, cached by key."""
+    cost = plan_costs.get(key)
+    if cost is None:
+        # Not reusing the request connection, as batched queries are
+        # planned outside of requests
+        async with db.acquire() as conn:
+            raw_connection = await conn.get_raw_connection()
+            plan = await raw_connection.fetchval(f"EXPLAIN (FORMAT JSON) {sql}", *args)
+        cost = json.loads(plan)[0]["Plan"]["Total Cost"]
+        plan_costs[key] = cost
+    return cost
+
+
+def _is_generalised(table_name: str) -> bool:
+    # Overview and rollup tables are named <version>__<suffix>
+    return "__" in table_name
+
+
+def _date_span(params: Dict[str, Any]) -> Optional[int]:
+    start, end = params.get("start_date"), params.get("end_date")
+    if start is None or end is None:
+        return None
+    try:
+        start_date = datetime.date.fromisoformat(str(start)[:10])
+        end_date = datetime.date.fromisoformat(str(end)[:10])
+    except ValueError:
+        return None
+    return (end_date - start_date).days + 1
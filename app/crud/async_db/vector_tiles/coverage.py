@@ -0,0 +1,84 @@
+"""Coverage index of tiles which contain features.
+
+Coverage is stored as a pyramid of bitmaps, one per zoom level up to a
+max zoom, in table `<version>__coverage` of the dataset schema, where
+the build job writes it to. Bitmaps are loaded into memory along with
+the tile cache registry, so checking coverage does not query the
+database. A tile of a zoom level above max zoom is covered if its
+ancestor at max zoom is. Tiles of versions without coverage are always
+considered covered.
+
+Coverage is a snapshot taken when it is built. Datasets whose versions
+are appended to in place, like the daily VIIRS fire alerts, never use
+it, since tiles with new features would be answered as empty.
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from ....errors import EmptyTileError
+from ....models.types import Bounds
+from ...sync_db.tile_cache_assets import COVERAGE_TABLE_SUFFIX, get_registry
+from .overviews import WEB_MERCATOR_WIDTH, tile_zoom
+
+# Datasets whose versions are updated in place
+UPDATED_IN_PLACE = frozenset({"nasa_viirs_fire_alerts"})
+
+
+class Coverage:
+    def __init__(self, bitmaps: Dict[int, bytes]) -> None:
+        self.bitmaps = bitmaps
+        self.max_zoom = max(bitmaps)
+
+    @classmethod
+    def from_tiles(cls, tiles: Iterable[Tuple[int, int]], zoom: int) -> "Coverage":
+        """Build coverage from x, y of covered tiles at zoom."""
+        bitmaps = {z: bytearray(max(4**z // 8, 1)) for z in range(zoom + 1)}
+        for x, y in tiles:
+            for z in range(zoom, -1, -1):
+                index = _index(x, y, z)
+                if bitmaps[z][index >> 3] & (1 << (index & 7)):
+                    # Ancestors are already set
+                    break
+                bitmaps[z][index >> 3] |= 1 << (index & 7)
+                x, y = x >> 1, y >> 1
+        return cls({z: bytes(bitmap) for z, bitmap in bitmaps.items()})
+
+    def covers(self, x: int, y: int, z: int) -> bool:
+        if z > self.max_zoom:
+            shift = z - self.max_zoom
+            x, y, z = x >> shift, y >> shift, self.max_zoom
+
+        index = _index(x, y, z)
+        return bool(self.bitmaps[z][index >> 3] & (1 << (index & 7)))
+
+
+def coverage_table_name(version: str) -> str:
+    return f"{version}{COVERAGE_TABLE_SUFFIX}"
+
+
+def get_coverage(schema_name: str, table_name: str) -> Optional[Coverage]:
+    bitmaps = get_registry().coverage(schema_name, table_name)
+    return Coverage(bitmaps) if bitmaps else None
+
+
+def check_coverage(schema_name: str, table_name: str, bbox: Bounds) -> None:
+    """Raise EmptyTileError if tile is known to have no features."""
+    if schema_name in UPDATED_IN_PLACE:
+        return
+    coverage = get_coverage(schema_name, table_name)
+    if coverage is not None and not coverage.covers(*tile_xyz(bbox)):
+        raise EmptyTileError(f"Tile has no features in {schema_name}.{table_name}")
+
+
+def tile_xyz(bbox: Bounds) -> Tuple[int, int, int]:
+    """Tile coordinates of tile with given Web Mercator bounds."""
+    left, _, right, top = bbox
+    z = tile_zoom(bbox)
+    width = WEB_MERCATOR_WIDTH / 2**z
+    x = round((left + WEB_MERCATOR_WIDTH / 2) / width)
+    y = round((WEB_MERCATOR_WIDTH / 2 - top) / width)
+    return x, y, z
+
+
+def _index(x: int, y: int, z: int) -> int:
+    return y * 2**z + x
@@ -1,33 +1,92 @@
-from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+from typing import Any, Callable, Coroutine, Dict, List, NamedTuple, Optional, Union
 from uuid import UUID
 
+from cachetools import LRUCache
 from fastapi import HTTPException
+from pyproj import Transformer
 from shapely.geometry import box, shape
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import transform
+from shapely.prepared import PreparedGeometry, prep
 from sqlalchemy.sql.elements import TextClause
 
 from ....application import db
-from ....errors import BadResponseError, InvalidResponseError
+from ....errors import BadResponseError, EmptyTileError, InvalidResponseError
 from ....models.enumerators.geostore import GeostoreOrigin
 from ....models.types import Bounds, Geometry
 from ....utils import rw_api
 
+# Latitude limits of Web Mercator
+WEB_MERCATOR_BOX = box(-180, -85.0511287798066, 180, 85.0511287798066)
+TO_WEB_MERCATOR = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
+
+# Share of tile width by which tiles are expanded before clipping the
+# geostore, so that features in the tile buffer are kept
+CLIP_MARGIN = 0.125
+
+
+class GeostoreShape(NamedTuple):
+    geometry: BaseGeometry
+    prepared: PreparedGeometry
+
+
+geostore_shapes: LRUCache = LRUCache(maxsize=128)
+
 
 async def geometry_filter(
     geostore_id: Optional[UUID], bounds: Bounds, geostore_origin: str
 ) -> Optional[TextClause]:
-    if geostore_id:
-        geometry: Geometry = await _get_geostore_geometry(geostore_id, geostore_origin)
-        envelope = shape(geometry).envelope
-        if not envelope.intersects(box(*bounds)):
-            raise HTTPException(
-                status_code=404, detail="Tile does not intersect with geostore"
-            )
+    """Filter features by geostore.
 
-        f = filter_intersects("t.geom", geometry)  # TODO avoid having to use t.
+    Raises EmptyTileError if the tile is outside of the geostore. No
+    filter is needed if the tile is fully inside. Otherwise, only the
+    part of the geostore which overlaps with the tile is sent to the
+    database.
+    """
+    if geostore_id:
+        geostore = await get_geostore_shape(geostore_id, geostore_origin)
+        tile = box(*bounds)
+        if not geostore.prepared.intersects(tile):
+            raise EmptyTileError("Tile does not intersect with geostore")
+
+        envelope = clip_envelope(bounds)
+        if geostore.prepared.contains(envelope):
+            return None
+
+        f = filter_intersects(
+            "t.geom_wm", geostore.geometry.intersection(envelope)
+        )  # TODO avoid having to use t.
         return f
     return None
 
 
+def clip_envelope(bounds: Bounds) -> BaseGeometry:
+    """Tile expanded by the clip margin."""
+    left, _, right, _ = bounds
+    return box(*bounds).buffer((right - left) * CLIP_MARGIN, join_style=2)
+
+
+def envelope_filter(bounds: Bounds) -> TextClause:
+    """Geostore filter of a tile fully inside of the geostore, which
+    keeps all features of the tile."""
+    return filter_intersects("t.geom_wm", clip_envelope(bounds))
+
+
+async def get_geostore_shape(geostore_id: UUID, geostore_origin: str) -> GeostoreShape:
+    """Geostore geometry in Web Mercator, prepared for repeated
+    predicates."""
+    key = (geostore_id, geostore_origin)
+    geostore = geostore_shapes.get(key)
+    if geostore is None:
+        geometry: Geometry = await _get_geostore_geometry(geostore_id, geostore_origin)
+        geom_wm = transform(
+            TO_WEB_MERCATOR.transform, shape(geometry).intersection(WEB_MERCATOR_BOX)
+        )
+        geostore = GeostoreShape(geom_wm, prep(geom_wm))
+        geostore_shapes[key] = geostore
+    return geostore
+
+
 def contextual_filter(**fields: Union[str, bool]) -> List[TextClause]:
     filters: List[TextClause] = list()
     for field, value in fields.items():
@@ -70,11 +129,11 @@ def filter_gt(field: str, value: Any) -> TextClause:
     return f
 
 
-def filter_intersects(field, geometry) -> TextClause:
+def filter_intersects(field, geometry: BaseGeometry, srid: int = 3857) -> TextClause:
     f: TextClause = db.text(
-        f"ST_Intersects({field}, ST_SetSRID(ST_GeomFromGeoJSON(:geometry),4326))"
+        f"ST_Intersects({field}, ST_GeomFromWKB(:geometry, {srid}))"
     )
-    values: Dict[str, Any] = {"geometry": f"{geometry}"}
+    values: Dict[str, Any] = {"geometry": geometry.wkb}
     f = f.bindparams(**values)
 
     return f
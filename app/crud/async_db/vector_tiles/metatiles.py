@@ -0,0 +1,56 @@
+"""Metatiles are blocks of neighbouring tiles rendered together.
+
+When a client requests a tile, it will almost certainly request its
+neighbours next. In zoom bands configured for a dataset, the whole block
+of `size` x `size` tiles around a requested tile is rendered with one
+scan of the metatile envelope, and neighbour tiles are handed to the
+tile cache.
+"""
+
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import mercantile
+
+from ....models.types import Bounds
+
+# Tile coordinates as x, y, z
+Tile = Tuple[int, int, int]
+
+
+class Metatile(NamedTuple):
+    """Zoom band in which tiles are rendered in blocks of size x size."""
+
+    min_zoom: int
+    max_zoom: int
+    size: int = 4
+
+
+def get_metatile(metatiles: Sequence[Metatile], zoom: int) -> Optional[Metatile]:
+    for metatile in metatiles:
+        if metatile.min_zoom <= zoom <= metatile.max_zoom and metatile.size > 1:
+            return metatile
+    return None
+
+
+def metatile_tiles(tile: Tile, size: int) -> List[Tile]:
+    """Tiles of the metatile containing tile, row by row."""
+    x, y, z = tile
+    size = min(size, 2**z)
+    left, top = x - x % size, y - y % size
+    return [(left + i, top + j, z) for j in range(size) for i in range(size)]
+
+
+def tile_bounds(tile: Tile) -> Bounds:
+    """Web Mercator bounds of tile."""
+    left, bottom, right, top = mercantile.xy_bounds(*tile)
+    return left, bottom, right, top
+
+
+def metatile_bounds(tiles: Sequence[Bounds]) -> Bounds:
+    """Bounds of metatile from bounds of its tiles."""
+    return (
+        min(bbox[0] for bbox in tiles),
+        min(bbox[1] for bbox in tiles),
+        max(bbox[2] for bbox in tiles),
+        max(bbox[3] for bbox in tiles),
+    )
@@ -1,5 +1,9 @@
-from typing import List, Optional
+import math
+from datetime import date
+from typing import Dict, List, Optional, Tuple
 
+import pendulum
+from async_lru import alru_cache
 from sqlalchemy.sql.elements import ColumnClause, TextClause
 
 from ....application import db
@@ -9,11 +13,94 @@ from ....models.enumerators.nasa_viirs_fire_alerts.supported_attributes import (
 from ....models.types import Bounds
 from ....responses import VectorTileResponse
 from ...async_db import vector_tiles
-from ...sync_db.tile_cache_assets import get_attributes
-from . import get_mvt_table
+from ...sync_db.tile_cache_assets import get_attributes, get_latest_date
+from . import MvtTable
+from .overviews import table_exists, tile_zoom
 
 SCHEMA = "nasa_viirs_fire_alerts"
 
+# Zoom levels of grids for which daily rollup tables are built. Tiles
+# are answered from the coarsest existing grid at least as fine as the
+# tile grid.
+ROLLUP_ZOOMS = (2, 4, 6)
+
+# Rollup tables are grouped by these columns and grid cell
+ROLLUP_DIMENSIONS = ("alert__date", "confidence__cat")
+
+
+def _most_alerts(column: str) -> str:
+    return f"(array_agg({column} ORDER BY count DESC))[1]"
+
+
+# Aggregates of alerts per day and grid cell for each supported
+# attribute, and how to merge them into aggregates per tile grid cell.
+# Modal attributes are taken from the rollup row with the most alerts.
+ROLLUP_AGGREGATES: Dict[SupportedAttribute, Tuple[Optional[str], str]] = {
+    SupportedAttribute.LATITUDE: (
+        "sum(latitude)",
+        "round(sum(latitude) / sum(count), 4)",
+    ),
+    SupportedAttribute.LONGITUDE: (
+        "sum(longitude)",
+        "round(sum(longitude) / sum(count), 4)",
+    ),
+    SupportedAttribute.ALERT_DATE: (None, _most_alerts("alert__date")),
+    SupportedAttribute.ALERT_TIME_UTC: (
+        "mode() WITHIN GROUP (ORDER BY alert__time_utc)",
+        _most_alerts("alert__time_utc"),
+    ),
+    SupportedAttribute.CONFIDENCE_CAT: (None, _most_alerts("confidence__cat")),
+    SupportedAttribute.BRIGHT_TI4_K: (
+        'sum("bright_ti4__K")',
+        'round(sum("bright_ti4__K") / sum(count), 3)',
+    ),
+    SupportedAttribute.BRIGHT_TI5_K: (
+        'sum("bright_ti5__k")',
+        'round(sum("bright_ti5__K") / sum(count), 3)',
+    ),
+    SupportedAttribute.FRP_MW: ('sum("frp__MW")', 'sum("frp__MW")'),
+    SupportedAttribute.UMD_TREE_COVER_DENSITY__THRESHOLD: (
+        "mode() WITHIN GROUP (ORDER BY umd_tree_cover_density__threshold)",
+        _most_alerts("umd_tree_cover_density__threshold"),
+    ),
+}
+
+
+def rollup_table_name(version: str, zoom: int) -> str:
+    return f"{version}__daily_z{zoom}"
+
+
+@alru_cache(maxsize=64, ttl=900)
+async def get_rollup_max_date(table_name: str) -> Optional[date]:
+    """Latest alert date in rollup table. Rollups have an index on
+    alert__date, so this is cheap."""
+    sql = db.text(f'SELECT max(alert__date) FROM "{SCHEMA}"."{table_name}"')
+    return await db.scalar(sql)
+
+
+async def get_rollup_table(
+    version: str, bbox: Bounds, extent: int, end_date: Optional[str] = None
+) -> Optional[str]:
+    """Daily rollup table to answer tile from, if there is one.
+
+    Alerts are appended to the raw table daily and rollups are updated
+    by a separate job, so rollups are only used if they hold alerts up
+    to `end_date`, or up to the latest date of the version if no end
+    date or a later one is given.
+    """
+    zoom = tile_zoom(bbox) + round(math.log2(extent / 4096))
+    latest_date = get_latest_date(SCHEMA, version) or pendulum.now().to_date_string()
+    required_date = min(end_date, latest_date) if end_date else latest_date
+    for rollup_zoom in ROLLUP_ZOOMS:
+        if zoom <= rollup_zoom:
+            table_name = rollup_table_name(version, rollup_zoom)
+            if not await table_exists(SCHEMA, table_name):
+                continue
+            max_date = await get_rollup_max_date(table_name)
+            if max_date is not None and max_date.isoformat() >= required_date:
+                return table_name
+    return None
+
 
 async def get_aggregated_tile(
     version: str,
@@ -21,19 +108,32 @@ async def get_aggregated_tile(
     extent: int,
     supported_attributes: List[SupportedAttribute],
     filters: List[TextClause],
+    rollup: bool = False,
+    end_date: Optional[str] = None,
 ) -> VectorTileResponse:
     """Make SQL query to PostgreSQL and return vector tile in PBF format.
 
     This function makes a SQL query that aggregates point features based
     on proximity.
+
+    If `rollup` is set, filters must only use date and confidence, and
+    low zoom tiles are answered from daily rollup tables if they exist
+    and are up to date with `end_date`.
     """
+    rollup_table = (
+        await get_rollup_table(version, bbox, extent, end_date) if rollup else None
+    )
+    if rollup_table is not None:
+        return await _get_rollup_tile(
+            rollup_table, bbox, extent, supported_attributes, filters
+        )
 
     columns: List[ColumnClause] = list()
     attributes: List[str] = await get_attributes(SCHEMA, version)
     for attribute in attributes:
         columns.append(db.column(attribute))
 
-    query = get_mvt_table(SCHEMA, version, bbox, extent, columns, filters)
+    table = MvtTable(SCHEMA, version, bbox, extent, columns, filters)
     columns = [
         db.column("geom"),
         db.literal_column("count(*)").label("count"),
@@ -45,7 +145,35 @@ async def get_aggregated_tile(
     group_by_columns = [db.column("geom")]
 
     return await vector_tiles.get_aggregated_tile(
-        query, columns, group_by_columns, SCHEMA, extent
+        table, columns, group_by_columns, SCHEMA
+    )
+
+
+async def _get_rollup_tile(
+    table_name: str,
+    bbox: Bounds,
+    extent: int,
+    supported_attributes: List[SupportedAttribute],
+    filters: List[TextClause],
+) -> VectorTileResponse:
+    column_names = ["count", *ROLLUP_DIMENSIONS] + [
+        attribute.value
+        for attribute, (aggregate, _) in ROLLUP_AGGREGATES.items()
+        if aggregate is not None
+    ]
+    columns = [db.column(name) for name in column_names]
+    table = MvtTable(SCHEMA, table_name, bbox, extent, columns, filters)
+
+    aggregated_columns = [
+        db.column("geom"),
+        db.literal_column("sum(count)").label("count"),
+    ]
+    for attribute in supported_attributes:
+        _, merge = ROLLUP_AGGREGATES[attribute]
+        aggregated_columns.append(db.literal_column(merge).label(attribute.value))
+
+    return await vector_tiles.get_aggregated_tile(
+        table, aggregated_columns, [db.column("geom")], SCHEMA
     )
 
 
@@ -0,0 +1,62 @@
+"""Overview tables hold generalised copies of a dataset version for a
+band of low zoom levels.
+
+Overview tables are named `<version>__z<min_zoom>_<max_zoom>` and live
+in the same schema as the base table. Tiles are read from the overview
+of their zoom level if it exists, otherwise from the base table.
+"""
+
+import math
+from typing import NamedTuple, Sequence
+
+from async_lru import alru_cache
+
+from ....application import db
+from ....models.types import Bounds
+
+WEB_MERCATOR_WIDTH = 2 * 20037508.342789244
+
+
+class Overview(NamedTuple):
+    """Zoom band of an overview table.
+
+    Geometries are simplified with a tolerance of `simplify` and
+    features smaller than `min_size` are dropped, both in tile
+    coordinate units at `max_zoom`.
+    """
+
+    min_zoom: int
+    max_zoom: int
+    simplify: float = 1
+    min_size: float = 1
+
+    def table_name(self, version: str) -> str:
+        return f"{version}__z{self.min_zoom}_{self.max_zoom}"
+
+    def tile_unit(self, extent: int = 4096) -> float:
+        """Size of a tile coordinate unit at max zoom in map units."""
+        return WEB_MERCATOR_WIDTH / 2**self.max_zoom / extent
+
+
+def tile_zoom(bbox: Bounds) -> int:
+    """Zoom level of tile with given Web Mercator bounds."""
+    left, _, right, _ = bbox
+    return round(math.log2(WEB_MERCATOR_WIDTH / (right - left)))
+
+
+async def get_source_table(
+    schema_name: str, table_name: str, zoom: int, overviews: Sequence[Overview]
+) -> str:
+    """Table to read tiles of given zoom level from."""
+    for overview in overviews:
+        if overview.min_zoom <= zoom <= overview.max_zoom:
+            overview_name = overview.table_name(table_name)
+            if await table_exists(schema_name, overview_name):
+                return overview_name
+    return table_name
+
+
+@alru_cache(maxsize=256, ttl=900)
+async def table_exists(schema_name: str, table_name: str) -> bool:
+    sql = db.text("SELECT to_regclass(:name) IS NOT NULL")
+    return await db.scalar(sql.bindparams(name=f'"{schema_name}"."{table_name}"'))
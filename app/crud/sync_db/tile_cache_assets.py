@@ -1,20 +1,166 @@
-from typing import Dict, List, Optional
-
+import asyncio
+import os
+import random
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import asyncpg
+import orjson
 import pendulum
-from cachetools import TTLCache, cached
 from fastapi.logger import logger
 from pendulum import Duration
 
 from ...application import get_synchronous_db
 from ...models.enumerators.tile_caches import TileCacheType
+from ...notifications import NotificationListener
+from ...settings.globals import GLOBALS
 from ...utils.data_api import get_version_fields
+from ...utils.metrics import metrics
+
+# Coverage bitmaps by zoom level, see coverage module of vector tiles
+Coverages = Dict[Tuple[str, str], Dict[int, bytes]]
+
+# Suffix of coverage tables in dataset schemas
+COVERAGE_TABLE_SUFFIX = "__coverage"
+
+
+class TileCacheAsset(NamedTuple):
+    asset_type: str
+    dataset: str
+    version: str
+    implementation: Optional[str]
+    is_latest: bool
+    min_zoom: Optional[int]
+    max_zoom: Optional[int]
+    min_date: Optional[str]
+    max_date: Optional[str]
+    asset_uri: str
+
+
+class TileCacheRegistry:
+    """Immutable index of all tile cache assets.
+
+    Built once per refresh of the asset list, so that lookups on the
+    request path are dictionary gets instead of scans over all assets.
+    Assets are ordered by tile cache type, first match wins, same as the
+    asset list the index is built from. Coverage bitmaps of dynamic
+    vector tile versions are kept along with the assets.
+    """
+
+    __slots__ = (
+        "assets",
+        "_datasets",
+        "_versions",
+        "_version_sets",
+        "_latest_versions",
+        "_assets",
+        "_implementations",
+        "_dataset_tile_caches",
+        "_dates",
+        "_latest_dates",
+        "_all_latest_versions",
+        "_coverages",
+    )
+
+    def __init__(
+        self, assets: Iterable[TileCacheAsset], coverages: Optional[Coverages] = None
+    ) -> None:
+        order = {e.value: i for i, e in enumerate(TileCacheType)}
+        self.assets: Tuple[TileCacheAsset, ...] = tuple(
+            sorted(assets, key=lambda asset: order[asset.asset_type])
+        )
 
-
-@cached(cache=TTLCache(maxsize=1, ttl=900))
-def get_all_tile_caches():
-
-    tile_caches: Dict[str, List] = {e.value: list() for e in list(TileCacheType)}
-
+        datasets: Dict[str, Dict[str, None]] = {e.value: dict() for e in TileCacheType}
+        versions: Dict[Tuple[str, str], Dict[str, None]] = dict()
+        implementations: Dict[Tuple[str, str, str], List[Optional[str]]] = dict()
+        dataset_tile_caches: Dict[Tuple[str, str], List[TileCacheAsset]] = dict()
+        self._latest_versions: Dict[Tuple[str, str], str] = dict()
+        self._assets: Dict[Tuple[str, str, str, Optional[str]], TileCacheAsset] = dict()
+        self._dates: Dict[Tuple[str, str], Optional[str]] = dict()
+        self._latest_dates: Dict[str, Optional[str]] = dict()
+        latest_versions: Dict[Tuple[str, str], None] = dict()
+
+        for asset in self.assets:
+            type_dataset = (asset.asset_type, asset.dataset)
+            datasets[asset.asset_type][asset.dataset] = None
+            versions.setdefault(type_dataset, dict())[asset.version] = None
+            implementations.setdefault(
+                (asset.asset_type, asset.dataset, asset.version), list()
+            ).append(asset.implementation)
+            self._assets.setdefault(
+                (asset.asset_type, asset.dataset, asset.version, asset.implementation),
+                asset,
+            )
+            if asset.implementation:
+                dataset_tile_caches.setdefault(
+                    (asset.dataset, asset.version), list()
+                ).append(asset)
+            self._dates.setdefault((asset.dataset, asset.version), asset.max_date)
+            if asset.is_latest:
+                self._latest_versions.setdefault(type_dataset, asset.version)
+                self._latest_dates.setdefault(asset.dataset, asset.max_date)
+                latest_versions[(asset.dataset, asset.version)] = None
+
+        self._datasets = {key: tuple(value) for key, value in datasets.items()}
+        self._versions = {key: tuple(value) for key, value in versions.items()}
+        self._version_sets = {key: frozenset(value) for key, value in versions.items()}
+        self._implementations = {
+            key: tuple(value) for key, value in implementations.items()
+        }
+        self._dataset_tile_caches = {
+            key: tuple(value) for key, value in dataset_tile_caches.items()
+        }
+        self._all_latest_versions = tuple(latest_versions)
+        self._coverages: Coverages = coverages or dict()
+
+    def datasets(self, asset_type: str) -> Tuple[str, ...]:
+        return self._datasets.get(asset_type, ())
+
+    def versions(self, dataset: str, asset_type: str) -> Tuple[str, ...]:
+        return self._versions.get((asset_type, dataset), ())
+
+    def has_version(self, dataset: str, version: str, asset_type: str) -> bool:
+        return version in self._version_sets.get((asset_type, dataset), ())
+
+    def latest_version(self, dataset: str, asset_type: str) -> Optional[str]:
+        return self._latest_versions.get((asset_type, dataset))
+
+    def latest_versions(self) -> Tuple[Tuple[str, str], ...]:
+        """Dataset and version of all latest versions."""
+        return self._all_latest_versions
+
+    def asset(
+        self,
+        dataset: str,
+        version: str,
+        implementation: Optional[str],
+        asset_type: str,
+    ) -> Optional[TileCacheAsset]:
+        return self._assets.get((asset_type, dataset, version, implementation))
+
+    def implementations(
+        self, dataset: str, version: str, asset_type: str
+    ) -> Tuple[Optional[str], ...]:
+        return self._implementations.get((asset_type, dataset, version), ())
+
+    def dataset_tile_caches(
+        self, dataset: str, version: str
+    ) -> Tuple[TileCacheAsset, ...]:
+        """Assets of all tile cache types of a version which have an
+        implementation."""
+        return self._dataset_tile_caches.get((dataset, version), ())
+
+    def latest_date(self, dataset: str, version: Optional[str] = None) -> Optional[str]:
+        if version:
+            return self._dates.get((dataset, version))
+        return self._latest_dates.get(dataset)
+
+    def coverage(self, dataset: str, version: str) -> Optional[Dict[int, bytes]]:
+        return self._coverages.get((dataset, version))
+
+
+def get_all_tile_caches() -> List[TileCacheAsset]:
+    """Query all saved tile cache assets."""
     with get_synchronous_db() as db:
         rows = db.execute(
             f"""SELECT DISTINCT
@@ -45,79 +191,274 @@ def get_all_tile_caches():
         )
         rows = []
 
-    for row in rows:
-        tile_caches[row.asset_type].append(
-            {
-                "dataset": row.dataset,
-                "version": row.version,
-                "implementation": row.implementation,
-                "is_latest": row.is_latest,
-                "min_zoom": row.min_zoom,
-                "max_zoom": row.max_zoom,
-                "min_date": row.min_date.strftime("%Y-%m-%d")
-                if row.min_date is not None
-                else None,
-                "max_date": row.max_date.strftime("%Y-%m-%d")
-                if row.max_date is not None
-                else None,
-                "asset_uri": row.asset_uri,
-                "asset_type": row.asset_type,
-            }
+    return [
+        TileCacheAsset(
+            asset_type=row.asset_type,
+            dataset=row.dataset,
+            version=row.version,
+            implementation=row.implementation,
+            is_latest=row.is_latest,
+            min_zoom=row.min_zoom,
+            max_zoom=row.max_zoom,
+            min_date=row.min_date.strftime("%Y-%m-%d")
+            if row.min_date is not None
+            else None,
+            max_date=row.max_date.strftime("%Y-%m-%d")
+            if row.max_date is not None
+            else None,
+            asset_uri=row.asset_uri,
         )
-
-    return tile_caches
+        for row in rows
+    ]
 
 
-# @cached(cache=TTLCache(maxsize=15, ttl=900))
-def get_datasets(asset_type: str) -> List[str]:
-    tile_caches = get_all_tile_caches()
+def get_all_coverages() -> Coverages:
+    """Query coverage bitmaps of all versions which have a coverage
+    table readable by the API."""
+    suffix = COVERAGE_TABLE_SUFFIX
+    with get_synchronous_db() as db:
+        tables = db.execute(
+            f"""SELECT table_schema, table_name
+                   FROM information_schema.tables
+                   WHERE right(table_name, {len(suffix)}) = '{suffix}'"""
+        ).fetchall()
+        if not tables:
+            return dict()
+
+        selects = [
+            f"""SELECT {_literal(schema)} AS dataset,
+                    {_literal(table[: -len(suffix)])} AS version, zoom, bitmap
+                   FROM "{schema}"."{table}" """
+            for schema, table in tables
+        ]
+        rows = db.execute(" UNION ALL ".join(selects)).fetchall()
+
+    coverages: Coverages = dict()
+    for row in rows:
+        bitmaps = coverages.setdefault((row.dataset, row.version), dict())
+        bitmaps[row.zoom] = bytes(row.bitmap)
+    return coverages
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class RegistryRefresher:
+    """Current registry snapshot, refreshed in the background.
+
+    Requests are always served from the current snapshot. Once the app
+    has started, the snapshot is reloaded by a background task every
+    `interval` seconds, with random jitter so that workers do not query
+    the database at the same time. If reloading fails, the old snapshot
+    is kept and reloading is retried after `retry_interval` seconds.
+
+    If `load_coverages` is set, coverage bitmaps are loaded along with
+    the assets. They are not part of the snapshot file.
+
+    If `snapshot_path` is set, each loaded snapshot is also written to
+    that file, and on startup workers start from the file instead of
+    waiting for the database, reloading right after.
+
+    Outside of the app, e.g. in jobs, there is no background task and
+    expired snapshots are reloaded on access.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], List[TileCacheAsset]],
+        interval: float = 900,
+        jitter: float = 0.1,
+        retry_interval: float = 30,
+        snapshot_path: Optional[str] = None,
+        name: str = "tile_cache_registry",
+        load_coverages: Optional[Callable[[], Coverages]] = None,
+    ) -> None:
+        self.load = load
+        self.load_coverages = load_coverages
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_interval = retry_interval
+        self.name = name
+
+        self._registry: Optional[TileCacheRegistry] = None
+        self._loaded_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def age(self) -> float:
+        """Seconds since current snapshot was loaded."""
+        return time.monotonic() - self._loaded_at
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def init_app(self, app) -> None:
+        @app.on_event("startup")
+        async def startup():
+            await self.start()
+
+        @app.on_event("shutdown")
+        async def shutdown():
+            await self.close()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        delay = None
+        if self._registry is None:
+            if self._read_snapshot():
+                delay = 0.0
+            else:
+                await self.refresh()
+        self._task = asyncio.create_task(self._run(delay))
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def get(self) -> TileCacheRegistry:
+        if self._registry is None or (not self.running and self.age > self.interval):
+            self._set(*self._load())
+        assert self._registry is not None
+        metrics.gauge(f"{self.name}.age", self.age)
+        return self._registry
+
+    async def refresh(self) -> bool:
+        """Reload snapshot without blocking the event loop.
+
+        Returns False and keeps the current snapshot if reloading fails.
+        """
+        async with self._lock:
+            try:
+                with metrics.timer(f"{self.name}.refresh"):
+                    assets, coverages = await asyncio.to_thread(self._load)
+            except Exception as e:
+                metrics.increment(f"{self.name}.errors")
+                logger.error(
+                    f"Could not refresh tile cache registry, keep snapshot "
+                    f"of age {self.age:.0f}s: {e}"
+                )
+                return False
+            self._set(assets, coverages)
+            if self.snapshot_path:
+                await asyncio.to_thread(self._write_snapshot, assets)
+            return True
+
+    def _load(self) -> Tuple[List[TileCacheAsset], Optional[Coverages]]:
+        assets = self.load()
+        coverages = self.load_coverages() if self.load_coverages else None
+        return assets, coverages
+
+    def _set(
+        self,
+        assets: List[TileCacheAsset],
+        coverages: Optional[Coverages] = None,
+        age: float = 0,
+    ) -> None:
+        self._registry = TileCacheRegistry(assets, coverages)
+        self._loaded_at = time.monotonic() - age
+        metrics.gauge(f"{self.name}.age", age)
+        metrics.gauge(f"{self.name}.assets", len(self._registry.assets))
+
+    def _read_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                assets = [TileCacheAsset(**asset) for asset in orjson.loads(f.read())]
+            age = time.time() - os.path.getmtime(self.snapshot_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not read tile cache registry snapshot: {e}")
+            return False
+        self._set(assets, age=max(age, 0))
+        logger.info(f"Loaded tile cache registry snapshot of age {age:.0f}s")
+        return True
+
+    def _write_snapshot(self, assets: List[TileCacheAsset]) -> None:
+        assert self.snapshot_path is not None
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps([asset._asdict() for asset in assets]))
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write tile cache registry snapshot: {e}")
+
+    async def _run(self, delay: Optional[float] = None) -> None:
+        if delay is None:
+            delay = self._delay()
+        while True:
+            await asyncio.sleep(delay)
+            delay = self._delay() if await self.refresh() else self.retry_interval
+
+    def _delay(self) -> float:
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+registry_refresher = RegistryRefresher(
+    get_all_tile_caches,
+    GLOBALS.tile_cache_registry_refresh_interval,
+    GLOBALS.tile_cache_registry_refresh_jitter,
+    snapshot_path=GLOBALS.tile_cache_registry_snapshot_path,
+    load_coverages=get_all_coverages,
+)
+
+
+def get_registry() -> TileCacheRegistry:
+    return registry_refresher.get()
+
+
+async def reload_tile_cache_assets() -> None:
+    """Reload registry and drop caches derived from tile cache assets."""
+    await registry_refresher.refresh()
+    get_version_fields.cache_clear()
+
+
+async def _connect_listener() -> asyncpg.Connection:
+    # LISTEN only works on the primary, which is where notifications are sent
+    assert GLOBALS.tile_cache_registry_listen_url is not None
+    return await asyncpg.connect(str(GLOBALS.tile_cache_registry_listen_url))
+
+
+tile_cache_asset_listener = (
+    NotificationListener(
+        GLOBALS.tile_cache_registry_channel,
+        reload_tile_cache_assets,
+        _connect_listener,
+        name="tile_cache_registry.notifications",
+    )
+    if GLOBALS.tile_cache_registry_channel and GLOBALS.tile_cache_registry_listen_url
+    else None
+)
 
-    datasets = {tile_cache["dataset"] for tile_cache in tile_caches[asset_type]}
 
-    return list(datasets)
+def get_datasets(asset_type: str) -> List[str]:
+    return list(get_registry().datasets(asset_type))
 
 
-# @cached(cache=TTLCache(maxsize=15, ttl=900))
 def get_versions(dataset: str, asset_type: str) -> List[str]:
-    tile_caches = get_all_tile_caches()
-    versions = {
-        tile_cache["version"]
-        for tile_cache in tile_caches[asset_type]
-        if tile_cache["dataset"] == dataset
-    }
+    return list(get_registry().versions(dataset, asset_type))
 
-    return list(versions)
 
-
-# @cached(cache=TTLCache(maxsize=15, ttl=900))
 def get_latest_version(dataset: str, asset_type: str) -> Optional[str]:
-    tile_caches = get_all_tile_caches()
-
-    for tile_cache in tile_caches[asset_type]:
-        if tile_cache["dataset"] == dataset and tile_cache["is_latest"]:
-            return tile_cache["version"]
-
-    logger.warning(f"Did not found `latest` version for {asset_type} of {dataset}.")
-    return None
+    latest_version = get_registry().latest_version(dataset, asset_type)
+    if latest_version is None:
+        logger.warning(f"Did not found `latest` version for {asset_type} of {dataset}.")
+    return latest_version
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=900))
 def get_latest_versions() -> List[Dict[str, str]]:
-    tile_caches = get_all_tile_caches()
-    _latest_versions = [
-        {"dataset": tile_cache["dataset"], "version": tile_cache["version"]}
-        for e in list(TileCacheType)
-        for tile_cache in tile_caches[e.value]
-        if tile_cache["is_latest"]
+    latest_versions = [
+        {"dataset": dataset, "version": version}
+        for dataset, version in get_registry().latest_versions()
     ]
-
-    # the above my return duplicates from different tile cache types
-    # To deduplicate, we cannot use sets due to the dicts inside the list
-    latest_versions = list()
-    for latest_version in _latest_versions:
-        if latest_version not in latest_versions:
-            latest_versions.append(latest_version)
-
     if not latest_versions:
         logger.warning("There are no latest versions registered with the API.")
 
@@ -131,67 +472,25 @@ async def get_attributes(dataset, version):
     return await get_version_fields(dataset, version)
 
 
-@cached(cache=TTLCache(maxsize=100, ttl=900))
 def get_max_zoom(
     dataset: str, version: str, implementation: str, asset_type: str
 ) -> Optional[int]:
-    tile_caches = get_all_tile_caches()
-    for tile_cache in tile_caches[asset_type]:
-        if (
-            tile_cache["dataset"] == dataset
-            and tile_cache["version"] == version
-            and tile_cache["implementation"] == implementation
-        ):
-            return tile_cache["max_zoom"]
-
-    return None
+    asset = get_registry().asset(dataset, version, implementation, asset_type)
+    return asset.max_zoom if asset is not None else None
 
 
-@cached(cache=TTLCache(maxsize=100, ttl=900))
 def get_implementations(dataset: str, version: str, asset_type: str) -> List[str]:
-    tile_caches = get_all_tile_caches()
-
-    implementations = [
-        tile_cache["implementation"]
-        for tile_cache in tile_caches[asset_type]
-        if (tile_cache["dataset"] == dataset and tile_cache["version"] == version)
-    ]
-    return implementations
+    return list(get_registry().implementations(dataset, version, asset_type))
 
 
-@cached(cache=TTLCache(maxsize=100, ttl=900))
 def get_dataset_tile_caches(
     dataset: str, version: str, implementation: str
-) -> List[Dict]:
-    tile_caches = get_all_tile_caches()
-    tile_caches_list: List[Dict] = sum(
-        list(tile_caches.values()), []
-    )  # merging all tile cache type values
-
-    dataset_tile_caches = [
-        tile_cache
-        for tile_cache in tile_caches_list
-        if tile_cache["dataset"] == dataset
-        and tile_cache["version"] == version
-        and tile_cache["implementation"]
-    ]
+) -> List[TileCacheAsset]:
+    return list(get_registry().dataset_tile_caches(dataset, version))
 
-    return dataset_tile_caches
 
-
-@cached(cache=TTLCache(maxsize=100, ttl=86400))
 def get_latest_date(schema, version=None):
-    tile_caches = get_all_tile_caches()
-
-    for asset_type_caches in tile_caches.values():
-        for tile_cache in asset_type_caches:
-            if tile_cache["dataset"] == schema:
-                if version and tile_cache["version"] == version:
-                    return tile_cache["max_date"]
-                elif not version and tile_cache["is_latest"]:
-                    return tile_cache["max_date"]
-
-    return None
+    return get_registry().latest_date(schema, version)
 
 
 def default_start(schema: str, delta: Duration):
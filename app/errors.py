@@ -27,6 +27,26 @@ class InvalidResponseError(Exception):
     pass
 
 
+class EmptyTileError(Exception):
+    """Tile is known to be empty without querying the database."""
+
+    pass
+
+
+class ArchiveNotFoundError(Exception):
+    """Tile archive does not exist."""
+
+    pass
+
+
+class OverloadedError(Exception):
+    """Request was shed to protect the database from overload."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 def http_error_handler(exc: HTTPException) -> ORJSONResponse:
 
     message = exc.detail
@@ -0,0 +1,182 @@
+"""Command line jobs which operate on tile pyramids.
+
+Helpers in this module enumerate tiles for an area and zoom range and
+process them with bounded concurrency, optional rate limiting,
+progress reporting and resumable checkpoints.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, Optional, Set
+
+import mercantile
+from fastapi.logger import logger
+from shapely.geometry import box, shape
+from shapely.prepared import prep
+
+from ..models.types import Bounds, Geometry
+
+TileJob = Callable[[mercantile.Tile], Awaitable[str]]
+
+
+def tile_pyramid(
+    bounds: Bounds,
+    min_zoom: int,
+    max_zoom: int,
+    geometry: Optional[Geometry] = None,
+) -> Iterator[mercantile.Tile]:
+    """Enumerate tiles within WGS84 bounds for given zoom range.
+
+    If a geometry is provided, only tiles intersecting the geometry are
+    returned.
+    """
+    prepared = prep(shape(geometry)) if geometry else None
+
+    for tile in mercantile.tiles(*bounds, zooms=range(min_zoom, max_zoom + 1)):
+        if prepared is None or prepared.intersects(box(*mercantile.bounds(tile))):
+            yield tile
+
+
+class RateLimiter:
+    """Space out calls so that no more than `rate` calls per second
+    start."""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.interval = 1 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(now, self._next) + self.interval
+
+
+class Checkpoint:
+    """Persist position up to which all tiles of a job were processed.
+
+    Tiles finish out of order, so the position only advances once all
+    preceding tiles are done.
+    """
+
+    def __init__(self, path: Optional[str], save_every: int = 100) -> None:
+        self.path = path
+        self.save_every = save_every
+        self.position = self._load()
+
+        self._done: Set[int] = set()
+        self._unsaved = 0
+
+    def done(self, index: int) -> None:
+        self._done.add(index)
+        while self.position in self._done:
+            self._done.remove(self.position)
+            self.position += 1
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self) -> None:
+        self._unsaved = 0
+        if not self.path:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"position": self.position}, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> int:
+        if not self.path or not os.path.isfile(self.path):
+            return 0
+        with open(self.path) as f:
+            return json.load(f)["position"]
+
+
+class Progress:
+    def __init__(self, total: Optional[int], log_interval: float = 10) -> None:
+        self.total = total
+        self.log_interval = log_interval
+        self.counts: Dict[str, int] = Counter()
+
+        self._start = time.monotonic()
+        self._last_log = self._start
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self._start
+        return self.processed / elapsed if elapsed else 0.0
+
+    def update(self, status: str) -> None:
+        self.counts[status] += 1
+        if time.monotonic() - self._last_log >= self.log_interval:
+            self.log()
+
+    def log(self) -> None:
+        self._last_log = time.monotonic()
+        total = f"/{self.total}" if self.total is not None else ""
+        counts = ", ".join(
+            f"{key}: {value}" for key, value in sorted(self.counts.items())
+        )
+        logger.info(
+            f"Processed {self.processed}{total} tiles ({counts}) "
+            f"at {self.throughput:.1f} tiles/s"
+        )
+
+
+async def run_tile_jobs(
+    tiles: Iterable[mercantile.Tile],
+    job: TileJob,
+    concurrency: int = 10,
+    rate: Optional[float] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    total: Optional[int] = None,
+) -> Progress:
+    """Run job for every tile with bounded concurrency.
+
+    Jobs return a status string which is counted in the progress
+    report. Failing jobs are logged and counted as `failed`, and are not
+    checkpointed, so a resumed run starts again at the first failed
+    tile.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    progress = Progress(total)
+    limiter = RateLimiter(rate)
+
+    # Skip tiles already processed in a previous run
+    if checkpoint.position:
+        logger.info(f"Resume at tile {checkpoint.position}")
+    queue = itertools.islice(enumerate(tiles), checkpoint.position, None)
+
+    async def worker():
+        for index, tile in queue:
+            await limiter.wait()
+            try:
+                status = await job(tile)
+            except Exception as e:
+                logger.error(f"Failed to process tile {tile}: {e}")
+                status = "failed"
+            progress.update(status)
+            if status != "failed":
+                checkpoint.done(index)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    checkpoint.save()
+    progress.log()
+    return progress
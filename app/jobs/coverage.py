@@ -0,0 +1,117 @@
+"""Build coverage index of a dynamic vector tile dataset version.
+
+Tiles of max zoom are marked as covered if they intersect the bounding
+box of any feature, which never misses a tile with features. Vector
+tiles of uncovered tiles are answered without querying the database.
+Rebuild the coverage whenever features are added to a version.
+
+Example:
+
+    python -m app.jobs.coverage umd_modis_burned_areas v202003 --zoom 10 \
+        --dsn postgresql://writer@localhost/geostore
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import asyncpg
+from fastapi.logger import logger
+
+from ..crud.async_db.vector_tiles.coverage import Coverage, coverage_table_name
+from ..crud.async_db.vector_tiles.overviews import WEB_MERCATOR_WIDTH
+from ..settings.globals import GLOBALS
+
+
+def covered_tiles_select(schema_name: str, table_name: str, zoom: int) -> str:
+    """SQL selecting x, y of tiles at zoom intersecting feature bounding
+    boxes."""
+    half = WEB_MERCATOR_WIDTH / 2
+    width = WEB_MERCATOR_WIDTH / 2**zoom
+    max_index = 2**zoom - 1
+
+    def index(expression: str) -> str:
+        return f"LEAST(GREATEST(floor({expression} / {width})::int, 0), {max_index})"
+
+    return f"""SELECT DISTINCT x, y FROM (
+            SELECT {index(f"ST_XMin(geom_wm) + {half}")} AS x_min,
+                {index(f"ST_XMax(geom_wm) + {half}")} AS x_max,
+                {index(f"{half} - ST_YMax(geom_wm)")} AS y_min,
+                {index(f"{half} - ST_YMin(geom_wm)")} AS y_max
+            FROM "{schema_name}"."{table_name}"
+            WHERE geom_wm IS NOT NULL
+        ) AS bounds,
+        generate_series(x_min, x_max) AS x,
+        generate_series(y_min, y_max) AS y"""
+
+
+async def build_coverage(
+    conn: asyncpg.Connection,
+    schema_name: str,
+    table_name: str,
+    zoom: int,
+    grant_select: Optional[str] = None,
+) -> Coverage:
+    start = time.monotonic()
+    rows = await conn.fetch(covered_tiles_select(schema_name, table_name, zoom))
+    coverage = Coverage.from_tiles(((row["x"], row["y"]) for row in rows), zoom)
+
+    coverage_table = coverage_table_name(table_name)
+    async with conn.transaction():
+        await conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS "{schema_name}"."{coverage_table}" (
+                    zoom integer PRIMARY KEY,
+                    bitmap bytea NOT NULL
+                )"""
+        )
+        await conn.execute(f'DELETE FROM "{schema_name}"."{coverage_table}"')
+        await conn.executemany(
+            f'INSERT INTO "{schema_name}"."{coverage_table}" (zoom, bitmap) VALUES ($1, $2)',
+            list(coverage.bitmaps.items()),
+        )
+        if grant_select:
+            await conn.execute(
+                f'GRANT SELECT ON "{schema_name}"."{coverage_table}" TO "{grant_select}"'
+            )
+
+    logger.info(
+        f"Built coverage of {schema_name}.{table_name} with {len(rows)} tiles "
+        f"at zoom {zoom} in {time.monotonic() - start:.1f}s"
+    )
+    return coverage
+
+
+async def main(args: argparse.Namespace) -> None:
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await build_coverage(
+            conn, args.dataset, args.version, args.zoom, args.grant_select
+        )
+    finally:
+        await conn.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dataset", help="Dynamic vector tile dataset")
+    parser.add_argument("version", help="Dataset version")
+    parser.add_argument(
+        "--zoom", type=int, default=10, help="Max zoom level of coverage index"
+    )
+    parser.add_argument(
+        "--dsn",
+        default=str(GLOBALS.database_config.url) if GLOBALS.database_config else None,
+        help="Database URL. Defaults to the database of the API.",
+    )
+    parser.add_argument(
+        "--grant-select", metavar="ROLE", help="Role to grant read access to"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.setLevel(logging.INFO)
+    asyncio.run(main(parse_args()))
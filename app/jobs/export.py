@@ -0,0 +1,280 @@
+"""Export dynamic tiles of an area to an MBTiles or PMTiles archive.
+
+Vector tiles are rendered with the same queries as the dynamic vector
+tile routes, raster tiles through the same raster tiler Lambda function
+as the dynamic raster tile routes. Tiles are rendered with bounded
+concurrency and streamed into the archive as they finish. Empty tiles
+are skipped and tiles with identical data are stored once.
+
+Example:
+
+    python -m app.jobs.export nasa_viirs_fire_alerts v20240101 viirs.pmtiles \
+        --bbox -80 -20 -40 10 --min-zoom 0 --max-zoom 6 \
+        --start-date 2024-01-01 --end-date 2024-01-07
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import Any, Dict, Union
+
+import mercantile
+from fastapi import HTTPException
+from fastapi.logger import logger
+
+from ..application import db
+from ..crud.async_db.vector_tiles import MvtTable, get_tile, nasa_viirs_fire_alerts
+from ..crud.async_db.vector_tiles.coverage import check_coverage
+from ..crud.async_db.vector_tiles.filters import date_filter, filter_gt
+from ..crud.async_db.vector_tiles.metatiles import tile_bounds
+from ..crud.sync_db.tile_cache_assets import get_attributes
+from ..errors import EmptyTileError
+from ..models.enumerators.nasa_viirs_fire_alerts.supported_attributes import (
+    SupportedAttribute,
+    default_attributes,
+)
+from ..models.types import Bounds
+from ..routes.raster_tiles import get_lambda_tile
+from ..utils.compression import compress
+from ..utils.mbtiles import MBTilesWriter
+from ..utils.pmtiles import (
+    COMPRESSION_GZIP,
+    COMPRESSION_NONE,
+    TILE_TYPE_MVT,
+    TILE_TYPE_PNG,
+    PMTilesWriter,
+)
+from . import run_tile_jobs, tile_pyramid
+from .seed import add_filter_arguments, tile_payload
+
+# Web Mercator covers latitudes up to this value
+MAX_LATITUDE = 85.0511287798
+
+# Datasets with their own vector tile routes, which require a date range
+DATED_DATASETS = ("nasa_viirs_fire_alerts", "umd_modis_burned_areas")
+
+TileWriter = Union[MBTilesWriter, PMTilesWriter]
+
+
+async def render_vector_tile(args: argparse.Namespace, tile: mercantile.Tile) -> bytes:
+    """Render vector tile with the query of its dynamic vector tile
+    route."""
+    bbox = tile_bounds((tile.x, tile.y, tile.z))
+    check_coverage(args.dataset, args.version, bbox)
+
+    if args.dataset == "nasa_viirs_fire_alerts":
+        filters = [
+            nasa_viirs_fire_alerts.confidence_filter(args.high_confidence_only),
+            date_filter("alert__date", args.start_date, args.end_date),
+        ]
+        attributes = (
+            [SupportedAttribute(a) for a in args.include_attribute]
+            if args.include_attribute
+            else default_attributes
+        )
+        response = await nasa_viirs_fire_alerts.get_aggregated_tile(
+            args.version,
+            bbox,
+            4096,
+            attributes,
+            [f for f in filters if f is not None],
+            rollup=True,
+            end_date=args.end_date,
+        )
+        return response.body
+
+    if args.dataset == "umd_modis_burned_areas":
+        filters = [date_filter("alert__date", args.start_date, args.end_date)]
+        if tile.z < 7:
+            filters.append(filter_gt("gfw_area__ha", 25))
+        columns = [db.column("alert__date")]
+    else:
+        filters = list()
+        attributes = await get_attributes(args.dataset, args.version)
+        columns = [
+            db.column(attribute)
+            for attribute in attributes
+            if not args.include_attribute or attribute in args.include_attribute
+        ]
+
+    table = MvtTable(args.dataset, args.version, bbox, 4096, columns, filters)
+    response = await get_tile(table, args.dataset)
+    return response.body
+
+
+async def render_raster_tile(args: argparse.Namespace, tile: mercantile.Tile) -> bytes:
+    """Render raster tile with the payload of its dynamic raster tile
+    route."""
+    payload, _ = tile_payload(args, tile)
+    try:
+        return await get_lambda_tile(payload)
+    except HTTPException as e:
+        if e.status_code == 404:
+            raise EmptyTileError
+        raise
+
+
+async def export_tile(
+    args: argparse.Namespace, writer: TileWriter, tile: mercantile.Tile
+) -> str:
+    render = render_raster_tile if args.tile_type == "raster" else render_vector_tile
+    try:
+        data = await render(args, tile)
+    except EmptyTileError:
+        return "empty"
+    if not data:
+        return "empty"
+
+    if args.tile_type == "vector":
+        data = compress(data, "gzip")
+    return "written" if writer.write(tile.z, tile.x, tile.y, data) else "duplicate"
+
+
+def open_archive(args: argparse.Namespace, bounds: Bounds) -> TileWriter:
+    vector = args.tile_type == "vector"
+    name = f"{args.dataset} {args.version}"
+    metadata: Dict[str, Any] = {
+        "name": name,
+        "format": "pbf" if vector else "png",
+        "bounds": ",".join(str(c) for c in bounds),
+        "minzoom": args.min_zoom,
+        "maxzoom": args.max_zoom,
+    }
+    vector_layers = [{"id": args.dataset, "fields": {}}]
+
+    if args.format == "mbtiles":
+        if vector:
+            metadata["json"] = json.dumps({"vector_layers": vector_layers})
+        return MBTilesWriter(
+            args.output, {key: str(value) for key, value in metadata.items()}
+        )
+
+    if vector:
+        metadata["vector_layers"] = vector_layers
+    return PMTilesWriter(
+        args.output,
+        tile_type=TILE_TYPE_MVT if vector else TILE_TYPE_PNG,
+        tile_compression=COMPRESSION_GZIP if vector else COMPRESSION_NONE,
+        metadata=metadata,
+        bounds=bounds,
+        dedup_size=args.dedup_size,
+    )
+
+
+async def export(args: argparse.Namespace) -> None:
+    west, south, east, north = args.bbox
+    bounds = (
+        west,
+        max(south, -MAX_LATITUDE),
+        east,
+        min(north, MAX_LATITUDE),
+    )
+    total = sum(1 for _ in tile_pyramid(bounds, args.min_zoom, args.max_zoom))
+    logger.info(
+        f"Export {total} tiles of {args.dataset}/{args.version} "
+        f"for zoom levels {args.min_zoom} to {args.max_zoom} to {args.output}"
+    )
+
+    config = db.config
+    if args.tile_type == "vector":
+        await db.set_bind(
+            config["dsn"],
+            min_size=1,
+            max_size=args.concurrency,
+            ssl=config["ssl"],
+            **config["kwargs"],
+        )
+    try:
+        with open_archive(args, bounds) as writer:
+            progress = await run_tile_jobs(
+                tile_pyramid(bounds, args.min_zoom, args.max_zoom),
+                partial(export_tile, args, writer),
+                concurrency=args.concurrency,
+                rate=args.rate,
+                total=total,
+            )
+    finally:
+        if args.tile_type == "vector":
+            await db.pop_bind().close()
+
+    if progress.counts["failed"]:
+        raise SystemExit(f"Failed to export {progress.counts['failed']} tiles")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dataset", help="Dynamic tile dataset")
+    parser.add_argument("version", help="Dataset version")
+    parser.add_argument("output", help="Path of archive to write")
+    parser.add_argument(
+        "--format",
+        choices=["mbtiles", "pmtiles"],
+        help="Archive format. Defaults to the extension of the output path.",
+    )
+    parser.add_argument(
+        "--tile-type",
+        choices=["vector", "raster"],
+        default="vector",
+        help="Export dynamic vector or raster tiles",
+    )
+    parser.add_argument(
+        "--bbox",
+        nargs=4,
+        type=float,
+        required=True,
+        metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+        help="Bounding box in WGS84",
+    )
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, required=True)
+
+    parser.add_argument(
+        "--implementation",
+        help="Raster tile cache implementation. If not set, tiles are rendered using filter options.",
+    )
+    filters = add_filter_arguments(parser)
+    filters.add_argument(
+        "--include-attribute",
+        action="append",
+        help="Vector tile attribute to include (repeatable). Defaults to all attributes.",
+    )
+    filters.add_argument(
+        "--high-confidence-only",
+        action="store_true",
+        help="Only show high confidence fire alerts",
+    )
+
+    parser.add_argument(
+        "--concurrency", type=int, default=10, help="Max number of parallel renders"
+    )
+    parser.add_argument("--rate", type=float, help="Max number of renders per second")
+    parser.add_argument(
+        "--dedup-size",
+        type=int,
+        default=100_000,
+        help="Number of distinct tiles remembered for deduplication in PMTiles archives",
+    )
+
+    args = parser.parse_args(argv)
+    if args.format is None:
+        if args.output.endswith(".mbtiles"):
+            args.format = "mbtiles"
+        elif args.output.endswith(".pmtiles"):
+            args.format = "pmtiles"
+        else:
+            parser.error("Cannot tell archive format from output path, use --format")
+    if (
+        args.tile_type == "vector"
+        and args.dataset in DATED_DATASETS
+        and not (args.start_date and args.end_date)
+    ):
+        parser.error(f"Dataset {args.dataset} requires --start-date and --end-date")
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.setLevel(logging.INFO)
+    asyncio.run(export(parse_args()))
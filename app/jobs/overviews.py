@@ -0,0 +1,143 @@
+"""Build overview tables of a dynamic vector tile dataset version.
+
+Overview tables are copies of the base table with simplified geometries
+and without features too small to show at the zoom levels they serve.
+Zoom bands are taken from the overviews registered for the dataset in
+`MVT_OPTIONS`. Existing overview tables are replaced.
+
+Requires a database user which can create tables in the dataset schema.
+
+Example:
+
+    python -m app.jobs.overviews umd_modis_burned_areas v202003 \
+        --dsn postgresql://writer@localhost/geostore
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+import asyncpg
+from fastapi.logger import logger
+
+from ..crud.async_db.vector_tiles import mvt_options
+from ..crud.async_db.vector_tiles.overviews import Overview
+from ..settings.globals import GLOBALS
+
+
+async def get_columns(
+    conn: asyncpg.Connection, schema_name: str, table_name: str
+) -> List[str]:
+    rows = await conn.fetch(
+        """SELECT column_name FROM information_schema.columns
+            WHERE table_schema = $1 AND table_name = $2
+            ORDER BY ordinal_position""",
+        schema_name,
+        table_name,
+    )
+    if not rows:
+        raise ValueError(f"Table {schema_name}.{table_name} does not exist.")
+    return [row["column_name"] for row in rows]
+
+
+def overview_select(
+    schema_name: str, table_name: str, columns: List[str], overview: Overview
+) -> str:
+    """SQL selecting generalised features of base table for overview."""
+    unit = overview.tile_unit()
+    select = [
+        f"ST_SimplifyPreserveTopology(geom_wm, {unit * overview.simplify}) AS geom_wm"
+        if column == "geom_wm"
+        else f'"{column}"'
+        for column in columns
+    ]
+    width = "ST_XMax(geom_wm) - ST_XMin(geom_wm)"
+    height = "ST_YMax(geom_wm) - ST_YMin(geom_wm)"
+
+    return f"""SELECT {", ".join(select)}
+        FROM "{schema_name}"."{table_name}"
+        WHERE GREATEST({width}, {height}) >= {unit * overview.min_size}"""
+
+
+async def build_overview(
+    conn: asyncpg.Connection,
+    schema_name: str,
+    table_name: str,
+    overview: Overview,
+    grant_select: Optional[str] = None,
+) -> None:
+    columns = await get_columns(conn, schema_name, table_name)
+    if "geom_wm" not in columns:
+        raise ValueError(f"Table {schema_name}.{table_name} has no column geom_wm.")
+
+    overview_name = overview.table_name(table_name)
+    tmp_name = f"{overview_name}__tmp"
+    start = time.monotonic()
+
+    # Build into a temporary table first, so that tiles can be served
+    # from the previous overview in the meantime
+    await conn.execute(f'DROP TABLE IF EXISTS "{schema_name}"."{tmp_name}"')
+    await conn.execute(
+        f'CREATE TABLE "{schema_name}"."{tmp_name}" AS '
+        + overview_select(schema_name, table_name, columns, overview)
+    )
+    await conn.execute(
+        f'CREATE INDEX ON "{schema_name}"."{tmp_name}" USING gist (geom_wm)'
+    )
+    await conn.execute(f'ANALYZE "{schema_name}"."{tmp_name}"')
+    if grant_select:
+        await conn.execute(
+            f'GRANT SELECT ON "{schema_name}"."{tmp_name}" TO "{grant_select}"'
+        )
+
+    async with conn.transaction():
+        await conn.execute(f'DROP TABLE IF EXISTS "{schema_name}"."{overview_name}"')
+        await conn.execute(
+            f'ALTER TABLE "{schema_name}"."{tmp_name}" RENAME TO "{overview_name}"'
+        )
+
+    count = await conn.fetchval(
+        f'SELECT count(*) FROM "{schema_name}"."{overview_name}"'
+    )
+    logger.info(
+        f"Built overview {schema_name}.{overview_name} with {count} features "
+        f"in {time.monotonic() - start:.1f}s"
+    )
+
+
+async def build_overviews(args: argparse.Namespace) -> None:
+    overviews = mvt_options(args.dataset).overviews
+    if not overviews:
+        raise SystemExit(f"No overviews registered for dataset {args.dataset}")
+
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        for overview in overviews:
+            await build_overview(
+                conn, args.dataset, args.version, overview, args.grant_select
+            )
+    finally:
+        await conn.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dataset", help="Dynamic vector tile dataset")
+    parser.add_argument("version", help="Dataset version")
+    parser.add_argument(
+        "--dsn",
+        default=str(GLOBALS.database_config.url) if GLOBALS.database_config else None,
+        help="Database URL. Defaults to the database of the API.",
+    )
+    parser.add_argument(
+        "--grant-select", metavar="ROLE", help="Role to grant read access to"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.setLevel(logging.INFO)
+    asyncio.run(build_overviews(parse_args()))
@@ -0,0 +1,204 @@
+"""Pre-render dynamic raster tiles and copy them to the tile cache.
+
+Tiles are rendered through the same raster tiler Lambda function and
+written to the same keys as tiles created on demand by the dynamic
+raster tile routes. Tiles which already exist in the tile cache are
+skipped, which together with the checkpoint file makes seeding
+resumable.
+
+Example:
+
+    python -m app.jobs.seed umd_glad_landsat_alerts v20210101 \
+        --bbox -80 -20 -40 10 --min-zoom 0 --max-zoom 8 \
+        --start-date 2021-01-01 --confirmed-only
+"""
+
+import argparse
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+import aioboto3
+import mercantile
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+from fastapi.logger import logger
+
+from ..models.enumerators.attributes import TcdEnum
+from ..models.types import Bounds
+from ..routes.dynamic_deforestation_alerts_tile import deforestation_alert_tile_payload
+from ..routes.raster_tiles import copy_tile, get_lambda_tile, raster_tile_payload
+from ..routes.umd_tree_cover_loss.raster_tiles import tree_cover_loss_tile_payload
+from ..settings.globals import GLOBALS
+from ..utils import rw_api
+from . import Checkpoint, run_tile_jobs, tile_pyramid
+
+DEFORESTATION_ALERT_DATASETS = [
+    "umd_glad_landsat_alerts",
+    "umd_glad_sentinel2_alerts",
+    "wur_radd_alerts",
+]
+
+
+def tile_payload(
+    args: argparse.Namespace, tile: mercantile.Tile
+) -> Tuple[Dict[str, Any], str]:
+    """Lambda payload and tile cache implementation for a tile.
+
+    Payloads and implementation names match those of the dynamic raster
+    tile routes, so that seeded tiles are found by later requests.
+    """
+    xyz = (tile.x, tile.y, tile.z)
+    query_hash: Optional[str]
+
+    if args.dataset == "umd_tree_cover_loss" and not args.implementation:
+        payload, query_hash = tree_cover_loss_tile_payload(
+            args.version,
+            None,
+            xyz,
+            args.start_year,
+            args.end_year,
+            TcdEnum(args.tcd),
+            None,
+        )
+    elif args.dataset in DEFORESTATION_ALERT_DATASETS and not args.implementation:
+        payload, query_hash = deforestation_alert_tile_payload(
+            args.dataset,
+            args.version,
+            None,
+            xyz,
+            args.start_date,
+            args.end_date,
+            args.confirmed_only,
+        )
+    else:
+        payload = raster_tile_payload(
+            args.dataset, args.version, args.implementation or "default", xyz
+        )
+        query_hash = None
+
+    return payload, query_hash or payload["implementation"]
+
+
+async def seed_tile(args: argparse.Namespace, s3_client, tile: mercantile.Tile) -> str:
+    payload, implementation = tile_payload(args, tile)
+    key = (
+        f"{args.dataset}/{args.version}/{implementation}/{tile.z}/{tile.x}/{tile.y}.png"
+    )
+
+    if not args.overwrite:
+        try:
+            await s3_client.head_object(Bucket=GLOBALS.bucket, Key=key)
+        except ClientError:
+            pass
+        else:
+            return "skipped"
+
+    try:
+        png_data = await get_lambda_tile(payload)
+    except HTTPException as e:
+        if e.status_code == 404:
+            return "empty"
+        raise
+
+    await copy_tile(png_data, key)
+    return "rendered"
+
+
+async def seed(args: argparse.Namespace) -> None:
+    geometry = None
+    bounds: Bounds
+    if args.geostore_id:
+        geometry = await rw_api.get_geostore_geometry(args.geostore_id)
+        bounds = mercantile.geojson_bounds(geometry)
+    else:
+        bounds = tuple(args.bbox)  # type: ignore
+
+    total = sum(1 for _ in tile_pyramid(bounds, args.min_zoom, args.max_zoom, geometry))
+    tiles = tile_pyramid(bounds, args.min_zoom, args.max_zoom, geometry)
+    logger.info(
+        f"Seed {total} tiles of {args.dataset}/{args.version} "
+        f"for zoom levels {args.min_zoom} to {args.max_zoom}"
+    )
+
+    session = aioboto3.Session()
+    async with session.client(
+        "s3", region_name=GLOBALS.aws_region, endpoint_url=GLOBALS.aws_endpoint_uri
+    ) as s3_client:
+        progress = await run_tile_jobs(
+            tiles,
+            partial(seed_tile, args, s3_client),
+            concurrency=args.concurrency,
+            rate=args.rate,
+            checkpoint=Checkpoint(args.checkpoint),
+            total=total,
+        )
+
+    if progress.counts["failed"]:
+        raise SystemExit(f"Failed to seed {progress.counts['failed']} tiles")
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser) -> argparse._ArgumentGroup:
+    """Filter options of raster tiles, see `tile_payload`."""
+    filters = parser.add_argument_group("filter options")
+    filters.add_argument("--start-date", help="Deforestation alerts start date")
+    filters.add_argument("--end-date", help="Deforestation alerts end date")
+    filters.add_argument(
+        "--confirmed-only",
+        action="store_true",
+        default=None,
+        help="Only show confirmed deforestation alerts",
+    )
+    filters.add_argument("--start-year", type=int, help="Tree cover loss start year")
+    filters.add_argument("--end-year", type=int, help="Tree cover loss end year")
+    filters.add_argument(
+        "--tcd",
+        default=TcdEnum.tcd_30.value,
+        choices=[tcd.value for tcd in TcdEnum],
+        help="Tree cover density threshold for tree cover loss",
+    )
+    return filters
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dataset", help="Raster tile cache dataset")
+    parser.add_argument("version", help="Dataset version")
+    parser.add_argument(
+        "--implementation",
+        help="Tile cache implementation. If not set, tiles are rendered using filter options.",
+    )
+
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument(
+        "--bbox",
+        nargs=4,
+        type=float,
+        metavar=("WEST", "SOUTH", "EAST", "NORTH"),
+        help="Bounding box in WGS84",
+    )
+    area.add_argument("--geostore-id", type=UUID, help="RW geostore ID")
+
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, required=True)
+
+    add_filter_arguments(parser)
+
+    parser.add_argument(
+        "--concurrency", type=int, default=10, help="Max number of parallel renders"
+    )
+    parser.add_argument("--rate", type=float, help="Max number of renders per second")
+    parser.add_argument("--checkpoint", help="File to store progress for resuming")
+    parser.add_argument(
+        "--overwrite", action="store_true", help="Re-render existing tiles"
+    )
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.setLevel(logging.INFO)
+    asyncio.run(seed(parse_args()))
@@ -0,0 +1,149 @@
+"""Build daily rollup tables of NASA VIIRS fire alerts.
+
+Rollup tables hold the number of alerts and aggregated attributes per
+day, confidence and grid cell, for each grid zoom level in
+`ROLLUP_ZOOMS`. Low zoom vector tiles are answered from rollups instead
+of raw alerts.
+
+Without `--start-date`, rollup tables are rebuilt from scratch and
+replace existing ones. With `--start-date`, rollups of that day and
+later are recomputed, which is how daily updates are applied.
+
+Example:
+
+    python -m app.jobs.viirs_rollups v20240101 --start-date 2024-01-01 \
+        --dsn postgresql://writer@localhost/geostore
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import time
+from typing import Optional
+
+import asyncpg
+from fastapi.logger import logger
+
+from ..crud.async_db.vector_tiles.nasa_viirs_fire_alerts import (
+    ROLLUP_AGGREGATES,
+    ROLLUP_DIMENSIONS,
+    ROLLUP_ZOOMS,
+    SCHEMA,
+    rollup_table_name,
+)
+from ..crud.async_db.vector_tiles.overviews import WEB_MERCATOR_WIDTH
+from ..settings.globals import GLOBALS
+
+
+def rollup_select(version: str, zoom: int, since: bool = False) -> str:
+    """SQL aggregating raw alerts per day and grid cell.
+
+    If `since` is set, only alerts of date `$1` and later are included.
+    """
+    unit = WEB_MERCATOR_WIDTH / 2**zoom / 4096
+    origin = -WEB_MERCATOR_WIDTH / 2
+    select = [
+        *ROLLUP_DIMENSIONS,
+        f"ST_SnapToGrid(geom_wm, {origin}, {origin}, {unit}, {unit}) AS geom_wm",
+        "count(*) AS count",
+    ] + [
+        f'{aggregate} AS "{attribute.value}"'
+        for attribute, (aggregate, _) in ROLLUP_AGGREGATES.items()
+        if aggregate is not None
+    ]
+    where = "WHERE alert__date >= $1" if since else ""
+    group_by = ", ".join(str(i + 1) for i in range(len(ROLLUP_DIMENSIONS) + 1))
+
+    return f"""SELECT {", ".join(select)}
+        FROM "{SCHEMA}"."{version}"
+        {where}
+        GROUP BY {group_by}"""
+
+
+async def build_rollup(
+    conn: asyncpg.Connection,
+    version: str,
+    zoom: int,
+    grant_select: Optional[str] = None,
+) -> None:
+    table_name = rollup_table_name(version, zoom)
+    tmp_name = f"{table_name}__tmp"
+    select = rollup_select(version, zoom)
+
+    # Build into a temporary table first, so that tiles can be served
+    # from the previous rollup in the meantime
+    await conn.execute(f'DROP TABLE IF EXISTS "{SCHEMA}"."{tmp_name}"')
+    await conn.execute(f'CREATE TABLE "{SCHEMA}"."{tmp_name}" AS {select}')
+    await conn.execute(f'CREATE INDEX ON "{SCHEMA}"."{tmp_name}" USING gist (geom_wm)')
+    await conn.execute(f'CREATE INDEX ON "{SCHEMA}"."{tmp_name}" (alert__date)')
+    await conn.execute(f'ANALYZE "{SCHEMA}"."{tmp_name}"')
+    if grant_select:
+        await conn.execute(
+            f'GRANT SELECT ON "{SCHEMA}"."{tmp_name}" TO "{grant_select}"'
+        )
+
+    async with conn.transaction():
+        await conn.execute(f'DROP TABLE IF EXISTS "{SCHEMA}"."{table_name}"')
+        await conn.execute(
+            f'ALTER TABLE "{SCHEMA}"."{tmp_name}" RENAME TO "{table_name}"'
+        )
+
+
+async def update_rollup(
+    conn: asyncpg.Connection, version: str, zoom: int, start_date: datetime.date
+) -> None:
+    table_name = rollup_table_name(version, zoom)
+    async with conn.transaction():
+        await conn.execute(
+            f'DELETE FROM "{SCHEMA}"."{table_name}" WHERE alert__date >= $1',
+            start_date,
+        )
+        await conn.execute(
+            f'INSERT INTO "{SCHEMA}"."{table_name}" '
+            + rollup_select(version, zoom, since=True),
+            start_date,
+        )
+    await conn.execute(f'ANALYZE "{SCHEMA}"."{table_name}"')
+
+
+async def build_rollups(args: argparse.Namespace) -> None:
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        for zoom in ROLLUP_ZOOMS:
+            start = time.monotonic()
+            if args.start_date:
+                await update_rollup(conn, args.version, zoom, args.start_date)
+            else:
+                await build_rollup(conn, args.version, zoom, args.grant_select)
+            logger.info(
+                f"Built rollup {rollup_table_name(args.version, zoom)} "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+    finally:
+        await conn.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("version", help="NASA VIIRS fire alerts version")
+    parser.add_argument(
+        "--start-date",
+        type=datetime.date.fromisoformat,
+        help="Only recompute rollups of this date and later",
+    )
+    parser.add_argument(
+        "--dsn",
+        default=str(GLOBALS.database_config.url) if GLOBALS.database_config else None,
+        help="Database URL. Defaults to the database of the API.",
+    )
+    parser.add_argument(
+        "--grant-select", metavar="ROLE", help="Role to grant read access to"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.setLevel(logging.INFO)
+    asyncio.run(build_rollups(parse_args()))
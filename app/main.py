@@ -4,7 +4,6 @@ import logging
 
 from fastapi.exceptions import HTTPException, RequestValidationError
 from fastapi.logger import logger
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.requests import Request
 from fastapi.responses import ORJSONResponse
@@ -14,9 +13,22 @@ from starlette.middleware.cors import CORSMiddleware
 from asyncio.exceptions import TimeoutError as AsyncTimeoutError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from app.errors import http_error_handler
-from .middleware import no_cache_response_header
+from app.errors import EmptyTileError, OverloadedError, http_error_handler
+from .middleware import (
+    compressed_response,
+    conditional_tile_response,
+    no_cache_response_header,
+    tile_cache_response,
+)
 from .application import app
+from .responses import VectorTileResponse
+from .cache import shared_tile_cache
+from .tile_archives import tile_archives
+from .crud.sync_db.tile_cache_assets import (
+    get_registry,
+    registry_refresher,
+    tile_cache_asset_listener,
+)
 from .routes import (
     esri_vector_tile_server,
     raster_tiles,
@@ -71,6 +83,15 @@ ROUTERS = (
 for r in ROUTERS:
     app.include_router(r)
 
+raster_tiles.tile_cache_writer.init_app(app)
+if shared_tile_cache is not None:
+    shared_tile_cache.init_app(app)
+tile_archives.init_app(app)
+planet_raster_tiles.init_app(app)
+registry_refresher.init_app(app)
+if tile_cache_asset_listener is not None:
+    tile_cache_asset_listener.init_app(app)
+
 
 # titiler routes
 app.include_router(
@@ -88,7 +109,9 @@ app.include_router(
 ## Middleware
 #####################
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(BaseHTTPMiddleware, dispatch=tile_cache_response)
+app.add_middleware(BaseHTTPMiddleware, dispatch=conditional_tile_response)
+app.add_middleware(BaseHTTPMiddleware, dispatch=compressed_response)
 app.add_middleware(BaseHTTPMiddleware, dispatch=no_cache_response_header)
 app.add_middleware(
     CORSMiddleware,
@@ -103,6 +126,26 @@ app.add_middleware(
 ################
 
 
+@app.exception_handler(EmptyTileError)
+async def empty_tile_handler(
+    request: Request, exc: EmptyTileError
+) -> VectorTileResponse:
+    """Return empty vector tile for tiles known to have no features."""
+    return VectorTileResponse(content=b"", status_code=200)
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_error_handler(
+    request: Request, exc: OverloadedError
+) -> ORJSONResponse:
+    """Ask clients to retry shed requests later."""
+    return ORJSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={"status": "error", "message": str(exc)},
+    )
+
+
 @app.exception_handler(AsyncTimeoutError)
 async def timeout_error_handler(
     request: Request, exc: AsyncTimeoutError
@@ -185,8 +228,15 @@ tags_metadata = [
 ]
 
 
+# Allowed datasets and versions in the schema follow the tile cache registry
+openapi_registry = None
+
+
 def custom_openapi(openapi_prefix: str = ""):
-    if app.openapi_schema:
+    global openapi_registry
+
+    registry = get_registry()
+    if app.openapi_schema and registry is openapi_registry:
         return app.openapi_schema
 
     openapi_schema = get_openapi(
@@ -210,6 +260,7 @@ def custom_openapi(openapi_prefix: str = ""):
     ]
 
     app.openapi_schema = openapi_schema
+    openapi_registry = registry
     return app.openapi_schema
 
 
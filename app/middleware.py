@@ -1,4 +1,40 @@
+from hashlib import md5
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
 from fastapi import Request, Response
+from starlette.background import BackgroundTask
+from starlette.datastructures import MutableHeaders
+
+from .cache import (
+    DYNAMIC_TILE_REGEX,
+    is_dynamic_tile,
+    max_age,
+    neighbour_tile_path,
+    neighbour_tiles,
+    shared_tile_cache,
+    tile_cache,
+    tile_cache_key,
+)
+from .cache.lru import CachedResponse
+from .crud.sync_db.tile_cache_assets import default_end, get_latest_date
+from .utils.compression import (
+    ENCODINGS,
+    MIN_SIZE,
+    compress,
+    encode_all,
+    is_compressible,
+    negotiate,
+)
+
+DEFAULT_CACHE_CONTROL = "max-age=31536000"
+
+# Cache-Control headers of dynamic tiles by ETag digest
+_cache_controls: LRUCache = LRUCache(maxsize=65536)
+
+# Datasets whose tile routes default to a date window ending at the
+# latest date of the dataset
+DEFAULT_DATE_WINDOW_DATASETS = ("nasa_viirs_fire_alerts", "umd_modis_burned_areas")
 
 
 async def no_cache_response_header(request: Request, call_next):
@@ -14,7 +50,245 @@ async def no_cache_response_header(request: Request, call_next):
     if request.method == "GET" and request.url.path in no_cache_endpoints:
         response.headers["Cache-Control"] = "no-cache"
     elif request.method == "GET" and response.status_code < 300:
-        max_age = response.headers.get("Cache-Control", "max-age=31536000")
+        max_age = response.headers.get("Cache-Control", DEFAULT_CACHE_CONTROL)
         response.headers["Cache-Control"] = max_age
 
     return response
+
+
+async def tile_cache_response(request: Request, call_next):
+    """This middleware serves dynamic tiles from the tile caches.
+
+    Successful responses and redirects of dynamic tile routes are cached
+    for as long as their Cache-Control header allows. The in-process
+    cache is checked first, then the shared cache (if configured).
+
+    Compressible tiles are compressed once before they are cached, and
+    the variant accepted by the client is served from then on.
+
+    Routes may render neighbour tiles along with the requested one (see
+    vector metatiles), which are cached with the same headers.
+    """
+
+    if request.method != "GET" or not is_dynamic_tile(request.url.path):
+        return await call_next(request)
+
+    key = tile_cache_key(request.url.path, request.query_params.multi_items())
+    cached = tile_cache.get(key)
+    if cached is None and shared_tile_cache is not None:
+        shared = await shared_tile_cache.get(key)
+        if shared is not None:
+            cached, ttl = shared
+            tile_cache.set(key, cached, ttl)
+
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    neighbours: Dict[Tuple[int, int, int], bytes] = dict()
+    token = neighbour_tiles.set(neighbours)
+    try:
+        response: Response = await call_next(request)
+    finally:
+        neighbour_tiles.reset(token)
+    if response.status_code >= 400:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+    headers = [
+        (name, value)
+        for name, value in response.headers.items()
+        if name != "content-length"
+    ]
+    ttl = max_age(response.headers.get("Cache-Control", DEFAULT_CACHE_CONTROL))
+    cached = _cache_entry(response.status_code, headers, body)
+    entries = [(key, cached)]
+    if response.status_code == 200:
+        for (x, y, z), tile in neighbours.items():
+            path = neighbour_tile_path(request.url.path, x, y, z)
+            if path is not None:
+                neighbour_key = tile_cache_key(path, request.query_params.multi_items())
+                entries.append((neighbour_key, _cache_entry(200, headers, tile)))
+    for entry_key, entry in entries:
+        tile_cache.set(entry_key, entry, ttl)
+
+    return _cached_response(
+        request,
+        cached,
+        background=BackgroundTask(_store_shared, entries, ttl)
+        if shared_tile_cache is not None
+        else None,
+    )
+
+
+def _cache_entry(
+    status_code: int, headers: List[Tuple[str, str]], body: bytes
+) -> CachedResponse:
+    content_type = dict(headers).get("content-type")
+    encoded = (
+        encode_all(body) if status_code == 200 and is_compressible(content_type) else {}
+    )
+    return CachedResponse(status_code, headers, body, encoded)
+
+
+async def _store_shared(entries: List[Tuple[str, CachedResponse]], ttl: int) -> None:
+    assert shared_tile_cache is not None
+    for key, cached in entries:
+        await shared_tile_cache.set(key, cached, ttl)
+
+
+def _cached_response(
+    request: Request,
+    cached: CachedResponse,
+    background: Optional[BackgroundTask] = None,
+) -> Response:
+    """Response with the cached variant accepted by the client."""
+    headers = dict(cached.headers)
+    content = cached.body
+    if cached.encoded:
+        encoding = negotiate(request.headers.get("Accept-Encoding"), cached.encoded)
+        if encoding is not None:
+            content = cached.encoded[encoding]
+            headers["content-encoding"] = encoding
+        headers["vary"] = "Accept-Encoding"
+
+    return Response(
+        content=content,
+        status_code=cached.status_code,
+        headers=headers,
+        background=background,
+    )
+
+
+async def compressed_response(request: Request, call_next):
+    """This middleware compresses responses with the encoding preferred
+    by the client.
+
+    Responses which are already encoded (such as cached tiles), images
+    and small responses are passed through unchanged. Compressible
+    responses always vary by Accept-Encoding, also if sent unencoded.
+    """
+
+    response: Response = await call_next(request)
+    if "content-encoding" in response.headers or not is_compressible(
+        response.headers.get("content-type")
+    ):
+        return response
+
+    response.headers.add_vary_header("Accept-Encoding")
+    encoding = negotiate(request.headers.get("Accept-Encoding"), ENCODINGS)
+    if encoding is None:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+    headers = MutableHeaders(
+        raw=[(name, value) for name, value in response.raw_headers]
+    )
+    if len(body) >= MIN_SIZE:
+        body = compress(body, encoding)
+        headers["content-encoding"] = encoding
+    headers["content-length"] = str(len(body))
+
+    compressed = Response(
+        content=body,
+        status_code=response.status_code,
+        background=response.background,
+    )
+    compressed.raw_headers = headers.raw
+    return compressed
+
+
+async def conditional_tile_response(request: Request, call_next):
+    """This middleware adds strong ETags to dynamic tiles and answers
+    conditional requests.
+
+    The ETag is derived from dataset version, the max date of the
+    version, the default date window if the query does not set both
+    dates, and the normalised query, which together determine the
+    content of a tile, and is suffixed with the content encoding of the
+    response. If the client already holds the current tile in any
+    encoding, a 304 response is returned before any tile is rendered.
+
+    The 304 response carries the Cache-Control header of the tile, which
+    depends on the route and query. It is remembered for tiles rendered
+    before, otherwise the tile is rendered once to learn it.
+    """
+
+    match = DYNAMIC_TILE_REGEX.match(request.url.path)
+    if request.method != "GET" or match is None:
+        return await call_next(request)
+
+    digest = tile_digest(
+        match.group("dataset"),
+        match.group("version"),
+        request.url.path,
+        request.query_params.multi_items(),
+    )
+
+    etag = _matching_etag(
+        request.headers.get("If-None-Match"),
+        [_etag(digest, encoding) for encoding in (None, *ENCODINGS)],
+    )
+    cache_control = _cache_controls.get(digest)
+    if etag is not None and cache_control is not None:
+        return _not_modified(etag, cache_control)
+
+    response: Response = await call_next(request)
+    if response.status_code == 200:
+        cache_control = response.headers.get("Cache-Control", DEFAULT_CACHE_CONTROL)
+        _cache_controls[digest] = cache_control
+        if etag is not None:
+            return _not_modified(etag, cache_control)
+        response.headers["ETag"] = _etag(
+            digest, response.headers.get("content-encoding")
+        )
+
+    return response
+
+
+def tile_digest(
+    dataset: str, version: str, path: str, query: List[Tuple[str, str]]
+) -> str:
+    """Digest of everything determining the content of a dynamic tile."""
+    key = tile_cache_key(path, query)
+    max_date = get_latest_date(dataset, version)
+
+    # Default window follows the latest version of the dataset, which
+    # may not be the requested one
+    params = {name for name, value in query if value}
+    explicit = "start_date" in params and "end_date" in params
+    if dataset in DEFAULT_DATE_WINDOW_DATASETS and not explicit:
+        window = default_end(dataset)
+    else:
+        window = None
+
+    return md5(f"{dataset}/{version}/{max_date}/{window}/{key}".encode()).hexdigest()
+
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={
+            "ETag": etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": cache_control,
+        },
+    )
+
+
+def _etag(digest: str, encoding: Optional[str]) -> str:
+    # Strong ETags must differ between content encodings
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def _matching_etag(if_none_match: Optional[str], etags: Iterable[str]) -> Optional[str]:
+    """First ETag matching If-None-Match header, if any."""
+    etags = list(etags)
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etags[0]
+
+    # Weak comparison, as required for If-None-Match
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    tags |= {tag[2:] for tag in tags if tag.startswith("W/")}
+    return next((etag for etag in etags if etag in tags), None)
@@ -1,6 +1,9 @@
-from aenum import Enum, extend_enum
+from typing import Sequence
+
+from aenum import Enum
 
 from ...crud.sync_db.tile_cache_assets import get_datasets
+from .lazy import LazyEnum
 from .tile_caches import TileCacheType
 
 
@@ -9,37 +12,33 @@ class DeforestationAlertDatasets(str, Enum):
     radd = "wur_radd_alerts"
 
 
-class RasterTileCacheDatasets(str, Enum):
+class RasterTileCacheDatasets(LazyEnum):
     __doc__ = "Raster tile cache datasets"
 
-
-_datasets = get_datasets(TileCacheType.raster_tile_cache)
-for _dataset in _datasets:
-    extend_enum(RasterTileCacheDatasets, _dataset, _dataset)
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        return get_datasets(TileCacheType.raster_tile_cache)
 
 
-class DynamicVectorTileCacheDatasets(str, Enum):
+class DynamicVectorTileCacheDatasets(LazyEnum):
     __doc__ = "Dynamic vector tile cache datasets"
 
-
-_datasets = get_datasets(TileCacheType.dynamic_vector_tile_cache)
-for _dataset in _datasets:
-    extend_enum(DynamicVectorTileCacheDatasets, _dataset, _dataset)
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        return get_datasets(TileCacheType.dynamic_vector_tile_cache)
 
 
-class StaticVectorTileCacheDatasets(str, Enum):
+class StaticVectorTileCacheDatasets(LazyEnum):
     __doc__ = "Static vector tile cache datasets"
 
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        return get_datasets(TileCacheType.static_vector_tile_cache)
 
-_datasets = get_datasets(TileCacheType.static_vector_tile_cache)
-for _dataset in _datasets:
-    extend_enum(StaticVectorTileCacheDatasets, _dataset, _dataset)
 
-
-class COGDatasets(str, Enum):
+class COGDatasets(LazyEnum):
     __doc__ = "Data API datasets with COG assets"
 
-
-_datasets = get_datasets(TileCacheType.cog)
-for _dataset in _datasets:
-    extend_enum(COGDatasets, _dataset, _dataset)
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        return get_datasets(TileCacheType.cog)
@@ -0,0 +1,48 @@
+from typing import Any, Sequence
+
+from pydantic import GetCoreSchemaHandler, GetJsonSchemaHandler
+from pydantic_core import PydanticCustomError, core_schema
+
+
+class LazyEnum(str):
+    """String parameter restricted to a set of values looked up on use.
+
+    Works like a string enum in path and query parameters, but allowed
+    values are read from `values()` when validating and when building
+    the OpenAPI schema. Enums are fixed at import time, which would
+    require loading tile cache assets before routes can be declared,
+    and would not pick up new versions until restart.
+    """
+
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        """Allowed values. Subclasses override this, no value is allowed
+        by default."""
+        return ()
+
+    @classmethod
+    def validate(cls, value: str) -> str:
+        values = cls.values()
+        if value not in values:
+            raise PydanticCustomError(
+                "enum",
+                "Input should be {expected}",
+                {"expected": ", ".join(repr(v) for v in values)},
+            )
+        return value
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: Any, handler: GetCoreSchemaHandler
+    ) -> core_schema.CoreSchema:
+        return core_schema.no_info_after_validator_function(
+            cls.validate, core_schema.str_schema()
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(
+        cls, schema: core_schema.CoreSchema, handler: GetJsonSchemaHandler
+    ) -> dict:
+        json_schema = handler(schema)
+        json_schema["enum"] = list(cls.values())
+        return json_schema
@@ -1,9 +1,9 @@
-from copy import deepcopy
-from typing import Type
+from typing import Sequence, Type
 
-from aenum import Enum, extend_enum
+from aenum import Enum
 
 from app.crud.sync_db.tile_cache_assets import get_versions
+from app.models.enumerators.lazy import LazyEnum
 from app.models.enumerators.tile_caches import TileCacheType
 
 
@@ -12,9 +12,26 @@ class Versions(str, Enum):
     latest = "latest"
 
 
-def get_versions_enum(dataset: str, tile_cache_type: TileCacheType) -> Type[Versions]:
-    _Versions = deepcopy(Versions)
-    versions = get_versions(dataset, tile_cache_type)
-    for version in versions:
-        extend_enum(_Versions, version, version)
-    return _Versions
+class DatasetVersions(LazyEnum):
+    """Versions of a tile cache of a dataset, and `latest`."""
+
+    dataset: str
+    tile_cache_type: TileCacheType
+
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        return ["latest"] + get_versions(cls.dataset, cls.tile_cache_type)
+
+
+def get_versions_enum(
+    dataset: str, tile_cache_type: TileCacheType
+) -> Type[DatasetVersions]:
+    return type(
+        "Versions",
+        (DatasetVersions,),
+        {
+            "__doc__": Versions.__doc__,
+            "dataset": dataset,
+            "tile_cache_type": tile_cache_type,
+        },
+    )
@@ -0,0 +1,110 @@
+"""Listen for PostgreSQL notifications.
+
+`NotificationListener` holds one dedicated connection per worker which
+LISTENs on a channel. Notifications arriving in quick succession, e.g.
+from a release touching many rows, are coalesced into one call of the
+callback. When the connection is lost, it is reopened after a while and
+the callback is called once, since notifications sent in the meantime
+are lost.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+import asyncpg
+from fastapi.logger import logger
+
+from .pool import CONNECTION_ERRORS
+from .utils.metrics import metrics
+
+Connect = Callable[[], Awaitable[asyncpg.Connection]]
+Callback = Callable[[], Awaitable[None]]
+
+
+class NotificationListener:
+    def __init__(
+        self,
+        channel: str,
+        callback: Callback,
+        connect: Connect,
+        debounce: float = 1,
+        reconnect_interval: float = 30,
+        name: str = "notifications",
+    ) -> None:
+        self.channel = channel
+        self.callback = callback
+        self.connect = connect
+        self.debounce = debounce
+        self.reconnect_interval = reconnect_interval
+        self.name = name
+
+        self._notified = asyncio.Event()
+        self._tasks: List[asyncio.Task] = list()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def init_app(self, app) -> None:
+        @app.on_event("startup")
+        async def startup():
+            await self.start()
+
+        @app.on_event("shutdown")
+        async def shutdown():
+            await self.close()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._dispatch()),
+        ]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = list()
+
+    def notify(self, *args) -> None:
+        """Handle notification. Signature of asyncpg listener callbacks."""
+        metrics.increment(f"{self.name}.received")
+        self._notified.set()
+
+    async def _listen(self) -> None:
+        reconnect = False
+        while True:
+            lost = asyncio.Event()
+            connection: Optional[asyncpg.Connection] = None
+            try:
+                connection = await self.connect()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(self.channel, self.notify)
+                logger.info(f"Listening for notifications on {self.channel}")
+                metrics.gauge(f"{self.name}.listening", 1)
+                if reconnect:
+                    # Catch up on notifications missed while disconnected
+                    self._notified.set()
+                await lost.wait()
+                logger.warning(f"Lost connection listening on {self.channel}")
+            except (*CONNECTION_ERRORS, asyncpg.PostgresError) as e:
+                logger.warning(f"Could not listen on {self.channel}: {e!r}")
+            finally:
+                metrics.gauge(f"{self.name}.listening", 0)
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            reconnect = True
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._notified.wait()
+            await asyncio.sleep(self.debounce)
+            self._notified.clear()
+            try:
+                await self.callback()
+            except Exception as e:
+                metrics.increment(f"{self.name}.errors")
+                logger.error(f"Could not handle notification on {self.channel}: {e}")
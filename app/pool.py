@@ -0,0 +1,246 @@
+"""Reader connection pool spread over read replicas.
+
+Gino binds each engine to a single pool. `ReaderPool` implements gino's
+pool interface on top of one asyncpg pool per reader host, so that
+queries are spread over the primary reader and any read replicas.
+
+* Connections are acquired from the healthy host with the fewest
+  connections in use.
+* A background task checks all hosts periodically. Unhealthy hosts are
+  skipped until they answer again; hosts which were down at startup
+  are connected once they come up.
+* Each host pool opens connections on demand up to its max size and
+  closes connections which have been idle for a while, down to its min
+  size.
+* Time spent waiting for a connection and pool usage are reported in
+  the in-process metrics.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+from fastapi.logger import logger
+from gino.dialects.base import Pool
+
+from .utils.metrics import metrics
+
+# Errors which indicate that a host cannot be reached
+CONNECTION_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.InterfaceError,
+)
+
+DEFAULT_PORT = 5432
+
+
+def parse_hosts(hosts: Optional[str]) -> List[Tuple[str, int]]:
+    """Parse comma separated list of `host[:port]`."""
+    parsed: List[Tuple[str, int]] = list()
+    for host in (hosts or "").split(","):
+        host = host.strip()
+        if not host:
+            continue
+        name, _, port = host.partition(":")
+        parsed.append((name, int(port) if port else DEFAULT_PORT))
+    return parsed
+
+
+class HostPool:
+    """Connection pool of a single reader host."""
+
+    def __init__(self, host: str, port: int, **kwargs) -> None:
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self.healthy = False
+        self.in_use = 0
+        self.pool: Optional[asyncpg.Pool] = None
+        self._kwargs = kwargs
+
+    @property
+    def load(self) -> float:
+        """Share of max pool size in use."""
+        assert self.pool is not None
+        return self.in_use / self.pool.get_max_size()
+
+    async def connect(self) -> None:
+        self.pool = await asyncpg.create_pool(
+            host=self.host, port=self.port, **self._kwargs
+        )
+        self.healthy = True
+
+    async def check(self, timeout: float) -> bool:
+        """Check whether host answers queries and update health."""
+        try:
+            if self.pool is None:
+                await asyncio.wait_for(self.connect(), timeout)
+            elif self.in_use < self.pool.get_max_size():
+                # A saturated pool is busy serving queries, which is
+                # evidence enough
+                async with self.pool.acquire(timeout=timeout) as conn:
+                    await conn.fetchval("SELECT 1", timeout=timeout)
+        except CONNECTION_ERRORS as e:
+            self.set_healthy(False, e)
+        else:
+            self.set_healthy(True)
+        return self.healthy
+
+    def set_healthy(self, healthy: bool, error: Optional[Exception] = None) -> None:
+        if healthy and not self.healthy:
+            logger.info(f"Database host {self.name} is healthy again")
+        elif not healthy and self.healthy:
+            logger.warning(f"Database host {self.name} is unhealthy: {error!r}")
+        self.healthy = healthy
+
+    def report(self) -> None:
+        prefix = f"db_pool.{self.name}"
+        metrics.gauge(f"{prefix}.healthy", int(self.healthy))
+        metrics.gauge(f"{prefix}.in_use", self.in_use)
+        if self.pool is not None:
+            metrics.gauge(f"{prefix}.size", self.pool.get_size())
+            metrics.gauge(f"{prefix}.idle", self.pool.get_idle_size())
+
+
+class ReaderPool(Pool):
+    """Gino pool over the reader host of the database URL and replicas.
+
+    Pass as `pool_class` to gino, with replicas and health check interval
+    bound using `functools.partial`. All other keyword arguments are
+    passed to `asyncpg.create_pool` of each host.
+    """
+
+    def __init__(
+        self,
+        url,
+        loop,
+        replicas: Sequence[Tuple[str, int]] = (),
+        health_check_interval: float = 10,
+        health_check_timeout: float = 5,
+        **kwargs,
+    ) -> None:
+        kwargs.update(
+            user=url.username,
+            password=url.password,
+            database=url.database,
+        )
+        if loop is not None:
+            kwargs["loop"] = loop
+
+        hosts = dict.fromkeys([(url.host, url.port or DEFAULT_PORT), *replicas])
+        self.hosts = [HostPool(host, port, **kwargs) for host, port in hosts]
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+
+        self._connections: Dict[Any, HostPool] = dict()
+        self._waiting = 0
+        self._health_check: Optional[asyncio.Task] = None
+
+    async def _init(self) -> "ReaderPool":
+        # The primary reader must be up, replicas may join later
+        primary, *replicas = self.hosts
+        await primary.connect()
+        for host in replicas:
+            try:
+                await host.connect()
+            except CONNECTION_ERRORS as e:
+                host.set_healthy(False)
+                logger.warning(f"Could not connect to database host {host.name}: {e!r}")
+
+        if self.health_check_interval > 0:
+            self._health_check = asyncio.create_task(self._check_health())
+        self._report()
+        return self
+
+    def __await__(self):
+        return self._init().__await__()
+
+    @property
+    def raw_pool(self) -> asyncpg.Pool:
+        return self.hosts[0].pool
+
+    async def acquire(self, *, timeout=None):
+        start = time.monotonic()
+        self._waiting += 1
+        try:
+            conn, host = await self._acquire(timeout)
+        except asyncio.TimeoutError:
+            metrics.increment("db_pool.acquire_timeouts")
+            raise
+        finally:
+            self._waiting -= 1
+            metrics.observe("db_pool.acquire", time.monotonic() - start)
+
+        host.in_use += 1
+        self._connections[conn] = host
+        self._report()
+        return conn
+
+    async def release(self, conn) -> None:
+        host = self._connections.pop(conn)
+        host.in_use -= 1
+        try:
+            await host.pool.release(conn)
+        finally:
+            self._report()
+
+    async def close(self) -> None:
+        if self._health_check is not None:
+            self._health_check.cancel()
+            await asyncio.gather(self._health_check, return_exceptions=True)
+            self._health_check = None
+        await asyncio.gather(
+            *(host.pool.close() for host in self.hosts if host.pool is not None)
+        )
+
+    def repr(self, color) -> str:
+        hosts = ", ".join(
+            f"{host.name} healthy={host.healthy} use={host.in_use}"
+            + (
+                f" cur={host.pool.get_size()} max={host.pool.get_max_size()}"
+                if host.pool is not None
+                else ""
+            )
+            for host in self.hosts
+        )
+        return f"<{self.__class__.__name__} {hosts}>"
+
+    def candidates(self) -> List[HostPool]:
+        """Hosts to acquire connections from, least loaded first.
+
+        If all hosts are unhealthy, all of them are tried anyway.
+        """
+        connected = [host for host in self.hosts if host.pool is not None]
+        healthy = [host for host in connected if host.healthy]
+        return sorted(healthy or connected, key=lambda host: host.load)
+
+    async def _acquire(self, timeout):
+        candidates = self.candidates()
+        for i, host in enumerate(candidates):
+            try:
+                return await host.pool.acquire(timeout=timeout), host
+            except asyncio.TimeoutError:
+                # Pool is exhausted, not broken
+                raise
+            except CONNECTION_ERRORS as e:
+                host.set_healthy(False, e)
+                if i == len(candidates) - 1:
+                    raise
+                metrics.increment("db_pool.failovers")
+
+    async def _check_health(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(
+                *(host.check(self.health_check_timeout) for host in self.hosts)
+            )
+            self._report()
+
+    def _report(self) -> None:
+        metrics.gauge("db_pool.waiting", self._waiting)
+        for host in self.hosts:
+            host.report()
@@ -1,7 +1,10 @@
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
 from xml.dom.minidom import parseString
 from xml.etree.ElementTree import Element, tostring
 
 from fastapi.responses import Response
+from starlette.background import BackgroundTask
 
 
 class VectorTileResponse(Response):
@@ -23,3 +26,42 @@ class XMLResponse(Response):
         pretty_content: str = parseString(tostring(content)).toprettyxml()
 
         return pretty_content.encode(self.charset)
+
+
+class MultipartResponse(Response):
+    """multipart/mixed response with one part per (headers, body) pair.
+
+    Each part carries its Content-Length, so that clients can read parts
+    without scanning for the boundary.
+    """
+
+    media_type = "multipart/mixed"
+
+    def __init__(
+        self,
+        content: List[Tuple[Dict[str, str], bytes]],
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ) -> None:
+        self.boundary = uuid4().hex
+        super().__init__(
+            content=content,
+            status_code=status_code,
+            headers=headers,
+            media_type=f"{self.media_type}; boundary={self.boundary}",
+            background=background,
+        )
+
+    def render(self, content: List[Tuple[Dict[str, str], bytes]]) -> bytes:
+        chunks: List[bytes] = list()
+        for headers, body in content:
+            chunks.append(f"--{self.boundary}\r\n".encode())
+            part_headers = dict(headers, **{"Content-Length": str(len(body))})
+            for name, value in part_headers.items():
+                chunks.append(f"{name}: {value}\r\n".encode())
+            chunks.append(b"\r\n")
+            chunks.append(body)
+            chunks.append(b"\r\n")
+        chunks.append(f"--{self.boundary}--\r\n".encode())
+        return b"".join(chunks)
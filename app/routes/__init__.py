@@ -1,13 +1,17 @@
+import gzip
 import os
-from typing import Optional, Tuple, Union
+import re
+from typing import List, Optional, Tuple, Union
 
 import mercantile
 import pendulum
-from fastapi import Depends, HTTPException, Path, Query, Request, status
+from fastapi import Depends, HTTPException, Path, Query, Request, Response, status
 from fastapi.logger import logger
+from fastapi.responses import RedirectResponse
 from shapely.geometry import box
 
-from ..crud.sync_db.tile_cache_assets import get_versions
+from ..crud.sync_db.tile_cache_assets import get_registry
+from ..errors import ArchiveNotFoundError
 from ..models.enumerators.datasets import (
     COGDatasets,
     DynamicVectorTileCacheDatasets,
@@ -17,11 +21,18 @@ from ..models.enumerators.datasets import (
 from ..models.enumerators.tile_caches import TileCacheType
 from ..models.enumerators.versions import Versions
 from ..models.types import Bounds
+from ..tile_archives import tile_archives
+from ..utils.compression import negotiate
+from ..utils.metrics import metrics
+from ..utils.pmtiles import COMPRESSION_GZIP, COMPRESSION_NONE, MEDIA_TYPES
 
 DATE_REGEX = r"^\d{4}\-(0?[1-9]|1[012])\-(0?[1-9]|[12][0-9]|3[01])$"
 VERSION_REGEX = r"^v\d{1,8}(\.\d{1,3}){0,2}?$|^latest$"
 XYZ_REGEX = r"^\d+(@(2|0.5|0.25)x)?$"
 VERSION_REGEX_NO_LATEST = r"^v\d{1,8}(\.\d{1,3}){0,2}?$"
+TILE_REGEX = re.compile(r"^(\d+)/(\d+)/(\d+)$")
+
+MAX_BATCH_TILES = 64
 
 DATA_LAKE_BUCKET = os.environ.get("DATA_LAKE_BUCKET")
 
@@ -65,6 +76,64 @@ async def vector_xyz(
     return bbox, z, extent
 
 
+async def batch_xyz(
+    tile: Optional[List[str]] = Query(
+        None, description="Tile as `z/x/y`. Repeat to request multiple tiles."
+    ),
+    bbox: Optional[str] = Query(
+        None,
+        description="Request all tiles of zoom level `z` intersecting bounding box "
+        "`west,south,east,north` in WGS 84, instead of listing tiles.",
+    ),
+    z: Optional[int] = Query(
+        None, description="Zoom level of tiles within bounding box", ge=0, le=22
+    ),
+) -> List[Tuple[int, int, int]]:
+    """Tiles of a batch request as z, x, y."""
+    if bool(tile) == (bbox is not None):
+        raise HTTPException(
+            status_code=400, detail="Either list tiles or pass a bounding box."
+        )
+
+    tiles: List[Tuple[int, int, int]] = list()
+    if tile:
+        for t in tile:
+            match = TILE_REGEX.match(t)
+            if match is None:
+                raise HTTPException(
+                    status_code=400, detail=f"Tile `{t}` does not match `z/x/y`."
+                )
+            z_, x, y = (int(i) for i in match.groups())
+            if z_ > 22:
+                raise HTTPException(status_code=400, detail="Max zoom level is 22.")
+            tiles.append((z_, x, y))
+    else:
+        if z is None:
+            raise HTTPException(
+                status_code=400, detail="Zoom level is required with bounding box."
+            )
+        try:
+            west, south, east, north = (float(v) for v in bbox.split(","))  # type: ignore
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Bounding box must be `west,south,east,north`.",
+            )
+        for t in mercantile.tiles(west, south, east, north, [z]):
+            tiles.append((t.z, t.x, t.y))
+            if len(tiles) > MAX_BATCH_TILES:
+                break
+
+    tiles = list(dict.fromkeys(tiles))
+    if len(tiles) > MAX_BATCH_TILES:
+        raise HTTPException(
+            status_code=400, detail=f"Batch is limited to {MAX_BATCH_TILES} tiles."
+        )
+    for z_, x, y in tiles:
+        validate_bbox(*to_bbox(x, y, z_))
+    return tiles
+
+
 async def raster_xyz(
     z: int = Path(..., description="Zoom level", ge=0, le=22),
     x: int = Path(..., description="Tile grid column", ge=0),
@@ -200,17 +269,13 @@ async def optional_implementation_dependency(
 
 
 def validate_tile_cache_version(dataset, version, tile_cache_type) -> None:
-
-    existing_versions = list()
-    versions = get_versions(dataset, tile_cache_type)
-    for v in versions:
-        existing_versions.append(v)
-        if v == version:
-            return
+    registry = get_registry()
+    if registry.has_version(dataset, version, tile_cache_type):
+        return
 
     raise HTTPException(
         status_code=400,
-        detail=f"Unknown version number. {tile_cache_type} of dataset {dataset} has versions {existing_versions}",
+        detail=f"Unknown version number. {tile_cache_type} of dataset {dataset} has versions {list(registry.versions(dataset, tile_cache_type))}",
     )
 
 
@@ -236,3 +301,55 @@ def validate_bbox(left: float, bottom: float, right: float, top: float) -> None:
 
     if left < min_left or bottom < min_bottom or right > max_right or top > max_top:
         raise HTTPException(status_code=400, detail="Tile index is out of bounds")
+
+
+async def static_tile_response(
+    request: Request,
+    dataset: str,
+    version: str,
+    implementation: str,
+    xyz: Tuple[int, int, int],
+    ext: str,
+) -> Response:
+    """Serve static tile from the PMTiles archive of its tile cache.
+
+    Requests for versions without archive, or zoom levels outside of the
+    archive, are redirected to the dynamic tile route.
+    """
+    if not tile_archives.enabled:
+        raise HTTPException(status_code=501, detail="Not implemented.")
+
+    x, y, z = xyz
+    try:
+        archive = await tile_archives.open(dataset, version, implementation)
+    except ArchiveNotFoundError:
+        header = None
+    else:
+        header = await archive.header()
+
+    if header is None or not header.min_zoom <= z <= header.max_zoom:
+        metrics.increment("tile_archives.redirects")
+        url = f"/{dataset}/{version}/dynamic/{z}/{x}/{y}.{ext}"
+        if ext == "png":
+            url += f"?implementation={implementation}"
+        return RedirectResponse(url, status_code=307)
+
+    tile = await archive.get_tile(z, x, y)
+    media_type = MEDIA_TYPES.get(header.tile_type, "application/octet-stream")
+    if tile is None:
+        if ext == "pbf":
+            return Response(content=b"", media_type=media_type)
+        raise HTTPException(status_code=404, detail="Tile not found")
+
+    headers = dict()
+    if header.tile_compression == COMPRESSION_GZIP:
+        if negotiate(request.headers.get("Accept-Encoding"), ["gzip"]):
+            headers["Content-Encoding"] = "gzip"
+        else:
+            tile = gzip.decompress(tile)
+        headers["Vary"] = "Accept-Encoding"
+    elif header.tile_compression != COMPRESSION_NONE:
+        raise HTTPException(
+            status_code=500, detail="Unsupported tile compression of archive."
+        )
+    return Response(content=tile, media_type=media_type, headers=headers)
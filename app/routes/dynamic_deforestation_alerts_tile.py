@@ -1,4 +1,4 @@
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from fastapi import BackgroundTasks
 
@@ -8,6 +8,7 @@ from app.routes.raster_tiles import (
     get_cached_response,
     get_dynamic_raster_tile,
     hash_query_params,
+    raster_tile_payload,
 )
 
 
@@ -22,40 +23,50 @@ async def get_dynamic_deforestation_alert_tile(
     background_tasks: BackgroundTasks,
 ):
 
-    x, y, z = xyz
-
-    payload = {
-        "dataset": dataset,
-        "version": version,
-        "implementation": implementation,
-        "x": x,
-        "y": y,
-        "z": z,
-        "over_zoom": get_max_zoom(
-            dataset, version, implementation, TileCacheType.raster_tile_cache
-        ),
-    }
+    payload, query_hash = deforestation_alert_tile_payload(
+        dataset, version, implementation, xyz, start_date, end_date, confirmed_only
+    )
 
-    if implementation:
+    if query_hash is None:
         return await get_dynamic_raster_tile(payload, implementation, background_tasks)
 
     else:
-        payload.update(
-            implementation="default",
-            start_date=start_date,
-            end_date=end_date,
-            confirmed_only=confirmed_only,
-            filter_type="deforestation_alerts",
-            source="datalake",
-            over_zoom=get_max_zoom(
-                dataset, version, "default", TileCacheType.raster_tile_cache
-            ),
-        )
-        params = {
-            "start_date": start_date,
-            "end_date": end_date,
-            "confirmed_only": confirmed_only,
-        }
-        query_hash = hash_query_params(params)
-
         return await get_cached_response(payload, query_hash, background_tasks)
+
+
+def deforestation_alert_tile_payload(
+    dataset: str,
+    version: str,
+    implementation: Optional[str],
+    xyz: Tuple[int, int, int],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    confirmed_only: Optional[bool],
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Lambda payload and query hash for a deforestation alert tile.
+
+    Query hash is None if tile is rendered for a named implementation.
+    """
+
+    payload = raster_tile_payload(dataset, version, implementation, xyz)
+
+    if implementation:
+        return payload, None
+
+    payload.update(
+        implementation="default",
+        start_date=start_date,
+        end_date=end_date,
+        confirmed_only=confirmed_only,
+        filter_type="deforestation_alerts",
+        source="datalake",
+        over_zoom=get_max_zoom(
+            dataset, version, "default", TileCacheType.raster_tile_cache
+        ),
+    )
+    params = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "confirmed_only": confirmed_only,
+    }
+    return payload, hash_query_params(params)
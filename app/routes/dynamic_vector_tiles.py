@@ -4,25 +4,40 @@ The dynamic nature of the service allows users to apply filters using
 query parameters or to change tile resolution using the `@` operator
 after the `y` index
 """
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
 from asyncpg.exceptions import QueryCanceledError
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.sql import Select, TableClause
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from sqlalchemy.sql import TableClause
 from sqlalchemy.sql.elements import ColumnClause
 
 from ..application import db
-from ..crud.async_db.vector_tiles import get_mvt_table, get_tile
-from ..crud.async_db.vector_tiles.filters import geometry_filter
+from ..cache import max_age, store_tile, tile_cache, tile_cache_key
+from ..cache.lru import CachedResponse
+from ..crud.async_db.vector_tiles import MvtTable, get_tile, get_tiles
+from ..crud.async_db.vector_tiles.coverage import check_coverage
+from ..crud.async_db.vector_tiles.filters import envelope_filter, geometry_filter
 from ..crud.sync_db.tile_cache_assets import get_attributes
+from ..errors import EmptyTileError
+from ..middleware import DEFAULT_CACHE_CONTROL
 from ..models.enumerators.geostore import GeostoreOrigin
 from ..models.types import Bounds
-from ..responses import VectorTileResponse
-from . import dynamic_vector_tile_cache_version_dependency, vector_xyz
+from ..responses import MultipartResponse, VectorTileResponse
+from ..utils.compression import encode_all
+from . import (
+    batch_xyz,
+    dynamic_vector_tile_cache_version_dependency,
+    to_bbox,
+    vector_xyz,
+)
 
 router = APIRouter()
 
+# Datasets with their own tile routes and filters, which generic batches
+# would not match
+DEDICATED_DATASETS = ("nasa_viirs_fire_alerts", "umd_modis_burned_areas")
+
 
 @router.get(
     "/{dataset}/{version}/dynamic/{z}/{x}/{y}.pbf",
@@ -53,6 +68,8 @@ async def dynamic_vector_tile(
     dataset, version = dv
     bbox, _, extent = bbox_z
 
+    check_coverage(dataset, version, bbox)
+
     filters: List[TableClause] = list()
 
     geom_filter: TableClause = await geometry_filter(geostore_id, bbox, geostore_origin)
@@ -60,27 +77,145 @@ async def dynamic_vector_tile(
     if geom_filter is not None:
         filters.append(geom_filter)
 
-    attributes: List[str] = await get_attributes(dataset, version)
+    columns = await _get_columns(dataset, version, include_attribute)
+    table = MvtTable(dataset, version, bbox, extent, columns, filters)
 
-    # if no attributes specified get all feature info fields
-    if not include_attribute:
-        columns: List[ColumnClause] = [db.column(attribute) for attribute in attributes]
-    # otherwise run provided list against feature info list and keep common elements
+    try:
+        tile = await get_tile(table, name=dataset)
+    except QueryCanceledError:
+        raise HTTPException(
+            status_code=524,
+            detail="A timeout occurred while processing the request. Request canceled.",
+        )
     else:
-        columns = [
-            db.column(attribute)
-            for attribute in attributes
-            if attribute in include_attribute
-        ]
+        return tile
+
+
+@router.get(
+    "/{dataset}/{version}/dynamic/tiles",
+    response_class=MultipartResponse,
+    tags=["Dynamic Vector Tiles"],
+    response_description="Multipart response with one PBF Vector Tile per part",
+)
+async def dynamic_vector_tile_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    *,
+    dv: Tuple[str, str] = Depends(dynamic_vector_tile_cache_version_dependency),
+    tiles: List[Tuple[int, int, int]] = Depends(batch_xyz),
+    geostore_id: Optional[UUID] = Query(
+        None,
+        description="Only show fire alerts within selected geostore area. Use RW geostore as of now.",
+    ),
+    geostore_origin: GeostoreOrigin = Query(
+        "gfw", description="Origin service of geostore ID"
+    ),
+    include_attribute: Optional[List[str]] = Query(
+        None,
+        title="Included Attributes",
+        description="Select which attributes to include in vector tile."
+        "Please check data-api for available attribute values."
+        "If not specified, all attributes will be shown.",
+    ),
+) -> MultipartResponse:
+    """Batch of generic dynamic vector tiles.
+
+    Tiles are rendered with one database query per source table (see
+    overviews), also when clipped to a geostore, and returned as parts
+    of a multipart/mixed response, in requested order.
+    Each part names its tile path in the Content-Location header.
+    Rendered tiles are added to the tile caches, so that later requests
+    of single tiles are served from there.
+    """
+    dataset, version = dv
+    if dataset in DEDICATED_DATASETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch requests are not supported for dataset {dataset}.",
+        )
+
+    columns = await _get_columns(dataset, version, include_attribute)
+
+    # Query parameters shared with single tile requests
+    params = [
+        (key, value)
+        for key, value in request.query_params.multi_items()
+        if key not in ("tile", "bbox", "z")
+    ]
+    paths = [f"/{dataset}/{version}/dynamic/{z}/{x}/{y}.pbf" for z, x, y in tiles]
+    bodies: Dict[int, bytes] = dict()
+    rendered: Dict[int, bytes] = dict()
+
+    pending: List[int] = list()
+    tables: List[MvtTable] = list()
+    for i, (z, x, y) in enumerate(tiles):
+        cached = tile_cache.get(tile_cache_key(paths[i], params))
+        if cached is not None and cached.status_code == 200:
+            bodies[i] = cached.body
+            continue
+
+        bbox = to_bbox(x, y, z)
+        try:
+            check_coverage(dataset, version, bbox)
+            geom_filter = await geometry_filter(geostore_id, bbox, geostore_origin)
+        except EmptyTileError:
+            rendered[i] = b""
+            continue
+        if geostore_id is not None and geom_filter is None:
+            # Tiles inside the geostore filter by their own envelope, so
+            # that all tiles of the batch share one statement
+            geom_filter = envelope_filter(bbox)
 
-    query: Select = get_mvt_table(dataset, version, bbox, extent, columns, filters)
+        filters = [geom_filter] if geom_filter is not None else []
+        pending.append(i)
+        tables.append(MvtTable(dataset, version, bbox, 4096, columns, filters))
 
     try:
-        tile = await get_tile(query, name=dataset, extent=extent)
+        rendered.update(zip(pending, await get_tiles(tables, name=dataset)))
     except QueryCanceledError:
         raise HTTPException(
             status_code=524,
             detail="A timeout occurred while processing the request. Request canceled.",
         )
-    else:
-        return tile
+
+    ttl = max_age(DEFAULT_CACHE_CONTROL)
+    for i, body in rendered.items():
+        cached = CachedResponse(
+            200,
+            [("content-type", VectorTileResponse.media_type)],
+            body,
+            encode_all(body),
+        )
+        background_tasks.add_task(
+            store_tile, tile_cache_key(paths[i], params), cached, ttl
+        )
+    bodies.update(rendered)
+
+    return MultipartResponse(
+        [
+            (
+                {
+                    "Content-Type": VectorTileResponse.media_type,
+                    "Content-Location": path,
+                },
+                bodies[i],
+            )
+            for i, path in enumerate(paths)
+        ]
+    )
+
+
+async def _get_columns(
+    dataset: str, version: str, include_attribute: Optional[List[str]]
+) -> List[ColumnClause]:
+    attributes: List[str] = await get_attributes(dataset, version)
+
+    # if no attributes specified get all feature info fields
+    if not include_attribute:
+        return [db.column(attribute) for attribute in attributes]
+    # otherwise run provided list against feature info list and keep common elements
+    return [
+        db.column(attribute)
+        for attribute in attributes
+        if attribute in include_attribute
+    ]
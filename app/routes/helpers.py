@@ -3,11 +3,17 @@ A set of internal (undocumented) endpoints.
 Endpoints listed here are for internal use only.
 """
 
-from fastapi import APIRouter, Response
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Response
 from fastapi.responses import ORJSONResponse
 
+from ..cache import shared_tile_cache, tile_cache
 from ..crud.sync_db.tile_cache_assets import get_latest_versions
+from ..models.pydantic.responses import Response as DataResponse
 from ..models.pydantic.versions import LatestVersionResponse
+from ..utils.authentication import is_service_account
+from ..utils.metrics import metrics
 
 router = APIRouter()
 
@@ -24,3 +30,43 @@ async def _latest(response: Response) -> LatestVersionResponse:
     """
     response.headers["Cache-Control"] = "max-age=300"  # 5min
     return LatestVersionResponse(data=get_latest_versions())
+
+
+@router.get(
+    "/_metrics",
+    response_class=ORJSONResponse,
+    response_model=DataResponse,
+    include_in_schema=False,
+)
+async def _metrics(response: Response) -> DataResponse:
+    """
+    In-process metrics of the worker which handled the request
+    """
+    response.headers["Cache-Control"] = "no-cache"
+    return DataResponse(data=metrics.snapshot())
+
+
+@router.delete(
+    "/_tile_cache",
+    response_class=ORJSONResponse,
+    response_model=DataResponse,
+    include_in_schema=False,
+)
+async def _purge_tile_cache(
+    prefix: Optional[str] = Query(
+        None, description="Only purge tiles with path starting with prefix"
+    ),
+    is_service_account: bool = Depends(is_service_account),
+) -> DataResponse:
+    """
+    Purge shared tile cache and in-process tile cache of the worker which handled the request
+    """
+    purged = tile_cache.purge(prefix or "")
+    shared_purged = (
+        await shared_tile_cache.purge(prefix or "")
+        if shared_tile_cache is not None
+        else 0
+    )
+    return DataResponse(
+        data={"purged": purged, "shared_purged": shared_purged, **tile_cache.stats()}
+    )
@@ -2,7 +2,6 @@ from typing import List, Optional, Tuple
 from uuid import UUID
 
 import pendulum
-from aenum import Enum, extend_enum
 from asyncpg import QueryCanceledError
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
 from fastapi.responses import ORJSONResponse
@@ -14,14 +13,14 @@ from ...crud.async_db.vector_tiles.filters import (
     geometry_filter,
 )
 from ...crud.async_db.vector_tiles.max_date import get_max_date
-from ...crud.sync_db.tile_cache_assets import default_end, default_start, get_versions
+from ...crud.sync_db.tile_cache_assets import default_end, default_start
 from ...errors import RecordNotFoundError
 from ...models.enumerators.geostore import GeostoreOrigin
 from ...models.enumerators.nasa_viirs_fire_alerts.supported_attributes import (
     SupportedAttribute,
 )
 from ...models.enumerators.tile_caches import TileCacheType
-from ...models.enumerators.versions import Versions
+from ...models.enumerators.versions import DatasetVersions, Versions
 from ...models.pydantic.nasa_viirs_fire_alerts import MaxDateResponse
 from ...responses import VectorTileResponse
 from ...routes import DATE_REGEX, Bounds, validate_dates, vector_xyz
@@ -33,19 +32,15 @@ dataset = "nasa_viirs_fire_alerts"
 default_duration = pendulum.duration(weeks=1)
 
 
-class NasaViirsVersions(str, Enum):
+class NasaViirsVersions(DatasetVersions):
     """NASA Viirs Fire Alerts versions.
 
     When using `latest` call will be redirected (307) to version tagged
     as latest.
     """
 
-    latest = "latest"
-
-
-_versions = get_versions(dataset, TileCacheType.dynamic_vector_tile_cache)
-for _version in _versions:
-    extend_enum(NasaViirsVersions, _version, _version)
+    dataset = dataset
+    tile_cache_type = TileCacheType.dynamic_vector_tile_cache
 
 
 async def nasa_viirs_fire_alerts_version(
@@ -75,15 +70,17 @@ async def nasa_viirs_fire_alerts_tile(
     geostore_origin: GeostoreOrigin = Query(
         "gfw", description="Origin service of geostore ID"
     ),
-    start_date: str = Query(
-        default_start(dataset, default_duration),
+    start_date: Optional[str] = Query(
+        None,
         regex=DATE_REGEX,
-        description="Only show alerts for given date and after",
+        description="Only show alerts for given date and after. "
+        "Defaults to one week before end date.",
     ),
-    end_date: str = Query(
-        default_end(dataset),
+    end_date: Optional[str] = Query(
+        None,
         regex=DATE_REGEX,
-        description="Only show alerts until given date. End date cannot be in the future.",
+        description="Only show alerts until given date. End date cannot be in the future. "
+        "Defaults to latest date in dataset.",
     ),
     force_date_range: Optional[bool] = Query(
         False,
@@ -106,10 +103,13 @@ async def nasa_viirs_fire_alerts_tile(
     aggregate adjacent alerts into a single point.
     """
     bbox, _, extent = bbox_z
+    start_date = start_date or default_start(dataset, default_duration)
+    end_date = end_date or default_end(dataset)
     validate_dates(start_date, end_date, force_date_range)
 
+    geom_filter = await geometry_filter(geostore_id, bbox, geostore_origin)
     filters = [
-        await geometry_filter(geostore_id, bbox, geostore_origin),
+        geom_filter,
         nasa_viirs_fire_alerts.confidence_filter(high_confidence_only),
         date_filter("alert__date", start_date, end_date),
     ] + contextual_filter(**contextual_filters)
@@ -128,9 +128,20 @@ async def nasa_viirs_fire_alerts_tile(
     else:
         response.headers["Cache-Control"] = "max-age=31536000"  # 1 year
 
+    # Daily rollups only hold date and confidence of alerts
+    rollup = geom_filter is None and all(
+        value is None for value in contextual_filters.values()
+    )
+
     try:
         tile = await nasa_viirs_fire_alerts.get_aggregated_tile(
-            version, bbox, extent, include_attribute, filters
+            version,
+            bbox,
+            extent,
+            include_attribute,
+            filters,
+            rollup=rollup,
+            end_date=end_date,
         )
     except QueryCanceledError:
         raise HTTPException(
@@ -138,6 +149,8 @@ async def nasa_viirs_fire_alerts_tile(
             detail="A timeout occurred while processing the request. Request canceled.",
         )
     else:
+        # Headers of the injected response are ignored when returning a response object
+        tile.headers["Cache-Control"] = response.headers["Cache-Control"]
         return tile
 
 
@@ -1,33 +1,87 @@
-from typing import List, Tuple
+import asyncio
+from typing import Optional, Sequence, Tuple
 
 import httpx
-from aenum import Enum, extend_enum
+from aenum import Enum
 from fastapi import APIRouter, Depends, Query, Response
+from fastapi.logger import logger
 
+from app.models.enumerators.lazy import LazyEnum
 from app.routes import raster_xyz
+from app.routes.raster_tiles import tile_cache_exists, tile_cache_writer
 from app.settings.globals import GLOBALS
 from app.utils.authentication import is_valid_apikey
+from app.utils.planet import PlanetProxy
 
 router = APIRouter()
 
+# Seconds between reloads of available Planet mosaics
+DATE_RANGES_REFRESH_INTERVAL = 86400
+
+_date_ranges: Tuple[str, ...] = ()
+
 
 class PlanetImageMode(str, Enum):
     rgb = "rgb"
     cir = "cir"
 
 
-class PlanetDateRange(str, Enum):
+class PlanetDateRange(LazyEnum):
     """Available date ranges of Planet Mosaics."""
 
+    @classmethod
+    def values(cls) -> Sequence[str]:
+        return _date_ranges
+
+    @classmethod
+    def validate(cls, value: str) -> str:
+        # Until mosaics could be listed, let Planet reject unknown ones
+        if not _date_ranges:
+            return value
+        return super().validate(value)
+
+
+planet_proxy = PlanetProxy(
+    GLOBALS.planet_api_key,
+    tile_cache_writer.enqueue,
+    tile_cache_exists,
+    tile_cache_url=GLOBALS.tile_cache_url,
+    timeout=GLOBALS.httpx_timeout,
+    max_connections=GLOBALS.planet_max_connections,
+)
+
+
+async def get_planet_date_ranges() -> Tuple[str, ...]:
+    resp = await planet_proxy.mosaics()
+    return tuple(mosaic["name"][34:-7] for mosaic in resp.json()["mosaics"])
+
+
+async def refresh_planet_date_ranges() -> None:
+    global _date_ranges
+    while True:
+        try:
+            _date_ranges = await get_planet_date_ranges()
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            logger.warning(f"Could not list Planet mosaics: {e!r}")
+        await asyncio.sleep(DATE_RANGES_REFRESH_INTERVAL)
+
 
-def get_planet_date_ranges() -> List[str]:
-    url = f"https://api.planet.com/basemaps/v1/mosaics?api_key={GLOBALS.planet_api_key}&_page_size=1000"
-    resp = httpx.get(url)
-    return [mosaic["name"][34:-7] for mosaic in resp.json()["mosaics"]]
+def init_app(app) -> None:
+    """List Planet mosaics in the background, so that a slow Planet API
+    does not delay startup."""
+    task: Optional[asyncio.Task] = None
+    planet_proxy.init_app(app)
 
+    @app.on_event("startup")
+    async def startup():
+        nonlocal task
+        task = asyncio.create_task(refresh_planet_date_ranges())
 
-for _date_range in get_planet_date_ranges():
-    extend_enum(PlanetDateRange, _date_range, _date_range)
+    @app.on_event("shutdown")
+    async def shutdown():
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
 
 @router.get(
@@ -38,7 +92,6 @@ for _date_range in get_planet_date_ranges():
 )
 async def planet_raster_tile(
     *,
-    response: Response,
     xyz: Tuple[int, int, int] = Depends(raster_xyz),
     date_range: PlanetDateRange = Query(
         ...,
@@ -53,10 +106,10 @@ async def planet_raster_tile(
     """A proxy for Planet Mosaic Tiles."""
     x, y, z = xyz
 
-    async with httpx.AsyncClient() as client:
-        proxy = await client.get(
-            f"https://tiles.planet.com/basemaps/v1/planet-tiles/planet_medres_normalized_analytic_{date_range}_mosaic/gmap/{z}/{x}/{y}.png?proc={proc}&api_key={GLOBALS.planet_api_key}"
-        )
-        response.body = proxy.content
-        response.status_code = proxy.status_code
-    return response
+    return await planet_proxy.tile_response(
+        f"planet_medres_normalized_analytic_{date_range}_mosaic",
+        PlanetImageMode(proc).value,
+        z,
+        x,
+        y,
+    )
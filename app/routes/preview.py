@@ -54,7 +54,7 @@ async def get_tile_cache_preview(
         },
     ]
     for tile in tile_caches:
-        if tile["asset_type"] == "Static vector tile cache":
+        if tile.asset_type == "Static vector tile cache":
             try:
                 style_specs = await get_static_vector_tile_cache_style_spec(tile)
             except ClientError:
@@ -78,9 +78,7 @@ async def get_tile_cache_preview(
 
 async def get_static_vector_tile_cache_style_spec(tile):
     """Fetch static vector tile cache style specification from s3"""
-    root_json_key = (
-        f"{tile['dataset']}/{tile['version']}/{tile['implementation']}/root.json"
-    )
+    root_json_key = f"{tile.dataset}/{tile.version}/{tile.implementation}/root.json"
     session = aioboto3.Session()
     async with session.client(
         "s3", region_name=GLOBALS.aws_region, endpoint_url=GLOBALS.aws_endpoint_uri
@@ -94,21 +92,21 @@ async def get_static_vector_tile_cache_style_spec(tile):
 def get_default_style_spec(tile):
     """Construct default tile source and layer style for Mapbox rendering"""
     sources = dict()
-    sources[tile["dataset"]] = {
-        "type": "vector" if "vector" in tile["asset_type"].lower() else "raster",
-        "tiles": [tile["asset_uri"]],
+    sources[tile.dataset] = {
+        "type": "vector" if "vector" in tile.asset_type.lower() else "raster",
+        "tiles": [tile.asset_uri],
     }
 
     layer = {
-        "id": f"{tile['dataset']}-layer",
-        "type": "fill" if "vector" in tile["asset_type"].lower() else "raster",
-        "source": tile["dataset"],
-        "minzoom": tile["min_zoom"],
-        "maxzoom": tile["max_zoom"],
-        "source-layer": tile["dataset"],
+        "id": f"{tile.dataset}-layer",
+        "type": "fill" if "vector" in tile.asset_type.lower() else "raster",
+        "source": tile.dataset,
+        "minzoom": tile.min_zoom,
+        "maxzoom": tile.max_zoom,
+        "source-layer": tile.dataset,
     }
 
-    if "vector" in tile["asset_type"].lower():
+    if "vector" in tile.asset_type.lower():
         layer["paint"] = {
             "fill-color": "#0080ff",  # blue color fill
             "fill-opacity": 0.5,
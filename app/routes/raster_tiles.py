@@ -11,7 +11,7 @@ import base64
 import io
 import json
 from hashlib import md5
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 import aioboto3
 import httpx
@@ -23,6 +23,7 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
+    Request,
     Response,
 )
 from fastapi.logger import logger
@@ -32,7 +33,8 @@ from ..crud.sync_db.tile_cache_assets import get_max_zoom
 from ..models.enumerators.tile_caches import TileCacheType
 from ..settings.globals import GLOBALS
 from ..utils.aws import invoke_lambda
-from . import raster_tile_cache_version_dependency, raster_xyz
+from ..utils.write_back import WriteBackQueue
+from . import raster_tile_cache_version_dependency, raster_xyz, static_tile_response
 
 router = APIRouter()
 
@@ -56,19 +58,7 @@ async def dynamic_raster_tile(
     """Generic raster tile."""
 
     dataset, version = dv
-    x, y, z = xyz
-
-    payload = {
-        "dataset": dataset,
-        "version": version,
-        "implementation": implementation,
-        "x": x,
-        "y": y,
-        "z": z,
-        "over_zoom": get_max_zoom(
-            dataset, version, implementation, TileCacheType.raster_tile_cache
-        ),
-    }
+    payload = raster_tile_payload(dataset, version, implementation, xyz)
 
     return await get_dynamic_raster_tile(payload, implementation, background_tasks)
 
@@ -81,14 +71,40 @@ async def dynamic_raster_tile(
 )
 async def static_raster_tile(
     *,
+    request: Request,
     dv: Tuple[str, str] = Depends(raster_tile_cache_version_dependency),
     implementation: str = Path(..., description="Tile cache implementation name."),
     xyz: Tuple[int, int, int] = Depends(raster_xyz),
-    background_tasks: BackgroundTasks,
 ) -> Response:
     """Generic raster tile."""
-    # This route is only here for documentation purposes. Static raster tiles are served directly via cloud front.
-    pass
+    # Static raster tiles are usually served directly via cloud front. If tile
+    # caches are published as PMTiles archives, tiles are read from there.
+    dataset, version = dv
+    return await static_tile_response(
+        request, dataset, version, implementation, xyz, "png"
+    )
+
+
+def raster_tile_payload(
+    dataset: str,
+    version: str,
+    implementation: Optional[str],
+    xyz: Tuple[int, int, int],
+) -> Dict[str, Any]:
+    """Lambda payload to render tile of given tile cache implementation."""
+    x, y, z = xyz
+
+    return {
+        "dataset": dataset,
+        "version": version,
+        "implementation": implementation,
+        "x": x,
+        "y": y,
+        "z": z,
+        "over_zoom": get_max_zoom(
+            dataset, version, implementation, TileCacheType.raster_tile_cache
+        ),
+    }
 
 
 async def get_dynamic_raster_tile(
@@ -106,9 +122,9 @@ async def get_dynamic_raster_tile(
 
     # Copy dynamically created tile to tile cache for later reuse.
     background_tasks.add_task(
-        copy_tile,
-        png_data,
+        tile_cache_writer.enqueue,
         f"{dataset}/{version}/{implementation}/{z}/{x}/{y}.png",
+        png_data,
     )
     return StreamingResponse(io.BytesIO(png_data), media_type="image/png")
 
@@ -170,6 +186,15 @@ async def copy_tile(data, key):
         )
 
 
+tile_cache_writer = WriteBackQueue(
+    copy_tile,
+    maxsize=GLOBALS.write_back_queue_size,
+    workers=GLOBALS.write_back_workers,
+    spill_dir=GLOBALS.write_back_spill_dir,
+    flush_timeout=GLOBALS.write_back_flush_timeout,
+)
+
+
 async def get_cached_response(payload, query_hash, background_tasks):
 
     dataset = payload.get("dataset")
@@ -179,6 +204,16 @@ async def get_cached_response(payload, query_hash, background_tasks):
     z = payload.get("z")
     key = f"{dataset}/{version}/{query_hash}/{z}/{x}/{y}.png"
 
+    if await tile_cache_exists(key):
+        logger.debug(f"Redirecting to cached response {key}.")
+        return RedirectResponse(f"{GLOBALS.tile_cache_url}/{key}")
+
+    logger.debug(f"No cached tile found for key {key}, call lambda function.")
+    return await get_dynamic_raster_tile(payload, query_hash, background_tasks)
+
+
+async def tile_cache_exists(key: str) -> bool:
+    """Check whether tile was copied to tile cache before."""
     session = aioboto3.Session()
     async with session.client(
         "s3", region_name=GLOBALS.aws_region, endpoint_url=GLOBALS.aws_endpoint_uri
@@ -186,8 +221,5 @@ async def get_cached_response(payload, query_hash, background_tasks):
         try:
             await s3_client.head_object(Bucket=GLOBALS.bucket, Key=key)
         except ClientError:
-            logger.debug(f"No cached tile found for key {key}, call lambda function.")
-            return await get_dynamic_raster_tile(payload, query_hash, background_tasks)
-        else:
-            logger.debug(f"Redirecting to cached response {key}.")
-            return RedirectResponse(f"{GLOBALS.tile_cache_url}/{key}")
+            return False
+    return True
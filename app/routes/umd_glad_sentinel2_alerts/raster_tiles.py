@@ -1,10 +1,9 @@
 from typing import Optional, Tuple
 
-from aenum import Enum, extend_enum
 from fastapi import APIRouter, BackgroundTasks, Depends, Path, Query, Response
 
-from ...crud.sync_db.tile_cache_assets import get_versions
 from ...models.enumerators.tile_caches import TileCacheType
+from ...models.enumerators.versions import DatasetVersions
 from .. import DATE_REGEX, optional_implementation_dependency, raster_xyz
 from ..dynamic_deforestation_alerts_tile import get_dynamic_deforestation_alert_tile
 
@@ -13,15 +12,11 @@ router = APIRouter()
 dataset = "umd_glad_sentinel2_alerts"
 
 
-class UmdGladSentinel2Versions(str, Enum):
+class UmdGladSentinel2Versions(DatasetVersions):
     """UMD Glad Sentinel 2 Alerts versions. When using `latest` call will be redirected (307) to version tagged as latest."""
 
-    latest = "latest"
-
-
-_versions = get_versions(dataset, TileCacheType.raster_tile_cache)
-for _version in _versions:
-    extend_enum(UmdGladSentinel2Versions, _version, _version)
+    dataset = dataset
+    tile_cache_type = TileCacheType.raster_tile_cache
 
 
 @router.get(
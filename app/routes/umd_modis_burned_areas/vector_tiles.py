@@ -2,21 +2,21 @@ from typing import Optional, Tuple
 from uuid import UUID
 
 import pendulum
-from aenum import Enum, extend_enum
 from asyncpg import QueryCanceledError
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
 
 from ...application import db
-from ...crud.async_db.vector_tiles import get_mvt_table, get_tile
+from ...crud.async_db.vector_tiles import MvtTable, get_tile
+from ...crud.async_db.vector_tiles.coverage import check_coverage
 from ...crud.async_db.vector_tiles.filters import (
     date_filter,
     filter_gt,
     geometry_filter,
 )
-from ...crud.sync_db.tile_cache_assets import default_end, default_start, get_versions
+from ...crud.sync_db.tile_cache_assets import default_end, default_start
 from ...models.enumerators.geostore import GeostoreOrigin
 from ...models.enumerators.tile_caches import TileCacheType
-from ...models.enumerators.versions import Versions
+from ...models.enumerators.versions import DatasetVersions, Versions
 from ...responses import VectorTileResponse
 from ...routes import DATE_REGEX, Bounds, validate_dates, vector_xyz
 
@@ -26,15 +26,11 @@ dataset = "umd_modis_burned_areas"
 default_duration = pendulum.duration(months=3)
 
 
-class UmdModisBurnedAreas(str, Enum):
+class UmdModisBurnedAreas(DatasetVersions):
     """MODIS burned areas versions. When using `latest` call will be redirected (307) to version tagged as latest."""
 
-    latest = "latest"
-
-
-_versions = get_versions(dataset, TileCacheType.dynamic_vector_tile_cache)
-for _version in _versions:
-    extend_enum(UmdModisBurnedAreas, _version, _version)
+    dataset = dataset
+    tile_cache_type = TileCacheType.dynamic_vector_tile_cache
 
 
 async def umd_modis_burned_areas_version(
@@ -64,15 +60,17 @@ async def umd_modis_burned_areas_tile(
     geostore_origin: GeostoreOrigin = Query(
         "gfw", description="Origin service of geostore ID"
     ),
-    start_date: str = Query(
-        default_start(dataset, default_duration),
+    start_date: Optional[str] = Query(
+        None,
         regex=DATE_REGEX,
-        description="Only show alerts for given date and after",
+        description="Only show alerts for given date and after. "
+        "Defaults to three months before end date.",
     ),
-    end_date: str = Query(
-        default_end(dataset),
+    end_date: Optional[str] = Query(
+        None,
         regex=DATE_REGEX,
-        description="Only show alerts until given date. End date cannot be in the future.",
+        description="Only show alerts until given date. End date cannot be in the future. "
+        "Defaults to latest date in dataset.",
     ),
     force_date_range: Optional[bool] = Query(
         False,
@@ -81,7 +79,10 @@ async def umd_modis_burned_areas_tile(
 ) -> VectorTileResponse:
     """"""
     bbox, z, extent = bbox_z
+    start_date = start_date or default_start(dataset, default_duration)
+    end_date = end_date or default_end(dataset)
     validate_dates(start_date, end_date, force_date_range)
+    check_coverage(dataset, version, bbox)
 
     filters = [
         await geometry_filter(geostore_id, bbox, geostore_origin),
@@ -108,12 +109,14 @@ async def umd_modis_burned_areas_tile(
     try:
         schema = "umd_modis_burned_areas"
         columns = [db.column("alert__date")]
-        query = get_mvt_table(schema, version, bbox, extent, columns, filters)
-        tile = await get_tile(query, schema, extent)
+        table = MvtTable(schema, version, bbox, extent, columns, filters)
+        tile = await get_tile(table, schema)
     except QueryCanceledError:
         raise HTTPException(
             status_code=524,
             detail="A timeout occurred while processing the request. Request canceled.",
         )
     else:
+        # Headers of the injected response are ignored when returning a response object
+        tile.headers["Cache-Control"] = response.headers["Cache-Control"]
         return tile
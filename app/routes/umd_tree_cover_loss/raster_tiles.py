@@ -1,17 +1,18 @@
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
-from aenum import Enum, extend_enum
 from fastapi import APIRouter, BackgroundTasks, Depends, Path, Query, Response
 
-from ...crud.sync_db.tile_cache_assets import get_max_zoom, get_versions
+from ...crud.sync_db.tile_cache_assets import get_max_zoom
 from ...models.enumerators.attributes import TcdEnum, TcdStyleEnum
 from ...models.enumerators.tile_caches import TileCacheType
+from ...models.enumerators.versions import DatasetVersions
 from .. import optional_implementation_dependency, raster_xyz
 from ..raster_tiles import (
     get_cached_response,
     get_dynamic_raster_tile,
     hash_query_params,
+    raster_tile_payload,
 )
 
 router = APIRouter()
@@ -19,15 +20,11 @@ router = APIRouter()
 dataset = "umd_tree_cover_loss"
 
 
-class UmdTclVersions(str, Enum):
+class UmdTclVersions(DatasetVersions):
     """UMD Tree Cover Loss versions. When using `latest` call will be redirected (307) to version tagged as latest."""
 
-    latest = "latest"
-
-
-_versions = get_versions(dataset, TileCacheType.raster_tile_cache)
-for _version in _versions:
-    extend_enum(UmdTclVersions, _version, _version)
+    dataset = dataset
+    tile_cache_type = TileCacheType.raster_tile_cache
 
 
 @router.get(
@@ -93,40 +90,50 @@ async def umd_tree_cover_loss_raster_tile(
 
     """
 
-    x, y, z = xyz
-
-    payload = {
-        "dataset": dataset,
-        "version": version,
-        "implementation": implementation,
-        "x": x,
-        "y": y,
-        "z": z,
-        "over_zoom": get_max_zoom(
-            dataset, version, implementation, TileCacheType.raster_tile_cache
-        ),
-    }
+    payload, query_hash = tree_cover_loss_tile_payload(
+        version, implementation, xyz, start_year, end_year, tcd, style
+    )
 
-    if implementation:
+    if query_hash is None:
         return await get_dynamic_raster_tile(payload, implementation, background_tasks)
 
     else:
-        if style:
-            tcd = TcdEnum[style]  # type: ignore
-            start_year = None
-            end_year = None
-
-        payload.update(
-            implementation=f"tcd_{tcd}",
-            start_year=start_year,
-            end_year=end_year,
-            filter_type="annual_loss",
-            over_zoom=get_max_zoom(
-                dataset, version, f"tcd_{tcd}", TileCacheType.raster_tile_cache
-            ),
-        )
-
-        params = {"start_year": start_year, "end_year": end_year, "tcd": tcd}
-        query_hash = hash_query_params(params)
-
         return await get_cached_response(payload, query_hash, background_tasks)
+
+
+def tree_cover_loss_tile_payload(
+    version: str,
+    implementation: Optional[str],
+    xyz: Tuple[int, int, int],
+    start_year: Optional[int],
+    end_year: Optional[int],
+    tcd: TcdEnum,
+    style: Optional[TcdStyleEnum],
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Lambda payload and query hash for a tree cover loss tile.
+
+    Query hash is None if tile is rendered for a named implementation.
+    """
+
+    payload = raster_tile_payload(dataset, version, implementation, xyz)
+
+    if implementation:
+        return payload, None
+
+    if style:
+        tcd = TcdEnum[style]  # type: ignore
+        start_year = None
+        end_year = None
+
+    payload.update(
+        implementation=f"tcd_{tcd}",
+        start_year=start_year,
+        end_year=end_year,
+        filter_type="annual_loss",
+        over_zoom=get_max_zoom(
+            dataset, version, f"tcd_{tcd}", TileCacheType.raster_tile_cache
+        ),
+    )
+
+    params = {"start_year": start_year, "end_year": end_year, "tcd": tcd}
+    return payload, hash_query_params(params)
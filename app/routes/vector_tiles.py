@@ -8,11 +8,16 @@ the server will redirect the request to the dynamic service and will attempt to
 
 from typing import Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request, Response
 
+from ..crud.async_db.vector_tiles.coverage import tile_xyz
 from ..models.types import Bounds
 from ..responses import VectorTileResponse
-from . import static_vector_tile_cache_version_dependency, vector_xyz
+from . import (
+    static_tile_response,
+    static_vector_tile_cache_version_dependency,
+    vector_xyz,
+)
 
 router = APIRouter()
 
@@ -25,14 +30,17 @@ router = APIRouter()
 )
 async def vector_tile(
     *,
+    request: Request,
     dv: Tuple[str, str] = Depends(static_vector_tile_cache_version_dependency),
-    bbox_z: Tuple[Bounds, int] = Depends(vector_xyz),
-) -> VectorTileResponse:
+    bbox_z: Tuple[Bounds, int, int] = Depends(vector_xyz),
+) -> Response:
     """
     Generic vector tile
     """
-    # This endpoint is not implemented and only exist for documentation purposes
-    # Default vector layers are stored on S3.
-    # If tile is not found, Cloud Front will redirect request to dynamic endpoint.
-    # Hence, this function should never be called.
-    raise HTTPException(status_code=501, detail="Not implemented.")
+    # Default vector layers are stored on S3 and usually served by Cloud Front.
+    # If tile caches are published as PMTiles archives, tiles are read from there.
+    dataset, version = dv
+    bbox, _, _ = bbox_z
+    return await static_tile_response(
+        request, dataset, version, "default", tile_xyz(bbox), "pbf"
+    )
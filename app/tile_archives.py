@@ -0,0 +1,166 @@
+"""Static tile caches stored as PMTiles archives.
+
+Instead of one object per tile, each static tile cache implementation is
+a single PMTiles archive, see `utils.pmtiles`. Tiles are read with range
+requests from S3, an HTTP server or a local file. Archive headers and
+directories are kept in memory, so that most tiles take one range read.
+"""
+
+import asyncio
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import aioboto3
+import httpx
+from botocore.exceptions import ClientError
+from cachetools import LRUCache, TTLCache
+
+from .errors import ArchiveNotFoundError
+from .settings.globals import GLOBALS
+from .utils.metrics import metrics
+from .utils.pmtiles import PMTilesReader, RangeReader
+
+# Archives checked to be missing are not looked up again for a while
+MISSING_ARCHIVE_TTL = 60
+
+
+class TileArchives:
+    """Open PMTiles archives by dataset, version and implementation."""
+
+    def __init__(
+        self,
+        url_template: Optional[str],
+        directory_cache_size: int = 1024,
+        max_archives: int = 256,
+    ) -> None:
+        self.url_template = url_template
+        self.directories: LRUCache = LRUCache(maxsize=directory_cache_size)
+
+        self._archives: LRUCache = LRUCache(maxsize=max_archives)
+        self._missing: TTLCache = TTLCache(
+            maxsize=max_archives, ttl=MISSING_ARCHIVE_TTL
+        )
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._s3_client = None
+        self._s3_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.url_template is not None
+
+    def init_app(self, app) -> None:
+        @app.on_event("shutdown")
+        async def shutdown():
+            await self.close()
+
+    async def close(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._s3_client is not None:
+            await self._s3_client.__aexit__(None, None, None)
+            self._s3_client = None
+
+    def url(self, dataset: str, version: str, implementation: str) -> str:
+        assert self.url_template is not None
+        return self.url_template.format(
+            dataset=dataset, version=version, implementation=implementation
+        )
+
+    async def open(
+        self, dataset: str, version: str, implementation: str
+    ) -> PMTilesReader:
+        """Archive of tile cache, with header loaded.
+
+        Raises ArchiveNotFoundError if there is no archive.
+        """
+        url = self.url(dataset, version, implementation)
+        if url in self._missing:
+            raise ArchiveNotFoundError(url)
+
+        archive: Optional[PMTilesReader] = self._archives.get(url)
+        if archive is None:
+            archive = PMTilesReader(url, self._range_reader(url), self.directories)
+            try:
+                await archive.header()
+            except ArchiveNotFoundError:
+                self._missing[url] = True
+                raise
+            self._archives[url] = archive
+        return archive
+
+    def _range_reader(self, url: str) -> RangeReader:
+        parsed = urlparse(url)
+        path = parsed.path if parsed.scheme == "file" else url
+
+        async def read_file(offset: int, length: int) -> bytes:
+            return await asyncio.to_thread(_read_file, path, offset, length)
+
+        async def read_http(offset: int, length: int) -> bytes:
+            if self._http_client is None:
+                self._http_client = httpx.AsyncClient(timeout=GLOBALS.httpx_timeout)
+            response = await self._http_client.get(
+                url, headers={"Range": _range(offset, length)}
+            )
+            if response.status_code == 404:
+                raise ArchiveNotFoundError(url)
+            response.raise_for_status()
+            return response.content
+
+        async def read_s3(offset: int, length: int) -> bytes:
+            client = await self._s3()
+            try:
+                response = await client.get_object(
+                    Bucket=parsed.netloc,
+                    Key=parsed.path.lstrip("/"),
+                    Range=_range(offset, length),
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                    raise ArchiveNotFoundError(url)
+                raise
+            return await response["Body"].read()
+
+        readers: Dict[str, RangeReader] = {
+            "s3": read_s3,
+            "http": read_http,
+            "https": read_http,
+        }
+        reader = readers.get(parsed.scheme, read_file)
+
+        async def read(offset: int, length: int) -> bytes:
+            metrics.increment("tile_archives.range_reads")
+            with metrics.timer("tile_archives.range_read"):
+                return await reader(offset, length)
+
+        return read
+
+    async def _s3(self):
+        # One client for all archives, which keeps connections alive
+        async with self._s3_lock:
+            if self._s3_client is None:
+                session = aioboto3.Session()
+                self._s3_client = await session.client(
+                    "s3",
+                    region_name=GLOBALS.aws_region,
+                    endpoint_url=GLOBALS.aws_endpoint_uri,
+                ).__aenter__()
+        return self._s3_client
+
+
+def _range(offset: int, length: int) -> str:
+    return f"bytes={offset}-{offset + length - 1}"
+
+
+def _read_file(path: str, offset: int, length: int) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+    except FileNotFoundError:
+        raise ArchiveNotFoundError(path)
+
+
+tile_archives = TileArchives(
+    GLOBALS.static_tile_archive_url, GLOBALS.static_tile_directory_cache_size
+)
@@ -1,7 +1,7 @@
 from typing import Optional, Tuple
 
 from fastapi import HTTPException, Request, Security
-from fastapi.security import APIKeyHeader
+from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
 from starlette.status import HTTP_403_FORBIDDEN
 
 from app.settings.globals import GLOBALS
@@ -31,6 +31,16 @@ async def is_valid_apikey(
     )
 
 
+async def is_service_account(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(
+        HTTPBearer(auto_error=False)
+    ),
+) -> bool:
+    if credentials and GLOBALS.token and credentials.credentials == GLOBALS.token:
+        return True
+    raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Not authorized.")
+
+
 def _api_key_origin_auto_error(
     api_key: Optional[str],
     origin: Optional[str],
@@ -0,0 +1,110 @@
+"""Micro-batching of concurrent calls.
+
+Calls which share a key are collected and run together, with a single
+call of the batch function. Each caller receives its own result. Calls
+are only held back while a batch of the same key is already running, so
+that a lone call is run right away. A held batch is run when its window
+expires, when it reaches max size or when no batch of its key is
+running anymore, whichever comes first.
+"""
+
+import asyncio
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+from .metrics import metrics
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+BatchFunction = Callable[[Hashable, List[Item]], Awaitable[List[Result]]]
+
+
+class _Batch(Generic[Item, Result]):
+    def __init__(self, timer: Optional[asyncio.TimerHandle]) -> None:
+        self.timer = timer
+        self.items: List[Item] = list()
+        self.futures: List["asyncio.Future[Result]"] = list()
+
+
+class MicroBatcher(Generic[Item, Result]):
+    def __init__(
+        self,
+        run: BatchFunction,
+        window: float = 0.005,
+        max_size: int = 16,
+        name: str = "batches",
+    ) -> None:
+        self.run = run
+        self.window = window
+        self.max_size = max_size
+        self.name = name
+
+        self._batches: Dict[Hashable, _Batch] = dict()
+        self._tasks: Set[asyncio.Task] = set()
+        # Number of running batches by key
+        self._running: Dict[Hashable, int] = dict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    async def submit(self, key: Hashable, item: Item) -> Result:
+        """Add item to the open batch of key and wait for its result."""
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(key)
+        idle = batch is None and key not in self._running
+        if batch is None:
+            timer = None if idle else loop.call_later(self.window, self._flush, key)
+            batch = _Batch(timer)
+            self._batches[key] = batch
+
+        future: "asyncio.Future[Result]" = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if idle or len(batch.items) >= self.max_size:
+            self._flush(key)
+
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+
+        if batch.timer is not None:
+            batch.timer.cancel()
+        self._running[key] = self._running.get(key, 0) + 1
+        task = asyncio.create_task(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: _Batch) -> None:
+        metrics.increment(f"{self.name}.batches")
+        metrics.increment(f"{self.name}.items", len(batch.items))
+        try:
+            results = await self.run(key, batch.items)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future, result in zip(batch.futures, results):
+                # Callers may have given up waiting
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running[key] -= 1
+            if not self._running[key]:
+                del self._running[key]
+                # Calls held back while this batch was running
+                self._flush(key)
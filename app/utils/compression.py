@@ -0,0 +1,89 @@
+"""Content-type aware response compression.
+
+Brotli is used if package `brotli` is installed, otherwise only gzip is
+offered.
+"""
+
+import gzip
+from typing import Dict, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Encodings in order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Smaller responses are not worth compressing
+MIN_SIZE = 1000
+
+# Images which are already compressed
+INCOMPRESSIBLE_TYPES = {"image/png", "image/jpeg", "image/webp", "image/gif"}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type not in INCOMPRESSIBLE_TYPES
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content encoding `{encoding}`.")
+
+
+def encode_all(body: bytes) -> Dict[str, bytes]:
+    """Compress body with all supported encodings.
+
+    Only encodings which make the body smaller are returned.
+    """
+    encoded: Dict[str, bytes] = dict()
+    if len(body) < MIN_SIZE:
+        return encoded
+
+    for encoding in ENCODINGS:
+        data = compress(body, encoding)
+        if len(data) < len(body):
+            encoded[encoding] = data
+    return encoded
+
+
+def negotiate(
+    accept_encoding: Optional[str], available: Iterable[str]
+) -> Optional[str]:
+    """Select the available encoding the client prefers.
+
+    Available encodings are given in order of preference of the server,
+    which decides between encodings of equal quality. Returns None if
+    the response should not be encoded.
+    """
+    if not accept_encoding:
+        return None
+
+    qualities: Dict[str, float] = dict()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    selected: Optional[str] = None
+    selected_quality = 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > selected_quality:
+            selected, selected_quality = encoding, quality
+    return selected
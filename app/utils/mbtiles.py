@@ -0,0 +1,90 @@
+"""Writing of MBTiles tile archives.
+
+MBTiles are SQLite databases. Tiles are stored in the deduplicating
+layout: `images` holds tile data by hash, `map` points tiles to it, and
+view `tiles` joins both as readers expect. Tile rows follow the TMS
+scheme, counting from the south.
+
+See https://github.com/mapbox/mbtiles-spec/blob/master/1.3/spec.md
+"""
+
+import os
+import sqlite3
+from hashlib import md5
+from typing import Dict
+
+SCHEMA = """
+CREATE TABLE metadata (name text, value text);
+CREATE UNIQUE INDEX name ON metadata (name);
+CREATE TABLE images (tile_id text, tile_data blob);
+CREATE UNIQUE INDEX images_id ON images (tile_id);
+CREATE TABLE map (zoom_level integer, tile_column integer, tile_row integer, tile_id text);
+CREATE UNIQUE INDEX map_index ON map (zoom_level, tile_column, tile_row);
+CREATE VIEW tiles AS
+    SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+        map.tile_row AS tile_row, images.tile_data AS tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+
+class MBTilesWriter:
+    """Write tiles, in any order, to an MBTiles archive.
+
+    Tiles with the same data are stored once. Rows are committed every
+    `commit_every` tiles, so memory use does not grow with the pyramid.
+    """
+
+    def __init__(
+        self, path: str, metadata: Dict[str, str], commit_every: int = 1000
+    ) -> None:
+        self.path = path
+        self.commit_every = commit_every
+
+        self._tmp_path = f"{path}.tmp"
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self._db = sqlite3.connect(self._tmp_path)
+        self._db.execute("PRAGMA journal_mode = OFF")
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.executescript(SCHEMA)
+        self._db.executemany(
+            "INSERT INTO metadata (name, value) VALUES (?, ?)", metadata.items()
+        )
+        self._uncommitted = 0
+
+    def __enter__(self) -> "MBTilesWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, z: int, x: int, y: int, data: bytes) -> bool:
+        """Add tile. Returns False if the same data was written before."""
+        tile_id = md5(data).hexdigest()
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)",
+            (tile_id, data),
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO map (zoom_level, tile_column, tile_row, tile_id) "
+            "VALUES (?, ?, ?, ?)",
+            (z, x, (1 << z) - 1 - y, tile_id),
+        )
+
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._db.commit()
+            self._uncommitted = 0
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._db.close()
+        os.remove(self._tmp_path)
@@ -0,0 +1,59 @@
+"""Lightweight in-process metrics.
+
+Metrics are kept per worker process and exposed through the internal
+`/_metrics` endpoint.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, float] = dict()
+        self._timings: Dict[str, Dict[str, float]] = dict()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self._counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        timings = {
+            name: dict(
+                timing,
+                mean=timing["total"] / timing["count"] if timing["count"] else 0.0,
+            )
+            for name, timing in self._timings.items()
+        }
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "timings": timings,
+        }
+
+    def reset(self) -> None:
+        self._counters.clear()
+        self._gauges.clear()
+        self._timings.clear()
+
+
+metrics = Metrics()
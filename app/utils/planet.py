@@ -0,0 +1,229 @@
+"""Proxy for Planet basemap mosaic tiles.
+
+Mosaic tiles never change, so each tile is fetched from Planet once:
+
+* Tiles are streamed through to the client as they arrive, using one
+  pooled client for the lifetime of the app (HTTP/2 if package `h2` is
+  installed).
+* Concurrent requests for the same tile wait for the request already
+  on its way to Planet.
+* Fetched tiles are copied to the tile cache bucket, keyed by mosaic,
+  image mode and z/x/y. Requests for tiles found there are redirected
+  to the tile cache.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional
+
+import httpx
+from cachetools import LRUCache
+from fastapi import HTTPException
+from fastapi.logger import logger
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from .metrics import metrics
+
+TILE_URL = (
+    "https://tiles.planet.com/basemaps/v1/planet-tiles/{mosaic}/gmap/{z}/{x}/{y}.png"
+)
+MOSAICS_URL = "https://api.planet.com/basemaps/v1/mosaics"
+
+# Mosaic tiles never change
+CACHE_CONTROL = "max-age=31536000"
+
+WriteBack = Callable[[str, bytes], Awaitable[bool]]
+Exists = Callable[[str], Awaitable[bool]]
+
+
+class PlanetTile(NamedTuple):
+    status_code: int
+    media_type: Optional[str]
+    content: bytes
+
+
+def tile_key(mosaic: str, proc: str, z: int, x: int, y: int) -> str:
+    """Key of tile in tile cache bucket."""
+    return f"planet/{mosaic}/{proc}/{z}/{x}/{y}.png"
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PlanetProxy:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        write_back: WriteBack,
+        exists: Exists,
+        tile_cache_url: Optional[str] = None,
+        timeout: float = 30,
+        max_connections: int = 100,
+        cached_keys: int = 65536,
+        name: str = "planet",
+    ) -> None:
+        self.api_key = api_key
+        self.write_back = write_back
+        self.exists = exists
+        self.tile_cache_url = tile_cache_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.name = name
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = dict()
+        # Keys known to be in the tile cache bucket
+        self._cached: LRUCache = LRUCache(maxsize=cached_keys)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=_http2_available(),
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    def init_app(self, app) -> None:
+        @app.on_event("shutdown")
+        async def shutdown():
+            await self.close()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def mosaics(self) -> httpx.Response:
+        """List of available mosaics."""
+        response = await self.client.get(
+            MOSAICS_URL, params={"api_key": self.api_key, "_page_size": 1000}
+        )
+        response.raise_for_status()
+        return response
+
+    async def tile_response(
+        self, mosaic: str, proc: str, z: int, x: int, y: int
+    ) -> Response:
+        key = tile_key(mosaic, proc, z, x, y)
+        if await self._is_cached(key):
+            metrics.increment(f"{self.name}.redirects")
+            return RedirectResponse(f"{self.tile_cache_url}/{key}")
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            metrics.increment(f"{self.name}.coalesced")
+            try:
+                tile = await asyncio.wait_for(asyncio.shield(flight), self.timeout)
+            except asyncio.TimeoutError:
+                # Stream was never consumed, e.g. client went away early
+                self._finish(key, flight, None)
+                tile = None
+            if tile is None:
+                # Request on its way failed, try again on our own
+                tile = await self._fetch(mosaic, proc, z, x, y)
+            return _response(tile)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            upstream = await self._send(mosaic, proc, z, x, y)
+            if upstream.status_code != 200:
+                tile = PlanetTile(
+                    upstream.status_code,
+                    upstream.headers.get("Content-Type"),
+                    await upstream.aread(),
+                )
+                await upstream.aclose()
+                self._finish(key, future, tile)
+                return _response(tile)
+        except BaseException:
+            self._finish(key, future, None)
+            raise
+
+        return StreamingResponse(
+            self._stream(key, future, upstream),
+            media_type=upstream.headers.get("Content-Type", "image/png"),
+            headers={"Cache-Control": CACHE_CONTROL},
+        )
+
+    async def _is_cached(self, key: str) -> bool:
+        if self.tile_cache_url is None:
+            return False
+        if key in self._cached:
+            return True
+        if await self.exists(key):
+            self._cached[key] = True
+            return True
+        return False
+
+    async def _send(
+        self, mosaic: str, proc: str, z: int, x: int, y: int
+    ) -> httpx.Response:
+        request = self.client.build_request(
+            "GET",
+            TILE_URL.format(mosaic=mosaic, z=z, x=x, y=y),
+            params={"proc": proc, "api_key": self.api_key},
+        )
+        metrics.increment(f"{self.name}.upstream_requests")
+        try:
+            return await self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            metrics.increment(f"{self.name}.errors")
+            logger.error(f"Could not fetch Planet tile {mosaic}/{z}/{x}/{y}: {e!r}")
+            raise HTTPException(status_code=502, detail="Could not fetch Planet tile")
+
+    async def _fetch(
+        self, mosaic: str, proc: str, z: int, x: int, y: int
+    ) -> PlanetTile:
+        upstream = await self._send(mosaic, proc, z, x, y)
+        try:
+            content = await upstream.aread()
+        finally:
+            await upstream.aclose()
+        return PlanetTile(
+            upstream.status_code, upstream.headers.get("Content-Type"), content
+        )
+
+    async def _stream(self, key: str, future: asyncio.Future, upstream: httpx.Response):
+        chunks = list()
+        tile: Optional[PlanetTile] = None
+        try:
+            async for chunk in upstream.aiter_bytes():
+                chunks.append(chunk)
+                yield chunk
+            tile = PlanetTile(
+                200, upstream.headers.get("Content-Type"), b"".join(chunks)
+            )
+        finally:
+            await upstream.aclose()
+            self._finish(key, future, tile)
+
+        assert tile is not None
+        await self.write_back(key, tile.content)
+
+    def _finish(
+        self, key: str, future: asyncio.Future, tile: Optional[PlanetTile]
+    ) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.done():
+            future.set_result(tile)
+
+
+def _response(tile: PlanetTile) -> Response:
+    headers = {"Cache-Control": CACHE_CONTROL} if tile.status_code == 200 else None
+    return Response(
+        tile.content,
+        status_code=tile.status_code,
+        media_type=tile.media_type,
+        headers=headers,
+    )
@@ -0,0 +1,475 @@
+"""Reading and writing of PMTiles (version 3) tile archives.
+
+A PMTiles archive is a single file holding a tile pyramid, addressed by
+tile ID, which numbers tiles by zoom level and along a Hilbert curve
+within a zoom level. A fixed size header points to the root directory,
+metadata, leaf directories and tile data sections. Directories map tile
+IDs to offset and length of tile data; runs of consecutive tiles with
+the same data share one entry.
+
+See https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import struct
+from array import array
+from bisect import bisect_right
+from hashlib import md5
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from cachetools import LRUCache
+
+from ..models.types import Bounds
+
+HEADER_SIZE = 127
+MAGIC = b"PMTiles"
+VERSION = 3
+
+# Header and root directory must fit into the first 16 KiB
+ROOT_SIZE = 16384
+MAX_ROOT_SIZE = ROOT_SIZE - HEADER_SIZE
+
+# Leaf directories may point to further leaf directories
+MAX_DEPTH = 4
+LEAF_SIZE = 4096
+
+COMPRESSION_NONE = 1
+COMPRESSION_GZIP = 2
+
+TILE_TYPE_UNKNOWN = 0
+TILE_TYPE_MVT = 1
+TILE_TYPE_PNG = 2
+
+MEDIA_TYPES = {TILE_TYPE_MVT: "application/x-protobuf", TILE_TYPE_PNG: "image/png"}
+
+# Read `length` bytes at `offset` of an archive
+RangeReader = Callable[[int, int], Awaitable[bytes]]
+
+HEADER_FORMAT = "<7sB11Q6B4iB2i"
+
+
+class Entry(NamedTuple):
+    """Directory entry. Run length 0 points to a leaf directory."""
+
+    tile_id: int
+    offset: int
+    length: int
+    run_length: int
+
+
+class Header(NamedTuple):
+    root_offset: int
+    root_length: int
+    metadata_offset: int
+    metadata_length: int
+    leaf_offset: int
+    leaf_length: int
+    data_offset: int
+    data_length: int
+    addressed_tiles: int
+    tile_entries: int
+    tile_contents: int
+    clustered: bool
+    internal_compression: int
+    tile_compression: int
+    tile_type: int
+    min_zoom: int
+    max_zoom: int
+    bounds: Bounds
+    center_zoom: int
+    center: Tuple[float, float]
+
+    def pack(self) -> bytes:
+        west, south, east, north = (_e7(c) for c in self.bounds)
+        return struct.pack(
+            HEADER_FORMAT,
+            MAGIC,
+            VERSION,
+            self.root_offset,
+            self.root_length,
+            self.metadata_offset,
+            self.metadata_length,
+            self.leaf_offset,
+            self.leaf_length,
+            self.data_offset,
+            self.data_length,
+            self.addressed_tiles,
+            self.tile_entries,
+            self.tile_contents,
+            int(self.clustered),
+            self.internal_compression,
+            self.tile_compression,
+            self.tile_type,
+            self.min_zoom,
+            self.max_zoom,
+            west,
+            south,
+            east,
+            north,
+            self.center_zoom,
+            _e7(self.center[0]),
+            _e7(self.center[1]),
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Header":
+        values = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+        if values[0] != MAGIC or values[1] != VERSION:
+            raise ValueError("Not a PMTiles version 3 archive.")
+        return cls(
+            *values[2:13],
+            bool(values[13]),
+            *values[14:19],
+            tuple(v / 1e7 for v in values[19:23]),  # type: ignore
+            values[23],
+            (values[24] / 1e7, values[25] / 1e7),
+        )
+
+
+def zxy_to_tile_id(z: int, x: int, y: int) -> int:
+    """Tile ID of tile: tiles of lower zoom levels, then position along
+    the Hilbert curve of the zoom level."""
+    n = 1 << z
+    if x >= n or y >= n:
+        raise ValueError(f"Tile {z}/{x}/{y} out of range.")
+
+    tile_id = ((1 << (2 * z)) - 1) // 3
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        tile_id += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x, y = n - 1 - x, n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return tile_id
+
+
+class Directory(NamedTuple):
+    tile_ids: List[int]
+    entries: List[Entry]
+
+    def find(self, tile_id: int) -> Optional[Entry]:
+        """Entry of tile, or of the leaf directory which may hold it."""
+        i = bisect_right(self.tile_ids, tile_id) - 1
+        if i < 0:
+            return None
+        entry = self.entries[i]
+        if entry.run_length == 0 or tile_id < entry.tile_id + entry.run_length:
+            return entry
+        return None
+
+
+def serialize_directory(entries: List[Entry]) -> bytes:
+    """Encode entries column by column as varints and compress."""
+    data = bytearray()
+    _write_varint(data, len(entries))
+    last_id = 0
+    for entry in entries:
+        _write_varint(data, entry.tile_id - last_id)
+        last_id = entry.tile_id
+    for entry in entries:
+        _write_varint(data, entry.run_length)
+    for entry in entries:
+        _write_varint(data, entry.length)
+    for i, entry in enumerate(entries):
+        previous = entries[i - 1] if i else None
+        if previous is not None and entry.offset == previous.offset + previous.length:
+            _write_varint(data, 0)
+        else:
+            _write_varint(data, entry.offset + 1)
+    return gzip.compress(bytes(data), mtime=0)
+
+
+def deserialize_directory(
+    data: bytes, compression: int = COMPRESSION_GZIP
+) -> Directory:
+    if compression == COMPRESSION_GZIP:
+        data = gzip.decompress(data)
+    elif compression != COMPRESSION_NONE:
+        raise ValueError(f"Unsupported directory compression {compression}.")
+
+    position = 0
+
+    def read() -> int:
+        nonlocal position
+        value = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    count = read()
+    tile_ids: List[int] = list()
+    last_id = 0
+    for _ in range(count):
+        last_id += read()
+        tile_ids.append(last_id)
+    run_lengths = [read() for _ in range(count)]
+    lengths = [read() for _ in range(count)]
+
+    entries: List[Entry] = list()
+    for i in range(count):
+        value = read()
+        if value == 0 and i > 0:
+            offset = entries[i - 1].offset + entries[i - 1].length
+        else:
+            offset = value - 1
+        entries.append(Entry(tile_ids[i], offset, lengths[i], run_lengths[i]))
+    return Directory(tile_ids, entries)
+
+
+def build_directories(entries: List[Entry]) -> Tuple[bytes, bytes]:
+    """Root directory and leaf directories of sorted entries.
+
+    Entries are split into leaf directories if the root directory would
+    not fit into the first 16 KiB, with leaves growing until the root
+    directory pointing to them does.
+    """
+    root = serialize_directory(entries)
+    if len(root) <= MAX_ROOT_SIZE:
+        return root, b""
+
+    leaf_size = LEAF_SIZE
+    while True:
+        root_entries: List[Entry] = list()
+        leaves = bytearray()
+        for i in range(0, len(entries), leaf_size):
+            leaf = serialize_directory(entries[i : i + leaf_size])
+            root_entries.append(Entry(entries[i].tile_id, len(leaves), len(leaf), 0))
+            leaves += leaf
+        root = serialize_directory(root_entries)
+        if len(root) <= MAX_ROOT_SIZE:
+            return root, bytes(leaves)
+        leaf_size *= 2
+
+
+class PMTilesWriter:
+    """Write tiles, in any order, to a PMTiles archive.
+
+    Tile data is appended to a temporary file as tiles arrive, so that
+    only directory entries are held in memory. Tiles with the same data
+    as a recently written tile point to the existing data instead;
+    `dedup_size` bounds the number of tile hashes remembered.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        tile_type: int,
+        tile_compression: int,
+        metadata: Dict[str, Any],
+        bounds: Bounds = (-180, -85.0511287, 180, 85.0511287),
+        dedup_size: int = 100_000,
+    ) -> None:
+        self.path = path
+        self.tile_type = tile_type
+        self.tile_compression = tile_compression
+        self.metadata = metadata
+        self.bounds = bounds
+
+        self._data_path = f"{path}.tiles.tmp"
+        self._data = open(self._data_path, "wb")
+        self._data_length = 0
+        self._contents: LRUCache = LRUCache(maxsize=dedup_size)
+        self._tile_contents = 0
+        self._zooms: Set[int] = set()
+
+        self._tile_ids = array("Q")
+        self._offsets = array("Q")
+        self._lengths = array("L")
+
+    def __enter__(self) -> "PMTilesWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, z: int, x: int, y: int, data: bytes) -> bool:
+        """Add tile. Returns False if the same data was written before."""
+        digest = md5(data).digest()
+        content: Optional[Tuple[int, int]] = self._contents.get(digest)
+        duplicate = content is not None
+        if content is None:
+            content = (self._data_length, len(data))
+            self._data.write(data)
+            self._data_length += len(data)
+            self._tile_contents += 1
+            self._contents[digest] = content
+
+        offset, length = content
+        self._tile_ids.append(zxy_to_tile_id(z, x, y))
+        self._offsets.append(offset)
+        self._lengths.append(length)
+        self._zooms.add(z)
+        return not duplicate
+
+    def close(self) -> None:
+        """Build directories and write the archive."""
+        self._data.close()
+        entries = self._entries()
+        root, leaves = build_directories(entries)
+        metadata = gzip.compress(json.dumps(self.metadata).encode(), mtime=0)
+
+        min_zoom = min(self._zooms, default=0)
+        max_zoom = max(self._zooms, default=0)
+        west, south, east, north = self.bounds
+        header = Header(
+            root_offset=HEADER_SIZE,
+            root_length=len(root),
+            metadata_offset=HEADER_SIZE + len(root),
+            metadata_length=len(metadata),
+            leaf_offset=HEADER_SIZE + len(root) + len(metadata),
+            leaf_length=len(leaves),
+            data_offset=HEADER_SIZE + len(root) + len(metadata) + len(leaves),
+            data_length=self._data_length,
+            addressed_tiles=len(self._tile_ids),
+            tile_entries=len(entries),
+            tile_contents=self._tile_contents,
+            # Tile data is written in order of completion, not tile ID
+            clustered=False,
+            internal_compression=COMPRESSION_GZIP,
+            tile_compression=self.tile_compression,
+            tile_type=self.tile_type,
+            min_zoom=min_zoom,
+            max_zoom=max_zoom,
+            bounds=self.bounds,
+            center_zoom=min_zoom,
+            center=((west + east) / 2, (south + north) / 2),
+        )
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header.pack())
+            f.write(root)
+            f.write(metadata)
+            f.write(leaves)
+            with open(self._data_path, "rb") as data:
+                shutil.copyfileobj(data, f)
+        os.replace(tmp_path, self.path)
+        os.remove(self._data_path)
+
+    def abort(self) -> None:
+        self._data.close()
+        os.remove(self._data_path)
+
+    def _entries(self) -> List[Entry]:
+        """Directory entries sorted by tile ID, with runs of consecutive
+        tiles of the same data merged."""
+        entries: List[Entry] = list()
+        order = sorted(range(len(self._tile_ids)), key=self._tile_ids.__getitem__)
+        for i in order:
+            tile_id, offset = self._tile_ids[i], self._offsets[i]
+            last = entries[-1] if entries else None
+            if (
+                last is not None
+                and last.offset == offset
+                and last.tile_id + last.run_length == tile_id
+            ):
+                entries[-1] = last._replace(run_length=last.run_length + 1)
+            elif last is not None and last.tile_id == tile_id:
+                # Tile written twice, keep the first one
+                continue
+            else:
+                entries.append(Entry(tile_id, offset, self._lengths[i], 1))
+        return entries
+
+
+class PMTilesReader:
+    """Read tiles from a PMTiles archive with range reads.
+
+    Header and root directory are read with the first request and kept.
+    Leaf directories are kept in the `directories` cache, which may be
+    shared between archives, so that tiles take a single range read once
+    their directory was read.
+    """
+
+    def __init__(
+        self, name: str, read_range: RangeReader, directories: LRUCache
+    ) -> None:
+        self.name = name
+        self.read_range = read_range
+        self.directories = directories
+
+        self._header: Optional[Header] = None
+        self._root: Optional[Directory] = None
+        self._lock = asyncio.Lock()
+
+    async def header(self) -> Header:
+        await self._load()
+        assert self._header is not None
+        return self._header
+
+    async def get_tile(self, z: int, x: int, y: int) -> Optional[bytes]:
+        """Tile data as stored, or None if the archive has no such tile."""
+        await self._load()
+        header, directory = self._header, self._root
+        assert header is not None and directory is not None
+
+        tile_id = zxy_to_tile_id(z, x, y)
+        for _ in range(MAX_DEPTH):
+            entry = directory.find(tile_id)
+            if entry is None:
+                return None
+            if entry.run_length > 0:
+                return await self.read_range(
+                    header.data_offset + entry.offset, entry.length
+                )
+            directory = await self._leaf(header, entry)
+        return None
+
+    async def _load(self) -> None:
+        if self._root is not None:
+            return
+        async with self._lock:
+            if self._root is not None:
+                return
+            data = await self.read_range(0, ROOT_SIZE)
+            header = Header.unpack(data)
+            root = data[header.root_offset : header.root_offset + header.root_length]
+            self._root = deserialize_directory(root, header.internal_compression)
+            self._header = header
+
+    async def _leaf(self, header: Header, entry: Entry) -> Directory:
+        key = (self.name, entry.offset)
+        directory = self.directories.get(key)
+        if directory is None:
+            data = await self.read_range(
+                header.leaf_offset + entry.offset, entry.length
+            )
+            directory = deserialize_directory(data, header.internal_compression)
+            self.directories[key] = directory
+        return directory
+
+
+def _write_varint(data: bytearray, value: int) -> None:
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _e7(coordinate: float) -> int:
+    return int(round(coordinate * 1e7))
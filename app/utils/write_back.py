@@ -0,0 +1,207 @@
+"""Bounded write-back queue for tile cache uploads.
+
+Dynamically rendered tiles are copied to the tile cache bucket so that
+later requests can be served from there. Instead of scheduling one
+upload per request, tiles are put on an app-level queue which is drained
+by a fixed number of workers. Pending uploads are deduplicated by key.
+When the queue is full, tiles are spilled to disk (if a spill directory
+is configured) or dropped. On shutdown, the queue is flushed. Spill
+files are written and read in a thread to not block the event loop.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.logger import logger
+
+from .metrics import metrics
+
+Upload = Callable[[bytes, str], Awaitable[None]]
+
+PARTIAL_SUFFIX = ".partial"
+
+
+class WriteBackQueue:
+    def __init__(
+        self,
+        upload: Upload,
+        maxsize: int = 1000,
+        workers: int = 4,
+        spill_dir: Optional[str] = None,
+        flush_timeout: float = 20,
+        name: str = "write_back",
+    ):
+        self.upload = upload
+        self.maxsize = maxsize
+        self.workers = workers
+        self.spill_dir = spill_dir
+        self.flush_timeout = flush_timeout
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, Tuple[bytes, float]] = dict()
+        self._tasks: List[asyncio.Task] = list()
+        self._closing = False
+        self._loading = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def init_app(self, app) -> None:
+        @app.on_event("startup")
+        async def startup():
+            await self.start()
+
+        @app.on_event("shutdown")
+        async def shutdown():
+            await self.close()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+
+        self._closing = False
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self._load_spilled()
+        logger.info(f"Started {self.name} queue with {self.workers} workers")
+
+    async def enqueue(self, key: str, data: bytes) -> bool:
+        """Schedule tile for upload.
+
+        Returns False if the tile was spilled to disk or dropped.
+        """
+        if not self.running and not self._closing:
+            await self.start()
+
+        if key in self._pending:
+            # Same tile is already waiting for upload
+            metrics.increment(f"{self.name}.deduplicated")
+            return True
+
+        if self._closing or self.depth >= self.maxsize:
+            await self._spill(key, data)
+            return False
+
+        self._put(key, data, time.monotonic())
+        return True
+
+    async def close(self) -> None:
+        """Flush pending uploads and stop workers.
+
+        Uploads which do not finish within the flush timeout are spilled
+        to disk or dropped.
+        """
+        if not self.running:
+            return
+
+        self._closing = True
+        assert self._queue is not None
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.flush_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Could not flush {self.name} queue within {self.flush_timeout}s. "
+                f"{self.depth} tiles left."
+            )
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = list()
+
+        for key, (data, _) in list(self._pending.items()):
+            await self._spill(key, data)
+        self._pending.clear()
+        metrics.gauge(f"{self.name}.depth", 0)
+
+    def _put(self, key: str, data: bytes, enqueued_at: float) -> None:
+        assert self._queue is not None
+        self._pending[key] = (data, enqueued_at)
+        self._queue.put_nowait(key)
+        metrics.gauge(f"{self.name}.depth", self.depth)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            key = await self._queue.get()
+            try:
+                data, enqueued_at = self._pending[key]
+                with metrics.timer(f"{self.name}.upload"):
+                    await self.upload(data, key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.increment(f"{self.name}.failed")
+                logger.error(f"Failed to copy tile {key} to tile cache: {e}")
+            else:
+                metrics.increment(f"{self.name}.uploaded")
+                metrics.observe(f"{self.name}.latency", time.monotonic() - enqueued_at)
+            finally:
+                self._pending.pop(key, None)
+                metrics.gauge(f"{self.name}.depth", self.depth)
+                self._queue.task_done()
+
+            if not self._queue.qsize() and not self._closing:
+                await self._load_spilled()
+
+    async def _spill(self, key: str, data: bytes) -> None:
+        if not self.spill_dir:
+            metrics.increment(f"{self.name}.dropped")
+            logger.warning(f"{self.name} queue is full. Drop tile {key}.")
+            return
+
+        await asyncio.to_thread(_write_file, os.path.join(self.spill_dir, key), data)
+        metrics.increment(f"{self.name}.spilled")
+
+    async def _load_spilled(self) -> None:
+        """Move spilled tiles back onto the queue while there is room."""
+        room = self.maxsize - self.depth
+        if not self.spill_dir or self._loading or room <= 0:
+            return
+
+        # Workers finishing at the same time must not load the same files
+        self._loading = True
+        try:
+            spilled = await asyncio.to_thread(_pop_files, self.spill_dir, room)
+        finally:
+            self._loading = False
+
+        for key, data in spilled:
+            if key not in self._pending:
+                self._put(key, data, time.monotonic())
+
+
+def _write_file(path: str, data: bytes) -> None:
+    # Spilled files are only visible once complete
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}{PARTIAL_SUFFIX}", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}{PARTIAL_SUFFIX}", path)
+
+
+def _pop_files(directory: str, limit: int) -> List[Tuple[str, bytes]]:
+    """Read and remove up to limit files below directory, keyed by
+    relative path."""
+    files: List[Tuple[str, bytes]] = list()
+    if not os.path.isdir(directory):
+        return files
+
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(PARTIAL_SUFFIX):
+                continue
+            if len(files) >= limit:
+                return files
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files.append((os.path.relpath(path, directory), f.read()))
+            os.remove(path)
+    return files
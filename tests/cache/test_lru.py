@@ -0,0 +1,107 @@
+import time
+
+from app.cache import is_dynamic_tile, max_age, neighbour_tile_path, tile_cache_key
+from app.cache.lru import CachedResponse, LRUTileCache
+
+
+def _response(body: bytes) -> CachedResponse:
+    return CachedResponse(200, [("content-type", "application/x-protobuf")], body)
+
+
+def test_lru_tile_cache_hit_and_miss():
+    cache = LRUTileCache(max_bytes=1024, max_item_bytes=1024)
+    assert cache.get("a") is None
+
+    cache.set("a", _response(b"tile"), ttl=60)
+    assert cache.get("a").body == b"tile"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.hit_rate == 0.5
+
+
+def test_lru_tile_cache_evicts_least_recently_used():
+    cache = LRUTileCache(max_bytes=30, max_item_bytes=30)
+    cache.set("a", _response(b"x" * 10), ttl=60)
+    cache.set("b", _response(b"x" * 10), ttl=60)
+    cache.get("a")
+    cache.set("c", _response(b"x" * 10), ttl=60)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.size <= 30
+
+
+def test_lru_tile_cache_expires_entries():
+    cache = LRUTileCache(max_bytes=1024, max_item_bytes=1024)
+    cache.set("a", _response(b"tile"), ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_tile_cache_skips_large_and_uncacheable_entries():
+    cache = LRUTileCache(max_bytes=1024, max_item_bytes=10)
+    assert not cache.set("a", _response(b"x" * 20), ttl=60)
+    assert not cache.set("b", _response(b"x"), ttl=0)
+    assert len(cache) == 0
+
+
+def test_lru_tile_cache_counts_encoded_variants():
+    cache = LRUTileCache(max_bytes=1024, max_item_bytes=30)
+    response = _response(b"x" * 10)._replace(encoded={"gzip": b"x" * 10})
+    assert cache.set("a", response, ttl=60)
+    assert cache.size == 21
+
+    response = _response(b"x" * 10)._replace(encoded={"gzip": b"x" * 20})
+    assert not cache.set("b", response, ttl=60)
+
+
+def test_lru_tile_cache_purge():
+    cache = LRUTileCache(max_bytes=1024, max_item_bytes=1024)
+    cache.set("/dataset/v1/dynamic/0/0/0.pbf?", _response(b"tile"), ttl=60)
+    cache.set("/dataset/v2/dynamic/0/0/0.pbf?", _response(b"tile"), ttl=60)
+
+    assert cache.purge("/dataset/v1/") == 1
+    assert len(cache) == 1
+    assert cache.purge() == 1
+    assert cache.size == 0
+
+
+def test_tile_cache_key_normalises_query_params():
+    key1 = tile_cache_key(
+        "/dataset/v1/dynamic/0/0/0.pbf", [("b", "2"), ("a", "1"), ("c", "")]
+    )
+    key2 = tile_cache_key("/dataset/v1/dynamic/0/0/0.pbf", [("a", "1"), ("b", "2")])
+    assert key1 == key2 == "/dataset/v1/dynamic/0/0/0.pbf?a=1&b=2"
+
+
+def test_is_dynamic_tile():
+    assert is_dynamic_tile("/nasa_viirs_fire_alerts/v202003/dynamic/3/1/2.pbf")
+    assert is_dynamic_tile("/nasa_viirs_fire_alerts/v202003/dynamic/3/1/2@0.25x.pbf")
+    assert is_dynamic_tile("/wur_radd_alerts/v20201214/dynamic/14/0/0.png")
+    assert not is_dynamic_tile("/wdpa_protected_areas/v201912/default/3/1/2.pbf")
+    assert not is_dynamic_tile(
+        "/nasa_viirs_fire_alerts/v202003/dynamic/VectorTileServer"
+    )
+
+
+def test_neighbour_tile_path():
+    assert (
+        neighbour_tile_path("/dataset/v1/dynamic/10/1/2@2x.pbf", 2, 3, 10)
+        == "/dataset/v1/dynamic/10/2/3@2x.pbf"
+    )
+    assert (
+        neighbour_tile_path("/dataset/v1/dynamic/10/1/2.png", 1, 3, 10)
+        == "/dataset/v1/dynamic/10/1/3.png"
+    )
+    assert neighbour_tile_path("/dataset/v1/dynamic/10/1/2.pbf", 1, 3, 11) is None
+    assert neighbour_tile_path("/dataset/v1/default/10/1/2.pbf", 1, 3, 10) is None
+
+
+def test_max_age():
+    assert max_age("max-age=7200") == 7200
+    assert max_age("public, max-age=60") == 60
+    assert max_age("no-cache") == 0
+    assert max_age(None) == 0
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.cache.backends import InMemoryBackend, PostgresBackend
+from app.cache.lru import CachedResponse
+from app.cache.shared import SharedTileCache, dumps, loads
+from app.settings.globals import GLOBALS
+
+
+def _response(body: bytes) -> CachedResponse:
+    return CachedResponse(
+        200,
+        [("content-type", "application/x-protobuf"), ("cache-control", "max-age=60")],
+        body,
+    )
+
+
+def test_dumps_loads():
+    response = _response(b"x" * 1000)
+
+    compressed = dumps(response, 123.0, compression_level=6)
+    raw = dumps(response, 123.0, compression_level=0)
+
+    assert len(compressed) < len(raw)
+    assert loads(compressed) == (response, 123.0)
+    assert loads(raw) == (response, 123.0)
+
+
+def test_dumps_loads_encoded():
+    response = _response(b"x" * 1000)._replace(
+        encoded={"br": b"brotli", "gzip": b"gzipped"}
+    )
+
+    assert loads(dumps(response, 123.0, compression_level=6)) == (response, 123.0)
+
+
+@pytest.mark.asyncio
+async def test_shared_tile_cache_in_memory():
+    cache = SharedTileCache(InMemoryBackend())
+    response = _response(b"tile")
+
+    assert await cache.get("a") is None
+
+    await cache.set("a", response, 60)
+    cached, ttl = await cache.get("a")
+    assert cached == response
+    assert 0 < ttl <= 60
+
+    assert await cache.purge("a") == 1
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_shared_tile_cache_expires_entries():
+    cache = SharedTileCache(InMemoryBackend())
+    await cache.set("a", _response(b"tile"), 1)
+    await asyncio.sleep(1.1)
+
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_shared_tile_cache_ignores_backend_errors():
+    class BrokenBackend(InMemoryBackend):
+        async def get(self, key):
+            raise ConnectionError("Backend unavailable")
+
+        async def set(self, key, value, ttl):
+            raise ConnectionError("Backend unavailable")
+
+    cache = SharedTileCache(BrokenBackend())
+    await cache.set("a", _response(b"tile"), 60)
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_shared_tile_cache_postgres():
+    backend = PostgresBackend(str(GLOBALS.database_config.url), table="test_tile_cache")
+    await backend.connect()
+    try:
+        cache = SharedTileCache(backend)
+        response = _response(b"tile")
+
+        await cache.set("/dataset/v1/dynamic/0/0/0.pbf?", response, 60)
+        cached, _ = await cache.get("/dataset/v1/dynamic/0/0/0.pbf?")
+        assert cached == response
+
+        assert await cache.purge("/dataset/v1/") == 1
+        assert await cache.get("/dataset/v1/dynamic/0/0/0.pbf?") is None
+    finally:
+        await backend.pool.execute("DROP TABLE IF EXISTS test_tile_cache")
+        await backend.close()
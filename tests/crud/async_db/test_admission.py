@@ -0,0 +1,57 @@
+import asyncio
+
+import mercantile
+import pytest
+
+from app.crud.async_db.vector_tiles.admission import Lane, estimate_cost
+from app.errors import OverloadedError
+
+
+def _bbox(z: int):
+    return tuple(mercantile.xy_bounds(0, 0, z))
+
+
+def test_estimate_cost():
+    assert estimate_cost("v202003", _bbox(10), {}) == 1
+    assert estimate_cost("v202003", _bbox(12), {}) == 1
+    assert estimate_cost("v202003", _bbox(8), {}) == 4
+
+    params = {"start_date": "2020-01-01", "end_date": "2020-03-30"}
+    assert estimate_cost("v202003", _bbox(3), params) == 2**7 * 90 / 7
+
+    # Generalised tables don't get more expensive at low zoom
+    assert estimate_cost("v202003__z0_5", _bbox(3), {}) == 1
+    assert estimate_cost("v20240101__daily_z4", _bbox(3), params) == 90 / 7
+
+    params = {"geometry": b"x" * 16 * 1024}
+    assert estimate_cost("v202003", _bbox(10), params) == 2
+
+
+@pytest.mark.asyncio
+async def test_lane_limits_concurrency():
+    lane = Lane("test", concurrency=2, queue_timeout=1)
+    running = []
+
+    async def query():
+        async with lane.admit():
+            running.append(lane.running)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(query() for _ in range(5)))
+    assert max(running) == 2
+    assert lane.running == lane.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_lane_sheds_after_queue_timeout():
+    lane = Lane("test", concurrency=1, queue_timeout=0.01)
+
+    async with lane.admit():
+        with pytest.raises(OverloadedError) as e:
+            async with lane.admit():
+                pass
+    assert e.value.retry_after == 1
+
+    # Lane is available again
+    async with lane.admit():
+        assert lane.running == 1
@@ -0,0 +1,53 @@
+import mercantile
+import pytest
+
+from app.crud.async_db.vector_tiles import coverage
+from app.crud.async_db.vector_tiles.coverage import Coverage, check_coverage, tile_xyz
+from app.crud.sync_db.tile_cache_assets import TileCacheRegistry
+from app.errors import EmptyTileError
+
+
+def test_coverage():
+    index = Coverage.from_tiles([(3, 5), (12, 0)], 4)
+
+    assert index.covers(3, 5, 4)
+    assert index.covers(12, 0, 4)
+    assert not index.covers(4, 5, 4)
+
+    # Ancestors
+    assert index.covers(0, 0, 0)
+    assert index.covers(1, 2, 3)
+    assert index.covers(0, 1, 2)
+    assert not index.covers(1, 1, 2)
+
+    # Descendants
+    assert index.covers(3 * 4 + 1, 5 * 4 + 2, 6)
+    assert not index.covers(4 * 4, 5 * 4, 6)
+
+
+def test_tile_xyz():
+    for tile in [mercantile.Tile(0, 0, 0), mercantile.Tile(5, 9, 4)]:
+        assert tile_xyz(tuple(mercantile.xy_bounds(tile))) == tuple(tile)
+
+
+def test_check_coverage(monkeypatch):
+    registry = TileCacheRegistry(
+        [], {("my_schema", "v1"): Coverage.from_tiles([(0, 0)], 1).bitmaps}
+    )
+    monkeypatch.setattr(coverage, "get_registry", lambda: registry)
+
+    check_coverage("my_schema", "v1", tuple(mercantile.xy_bounds(0, 0, 2)))
+    check_coverage("my_schema", "v2", tuple(mercantile.xy_bounds(1, 1, 1)))
+    with pytest.raises(EmptyTileError):
+        check_coverage("my_schema", "v1", tuple(mercantile.xy_bounds(1, 1, 1)))
+
+
+def test_check_coverage_updated_in_place(monkeypatch):
+    registry = TileCacheRegistry(
+        [],
+        {("nasa_viirs_fire_alerts", "v1"): Coverage.from_tiles([(0, 0)], 1).bitmaps},
+    )
+    monkeypatch.setattr(coverage, "get_registry", lambda: registry)
+
+    bbox = tuple(mercantile.xy_bounds(1, 1, 1))
+    check_coverage("nasa_viirs_fire_alerts", "v1", bbox)
@@ -0,0 +1,57 @@
+from uuid import uuid4
+
+import mercantile
+import pytest
+from shapely import wkb
+from shapely.geometry import box
+
+from app.crud.async_db.vector_tiles import filters
+from app.crud.async_db.vector_tiles.filters import (
+    CLIP_MARGIN,
+    geometry_filter,
+    get_geostore_shape,
+)
+from app.errors import EmptyTileError
+
+# Covers western half of tile 0/0/1 (lng -180 to -90)
+GEOMETRY = {
+    "type": "Polygon",
+    "coordinates": [[[-180, 0], [-90, 0], [-90, 80], [-180, 80], [-180, 0]]],
+}
+
+
+@pytest.fixture
+def geostore(monkeypatch):
+    async def _get_geostore_geometry(geostore_id, geostore_origin):
+        return GEOMETRY
+
+    monkeypatch.setattr(filters, "_get_geostore_geometry", _get_geostore_geometry)
+    return uuid4()
+
+
+@pytest.mark.asyncio
+async def test_geometry_filter_outside(geostore):
+    bounds = mercantile.xy_bounds(1, 0, 1)
+    with pytest.raises(EmptyTileError):
+        await geometry_filter(geostore, bounds, "rw")
+
+
+@pytest.mark.asyncio
+async def test_geometry_filter_inside(geostore):
+    bounds = mercantile.xy_bounds(mercantile.tile(-135, 40, 6))
+    assert await geometry_filter(geostore, bounds, "rw") is None
+
+
+@pytest.mark.asyncio
+async def test_geometry_filter_partial(geostore):
+    # Geostore covers southern part of tile (lat 66.5 to 80)
+    bounds = mercantile.xy_bounds(0, 0, 2)
+    f = await geometry_filter(geostore, bounds, "rw")
+
+    assert f.text == "ST_Intersects(t.geom_wm, ST_GeomFromWKB(:geometry, 3857))"
+    clipped = wkb.loads(f._bindparams["geometry"].value)
+    geostore_shape = await get_geostore_shape(geostore, "rw")
+    assert clipped.area < geostore_shape.geometry.area
+
+    margin = (bounds.right - bounds.left) * CLIP_MARGIN
+    assert clipped.within(box(*bounds).buffer(margin + 1, join_style=2))
@@ -0,0 +1,94 @@
+import mercantile
+from sqlalchemy import column
+
+from app.crud.async_db.vector_tiles import (
+    MvtTable,
+    _as_vector_tile,
+    get_metatile_template,
+    get_mvt_table,
+    mvt_options,
+    mvt_table_key,
+)
+from app.crud.async_db.vector_tiles.filters import date_filter
+from app.crud.async_db.vector_tiles.metatiles import (
+    Metatile,
+    get_metatile,
+    metatile_bounds,
+    metatile_tiles,
+    tile_bounds,
+)
+
+
+def test_get_metatile():
+    metatiles = (Metatile(6, 8, 2), Metatile(9, 12), Metatile(13, 14, 1))
+    assert get_metatile(metatiles, 5) is None
+    assert get_metatile(metatiles, 7) == Metatile(6, 8, 2)
+    assert get_metatile(metatiles, 12) == Metatile(9, 12, 4)
+    assert get_metatile(metatiles, 13) is None
+
+
+def test_metatile_tiles():
+    tiles = metatile_tiles((5, 6, 10), 4)
+    assert len(tiles) == 16
+    assert tiles[0] == (4, 4, 10)
+    assert tiles[-1] == (7, 7, 10)
+    assert (5, 6, 10) in tiles
+
+    assert metatile_tiles((1, 0, 1), 4) == [(0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1)]
+
+
+def test_metatile_bounds():
+    tiles = metatile_tiles((5, 6, 10), 2)
+    left, bottom, right, top = metatile_bounds([tile_bounds(t) for t in tiles])
+    assert (left, top) == mercantile.xy_bounds(4, 6, 10)[::3]
+    assert (right, bottom) == mercantile.xy_bounds(5, 7, 10)[2:0:-1]
+
+
+def test_get_metatile_template():
+    filters = [date_filter("alert__date", "2020-01-01", "2021-01-01")]
+    table = MvtTable(
+        "umd_modis_burned_areas",
+        "v202003",
+        tile_bounds((5, 6, 10)),
+        4096,
+        [column("column1")],
+        filters,
+    )
+    cte_table = table._replace(
+        schema_name=None,
+        table_name="metatile",
+        options=mvt_options(table.schema_name),
+    )
+    key = ("test_metatile", mvt_table_key(table))
+    template = get_metatile_template(
+        key,
+        lambda: _as_vector_tile(get_mvt_table(*cte_table), "default", 4096),
+        table,
+        materialized=True,
+    )
+
+    assert template.param_names == (
+        "start_date",
+        "end_date",
+        "tiles_index",
+        "tiles_left",
+        "tiles_bottom",
+        "tiles_right",
+        "tiles_top",
+        "tiles_margin",
+        "metatile_left",
+        "metatile_bottom",
+        "metatile_right",
+        "metatile_top",
+        "metatile_margin",
+    )
+    assert template.sql.startswith("WITH metatile AS MATERIALIZED (SELECT t.*")
+    assert "FROM umd_modis_burned_areas.v202003 AS t" in template.sql
+    assert "FROM metatile AS t" in template.sql
+    assert "ST_Expand(ST_MakeEnvelope($9, $10, $11, $12, 3857), $13)" in template.sql
+    # Filters of the CTE and the tile query share parameters
+    assert template.sql.count("TO_TIMESTAMP($1,'YYYY-MM-DD')") == 2
+    assert "$14" not in template.sql
+
+    plain = get_metatile_template(key, lambda: None, table, materialized=False)
+    assert plain.sql.startswith("WITH metatile AS (SELECT t.*")
@@ -1,13 +1,29 @@
+import mercantile
 import pytest
 from shapely.geometry import box
 from sqlalchemy import column, literal_column, select, table, text
 
+from app.application import db
+from app.crud.async_db import vector_tiles
 from app.crud.async_db.vector_tiles import (
+    MvtOptions,
+    MvtTable,
     _as_vector_tile,
     _filter_mvt_table,
     _get_tile,
     _group_mvt_table,
+    get_batch_template,
     get_mvt_table,
+    get_query_template,
+    get_tiles,
+    mvt_table_key,
+    mvt_table_params,
+)
+from app.crud.async_db.vector_tiles.filters import (
+    date_filter,
+    envelope_filter,
+    filter_eq,
+    filter_intersects,
 )
 from app.responses import VectorTileResponse
 
@@ -20,7 +36,41 @@ def test_get_mvt_table():
     filters = [text("column1 = 1"), text("column2 = 'abc")]
     extent = 4096
     sql = get_mvt_table(schema_name, table_name, bbox.bounds, extent, columns, filters)
-    expected_sql = "SELECT column1, column2, ST_AsMVTGeom(t.geom_wm, bounds.geom::box2d, 4096, 0,false) AS geom FROM my_schema.my_table AS t, (SELECT ST_MakeEnvelope(:left, :bottom, :right, :top, 3857) AS geom) AS bounds WHERE ST_Intersects(t.geom_wm, bounds.geom) AND column1 = 1 AND column2 = 'abc"
+    expected_sql = "SELECT column1, column2, ST_AsMVTGeom(t.geom_wm, bounds.geom::box2d, 4096, 0, false) AS geom FROM my_schema.my_table AS t, (SELECT ST_MakeEnvelope(:left, :bottom, :right, :top, 3857) AS geom) AS bounds WHERE t.geom_wm && bounds.geom AND ST_Intersects(t.geom_wm, bounds.geom) AND column1 = 1 AND column2 = 'abc"
+
+    assert str(sql).replace("\n", "") == expected_sql
+
+
+def test_get_mvt_table_options():
+    options = MvtOptions(buffer=64, clip=True, exact=False)
+    bbox = (0, 0, 4096, 4096)
+    sql = get_mvt_table("my_schema", "my_table", bbox, 4096, [], [], [], options)
+    expected_sql = "SELECT ST_AsMVTGeom(t.geom_wm, bounds.geom::box2d, 4096, 64, true) AS geom FROM my_schema.my_table AS t, (SELECT ST_MakeEnvelope(:left, :bottom, :right, :top, 3857) AS geom) AS bounds WHERE t.geom_wm && ST_Expand(bounds.geom, :margin)"
+
+    assert str(sql).replace("\n", "") == expected_sql
+
+    table = MvtTable("my_schema", "my_table", bbox, 4096, [], [], options=options)
+    assert mvt_table_params(table)["margin"] == 64
+
+
+def test_get_mvt_table_generalization():
+    options = MvtOptions(simplify=0.5, snap=True, min_size=1)
+    bbox = (0, 0, 4096, 4096)
+    sql = get_mvt_table("my_schema", "my_table", bbox, 4096, [], [], [], options)
+    expected_sql = (
+        "SELECT ST_AsMVTGeom("
+        "ST_SnapToGrid("
+        "ST_Simplify(t.geom_wm, (ST_XMax(bounds.geom) - ST_XMin(bounds.geom)) / 4096 * 0.5, false), "
+        "ST_XMin(bounds.geom), ST_YMax(bounds.geom), "
+        "(ST_XMax(bounds.geom) - ST_XMin(bounds.geom)) / 4096, "
+        "(ST_XMax(bounds.geom) - ST_XMin(bounds.geom)) / 4096), "
+        "bounds.geom::box2d, 4096, 0, false) AS geom "
+        "FROM my_schema.my_table AS t, "
+        "(SELECT ST_MakeEnvelope(:left, :bottom, :right, :top, 3857) AS geom) AS bounds "
+        "WHERE t.geom_wm && bounds.geom AND ST_Intersects(t.geom_wm, bounds.geom) "
+        "AND GREATEST(ST_XMax(t.geom_wm) - ST_XMin(t.geom_wm), ST_YMax(t.geom_wm) - ST_YMin(t.geom_wm)) "
+        ">= (ST_XMax(bounds.geom) - ST_XMin(bounds.geom)) / 4096 * 1"
+    )
 
     assert str(sql).replace("\n", "") == expected_sql
 
@@ -72,3 +122,173 @@ async def test__get_tile(connect_db):
 
     assert response.status_code == 200
     assert response.media_type == "application/x-protobuf"
+
+
+def test_get_query_template():
+    def table(start_date, confidence):
+        filters = [
+            date_filter("alert__date", start_date, "2021-01-01"),
+            filter_eq("confidence", confidence),
+        ]
+        return MvtTable(
+            "my_schema", "my_table", (1, 1, 2, 2), 4096, [column("column1")], filters
+        )
+
+    builds = list()
+
+    def build(table):
+        def _build():
+            builds.append(table)
+            return _as_vector_tile(get_mvt_table(*table), "default", table.extent)
+
+        return _build
+
+    table1 = table("2020-01-01", "high")
+    table2 = table("2020-06-01", "low")
+    assert mvt_table_key(table1) == mvt_table_key(table2)
+
+    template1 = get_query_template(("test", mvt_table_key(table1)), build(table1))
+    template2 = get_query_template(("test", mvt_table_key(table2)), build(table2))
+
+    assert template1 is template2
+    assert builds == [table1]
+    assert "ST_MakeEnvelope($1, $2, $3, $4, 3857)" in template1.sql
+    assert template1.param_names == (
+        "left",
+        "bottom",
+        "right",
+        "top",
+        "start_date",
+        "end_date",
+        "confidence",
+    )
+
+    params = mvt_table_params(table2)
+    assert [params[name] for name in template1.param_names] == [
+        1,
+        1,
+        2,
+        2,
+        "2020-06-01",
+        "2021-01-01",
+        "low",
+    ]
+
+
+def test_get_batch_template():
+    filters = [date_filter("alert__date", "2020-01-01", "2021-01-01")]
+    table = MvtTable(
+        "umd_modis_burned_areas",
+        "v202003",
+        (1, 1, 2, 2),
+        4096,
+        [column("column1")],
+        filters,
+    )
+    key = ("test_batch", mvt_table_key(table))
+    template = get_query_template(
+        key, lambda: _as_vector_tile(get_mvt_table(*table), "default", 4096)
+    )
+    batch = get_batch_template(key, template)
+
+    assert get_batch_template(key, template) is batch
+    assert batch.param_names == (
+        "start_date",
+        "end_date",
+        "tiles_index",
+        "tiles_left",
+        "tiles_bottom",
+        "tiles_right",
+        "tiles_top",
+        "tiles_margin",
+    )
+    assert "CROSS JOIN LATERAL" in batch.sql
+    assert (
+        'ST_MakeEnvelope(tiles."left", tiles."bottom", tiles."right", tiles."top", 3857)'
+        in batch.sql
+    )
+    assert 'ST_Expand(bounds.geom, tiles."margin")' in batch.sql
+    assert (
+        "TO_TIMESTAMP($1,'YYYY-MM-DD') AND TO_TIMESTAMP($2,'YYYY-MM-DD')" in batch.sql
+    )
+    assert "$9" not in batch.sql
+
+
+@pytest.mark.asyncio
+async def test_get_tiles_clipped_to_geostore(monkeypatch):
+    """Tiles inside and at the edge of a geostore are rendered with one
+    statement, each with its own filter geometry."""
+    statements = list()
+
+    async def fetch_batch_tiles(template, params, tables, reuse=True):
+        statements.append((template, params))
+        return [b"tile"] * len(tables)
+
+    monkeypatch.setattr(vector_tiles, "_fetch_batch_tiles", fetch_batch_tiles)
+
+    tables = list()
+    for x in range(3):
+        bbox = tuple(mercantile.xy_bounds(x, 0, 2))
+        f = (
+            envelope_filter(bbox)
+            if x == 0
+            else filter_intersects("t.geom_wm", box(*bbox).buffer(-x))
+        )
+        tables.append(MvtTable("my_schema", "v1", bbox, 4096, [], [f]))
+
+    assert await get_tiles(tables, name="default") == [b"tile"] * 3
+    assert len(statements) == 1
+
+    template, params = statements[0]
+    assert "tiles_geometry" in template.param_names
+    assert "geometry" not in template.param_names
+    assert 'ST_GeomFromWKB(tiles."geometry", 3857)' in template.sql
+    assert "::bytea[]" in template.sql
+    assert len(set(params["tiles_geometry"])) == 3
+
+
+def test_mvt_table_key():
+    filters = [filter_eq("confidence", "high")]
+    table = MvtTable("my_schema", "my_table", (1, 1, 2, 2), 4096, [], filters)
+
+    assert mvt_table_key(table) != mvt_table_key(table._replace(filters=[]))
+    assert mvt_table_key(table) != mvt_table_key(table._replace(extent=512))
+    assert mvt_table_key(table) != mvt_table_key(
+        table._replace(columns=[column("column1")])
+    )
+
+
+@pytest.mark.asyncio
+async def test_mvt_table_uses_spatial_index(connect_db):
+    table = MvtTable(
+        "umd_modis_burned_areas",
+        "v202003",
+        tuple(mercantile.xy_bounds(2, 3, 3)),
+        4096,
+        [column("alert__date")],
+        [],
+    )
+    template = get_query_template(
+        ("test_index", mvt_table_key(table)),
+        lambda: _as_vector_tile(get_mvt_table(*table), "test", 4096),
+    )
+    params = mvt_table_params(table)
+    args = [params[name] for name in template.param_names]
+
+    async with db.acquire() as conn:
+        raw_connection = await conn.get_raw_connection()
+        transaction = raw_connection.transaction()
+        await transaction.start()
+        try:
+            await raw_connection.execute(
+                "CREATE INDEX ON umd_modis_burned_areas.v202003 USING gist (geom_wm)"
+            )
+            # Table is almost empty, force planner to consider the index
+            await raw_connection.execute("SET LOCAL enable_seqscan = off")
+            rows = await raw_connection.fetch(f"EXPLAIN {template.sql}", *args)
+        finally:
+            await transaction.rollback()
+
+    plan = "\n".join(row[0] for row in rows)
+    assert "Index Scan" in plan
+    assert "geom_wm && " in plan
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+from app.crud.sync_db.tile_cache_assets import (
+    RegistryRefresher,
+    TileCacheAsset,
+    TileCacheRegistry,
+)
+from app.models.enumerators.tile_caches import TileCacheType
+
+STATIC = TileCacheType.static_vector_tile_cache.value
+DYNAMIC = TileCacheType.dynamic_vector_tile_cache.value
+RASTER = TileCacheType.raster_tile_cache.value
+
+
+def asset(asset_type, dataset, version, implementation, is_latest, max_date=None):
+    return TileCacheAsset(
+        asset_type=asset_type,
+        dataset=dataset,
+        version=version,
+        implementation=implementation,
+        is_latest=is_latest,
+        min_zoom=0,
+        max_zoom=12,
+        min_date=None,
+        max_date=max_date,
+        asset_uri=f"{asset_type}/{dataset}/{version}/{implementation}",
+    )
+
+
+REGISTRY = TileCacheRegistry(
+    [
+        asset(RASTER, "glad", "v2", "default", True, "2021-02-01"),
+        asset(RASTER, "glad", "v2", "intensity", True, "2021-02-01"),
+        asset(RASTER, "glad", "v1", "default", False, "2021-01-01"),
+        asset(DYNAMIC, "glad", "v2", None, True, "2021-02-02"),
+        asset(STATIC, "wdpa", "v1", "default", True),
+    ]
+)
+
+
+def test_datasets_and_versions():
+    assert REGISTRY.datasets(RASTER) == ("glad",)
+    assert REGISTRY.datasets(TileCacheType.cog) == ()
+    assert REGISTRY.versions("glad", RASTER) == ("v2", "v1")
+    assert REGISTRY.versions("glad", TileCacheType.raster_tile_cache) == ("v2", "v1")
+    assert REGISTRY.has_version("glad", "v1", RASTER)
+    assert not REGISTRY.has_version("glad", "v1", DYNAMIC)
+    assert not REGISTRY.has_version("fails", "v1", RASTER)
+
+
+def test_latest_versions():
+    assert REGISTRY.latest_version("glad", RASTER) == "v2"
+    assert REGISTRY.latest_version("fails", RASTER) is None
+    # Deduplicated across tile cache types, in tile cache type order
+    assert REGISTRY.latest_versions() == (("glad", "v2"), ("wdpa", "v1"))
+
+
+def test_assets():
+    assert REGISTRY.asset("glad", "v1", "default", RASTER).max_zoom == 12
+    assert REGISTRY.asset("glad", "v1", "intensity", RASTER) is None
+    assert REGISTRY.implementations("glad", "v2", RASTER) == ("default", "intensity")
+    # Assets without implementation are left out
+    assert [a.asset_type for a in REGISTRY.dataset_tile_caches("glad", "v2")] == [
+        RASTER,
+        RASTER,
+    ]
+
+
+def test_latest_date():
+    # First tile cache type wins
+    assert REGISTRY.latest_date("glad") == "2021-02-02"
+    assert REGISTRY.latest_date("glad", "v1") == "2021-01-01"
+    assert REGISTRY.latest_date("wdpa") is None
+    assert REGISTRY.latest_date("fails") is None
+
+
+class Loader:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_refresher_loads_on_first_access():
+    load = Loader([asset(STATIC, "wdpa", "v1", "default", True)])
+    refresher = RegistryRefresher(load)
+
+    assert refresher.get().datasets(STATIC) == ("wdpa",)
+    assert refresher.get().datasets(STATIC) == ("wdpa",)
+    assert load.calls == 1
+
+
+def test_refresher_loads_coverages():
+    load = Loader([asset(DYNAMIC, "glad", "v2", None, True)])
+    refresher = RegistryRefresher(
+        load, load_coverages=lambda: {("glad", "v2"): {0: b"\x01"}}
+    )
+
+    assert refresher.get().coverage("glad", "v2") == {0: b"\x01"}
+    assert refresher.get().coverage("glad", "v1") is None
+
+
+def test_refresher_reloads_expired_snapshot_without_background_task():
+    load = Loader([], [asset(STATIC, "wdpa", "v1", "default", True)])
+    refresher = RegistryRefresher(load, interval=0)
+
+    assert refresher.get().datasets(STATIC) == ()
+    assert refresher.get().datasets(STATIC) == ("wdpa",)
+
+
+@pytest.mark.asyncio
+async def test_refresher_keeps_snapshot_on_error():
+    load = Loader(
+        [asset(STATIC, "wdpa", "v1", "default", True)],
+        RuntimeError("connection refused"),
+        [],
+    )
+    refresher = RegistryRefresher(load, interval=60)
+    await refresher.start()
+    try:
+        assert refresher.running
+        assert not await refresher.refresh()
+        assert refresher.get().datasets(STATIC) == ("wdpa",)
+
+        assert await refresher.refresh()
+        assert refresher.get().datasets(STATIC) == ()
+        assert load.calls == 3
+    finally:
+        await refresher.close()
+    assert not refresher.running
+
+
+@pytest.mark.asyncio
+async def test_refresher_refreshes_in_background():
+    load = Loader([], [asset(STATIC, "wdpa", "v1", "default", True)], [])
+    refresher = RegistryRefresher(load, interval=0.01, jitter=0.5)
+    await refresher.start()
+    try:
+        for _ in range(100):
+            if load.calls > 1:
+                break
+            await asyncio.sleep(0.01)
+        # Served from snapshot, not reloaded on access
+        assert refresher.get() is refresher.get()
+        assert load.calls > 1
+    finally:
+        await refresher.close()
+
+
+@pytest.mark.asyncio
+async def test_refresher_starts_from_snapshot(tmp_path):
+    snapshot_path = str(tmp_path / "registry.json")
+    load = Loader(
+        [asset(STATIC, "wdpa", "v1", "default", True)],
+        [asset(STATIC, "wdpa", "v2", "default", True)],
+    )
+    refresher = RegistryRefresher(load, interval=60, snapshot_path=snapshot_path)
+    await refresher.start()
+    await refresher.close()
+    assert load.calls == 1
+
+    # Next worker serves the snapshot, database is queried in the background
+    slow_load = Loader(RuntimeError("database is slow"))
+    refresher = RegistryRefresher(slow_load, interval=60, snapshot_path=snapshot_path)
+    await refresher.start()
+    try:
+        assert refresher.get().versions("wdpa", STATIC) == ("v1",)
+        assert refresher.age < 60
+    finally:
+        await refresher.close()
+
+
+@pytest.mark.asyncio
+async def test_refresher_ignores_broken_snapshot(tmp_path):
+    snapshot_path = tmp_path / "registry.json"
+    snapshot_path.write_text("[{")
+    load = Loader([asset(STATIC, "wdpa", "v1", "default", True)])
+    refresher = RegistryRefresher(load, snapshot_path=str(snapshot_path))
+    await refresher.start()
+    await refresher.close()
+
+    assert load.calls == 1
+    assert refresher.get().datasets(STATIC) == ("wdpa",)
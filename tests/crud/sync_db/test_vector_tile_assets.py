@@ -112,4 +112,4 @@ def test_get_dataset_tile_caches():
     )
 
     assert len(tile_caches) == 2
-    assert tile_caches[0]["asset_uri"] == "my_uri7"
+    assert tile_caches[0].asset_uri == "my_uri7"
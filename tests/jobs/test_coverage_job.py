@@ -0,0 +1,33 @@
+import asyncpg
+import pytest
+
+from app.jobs.coverage import build_coverage
+from app.settings.globals import GLOBALS
+
+
+@pytest.mark.asyncio
+async def test_build_coverage(connect_db):
+    schema, version = "umd_modis_burned_areas", "v202003"
+
+    conn = await asyncpg.connect(str(GLOBALS.database_config.url))
+    try:
+        # Small polygon in the north-eastern quadrant of the world
+        await conn.execute(
+            f"""INSERT INTO {schema}.{version} (alert__date, gfw_area__ha, geom_wm)
+                VALUES ('2020-01-01', 1,
+                    ST_Buffer(ST_SetSRID(ST_MakePoint(1000000, 1000000), 3857), 10))"""
+        )
+        coverage = await build_coverage(conn, schema, version, 4)
+
+        assert coverage.covers(0, 0, 0)
+        assert coverage.covers(1, 0, 1)
+        assert not coverage.covers(0, 0, 1)
+        assert coverage.covers(8, 7, 4)
+        assert not coverage.covers(7, 7, 4)
+
+        rows = await conn.fetch(f'SELECT zoom FROM {schema}."v202003__coverage"')
+        assert sorted(row["zoom"] for row in rows) == [0, 1, 2, 3, 4]
+    finally:
+        await conn.execute(f'DROP TABLE IF EXISTS {schema}."v202003__coverage"')
+        await conn.execute(f"DELETE FROM {schema}.{version}")
+        await conn.close()
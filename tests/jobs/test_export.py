@@ -0,0 +1,72 @@
+import pytest
+
+from app.jobs.export import parse_args
+
+
+def test_parse_args_format_from_extension():
+    args = parse_args(
+        [
+            "dataset",
+            "v1",
+            "out.pmtiles",
+            "--bbox",
+            "0",
+            "0",
+            "1",
+            "1",
+            "--max-zoom",
+            "4",
+        ]
+    )
+    assert args.format == "pmtiles"
+    assert args.tile_type == "vector"
+
+    args = parse_args(
+        [
+            "dataset",
+            "v1",
+            "out.mbtiles",
+            "--bbox",
+            "0",
+            "0",
+            "1",
+            "1",
+            "--max-zoom",
+            "4",
+        ]
+    )
+    assert args.format == "mbtiles"
+
+
+def test_parse_args_requires_dates():
+    with pytest.raises(SystemExit):
+        parse_args(
+            [
+                "nasa_viirs_fire_alerts",
+                "v1",
+                "out.pmtiles",
+                "--bbox",
+                "0",
+                "0",
+                "1",
+                "1",
+                "--max-zoom",
+                "4",
+            ]
+        )
+
+    with pytest.raises(SystemExit):
+        parse_args(
+            [
+                "dataset",
+                "v1",
+                "out.zip",
+                "--bbox",
+                "0",
+                "0",
+                "1",
+                "1",
+                "--max-zoom",
+                "4",
+            ]
+        )
@@ -0,0 +1,64 @@
+import mercantile
+import pytest
+
+from app.jobs import Checkpoint, run_tile_jobs, tile_pyramid
+
+
+def test_tile_pyramid():
+    tiles = list(tile_pyramid((-180, -85, 180, 85), 0, 2))
+    assert len(tiles) == 1 + 4 + 16
+
+
+def test_tile_pyramid_geometry():
+    # Small square in the north-western quadrant of the world
+    geometry = {
+        "type": "Polygon",
+        "coordinates": [[[-100, 40], [-99, 40], [-99, 41], [-100, 41], [-100, 40]]],
+    }
+    tiles = list(tile_pyramid((-180, -85, 180, 85), 0, 1, geometry))
+    assert tiles == [mercantile.Tile(0, 0, 0), mercantile.Tile(0, 0, 1)]
+
+
+def test_checkpoint_advances_in_order(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path, save_every=1)
+
+    checkpoint.done(1)
+    assert checkpoint.position == 0
+    checkpoint.done(0)
+    assert checkpoint.position == 2
+
+    assert Checkpoint(path).position == 2
+
+
+@pytest.mark.asyncio
+async def test_run_tile_jobs_resumes(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    tiles = list(tile_pyramid((-180, -85, 180, 85), 0, 2))
+    processed = list()
+
+    async def job(tile):
+        if tile.z == 2 and not processed_once:
+            raise RuntimeError("Render failed")
+        processed.append(tile)
+        return "rendered"
+
+    processed_once = False
+    progress = await run_tile_jobs(
+        tiles, job, concurrency=1, checkpoint=Checkpoint(path)
+    )
+    assert progress.counts == {"rendered": 5, "failed": 16}
+
+    # Failed jobs are retried on resume
+    processed_once = True
+    progress = await run_tile_jobs(
+        tiles, job, concurrency=1, checkpoint=Checkpoint(path)
+    )
+    assert progress.counts == {"rendered": 16}
+    assert processed[5:] == tiles[5:]
+
+    # All tiles were processed
+    progress = await run_tile_jobs(
+        tiles, job, concurrency=1, checkpoint=Checkpoint(path)
+    )
+    assert progress.processed == 0
@@ -0,0 +1,57 @@
+import asyncpg
+import pytest
+
+from app.crud.async_db.vector_tiles.overviews import (
+    Overview,
+    get_source_table,
+    table_exists,
+    tile_zoom,
+)
+from app.jobs.overviews import build_overview, overview_select
+from app.settings.globals import GLOBALS
+
+
+def test_tile_zoom():
+    assert tile_zoom((-20037508.34, -20037508.34, 20037508.34, 20037508.34)) == 0
+    assert tile_zoom((0, 0, 20037508.34 / 2**4, 20037508.34 / 2**4)) == 5
+
+
+def test_overview_select():
+    overview = Overview(0, 5, simplify=2, min_size=1)
+    sql = overview_select("my_schema", "v1", ["alert__date", "geom_wm"], overview)
+
+    assert sql.startswith(
+        'SELECT "alert__date", ST_SimplifyPreserveTopology(geom_wm, '
+        f"{overview.tile_unit() * 2}) AS geom_wm"
+    )
+    assert 'FROM "my_schema"."v1"' in sql
+
+
+@pytest.mark.asyncio
+async def test_build_overview(connect_db):
+    schema, version = "umd_modis_burned_areas", "v202003"
+    overview = Overview(0, 5)
+
+    conn = await asyncpg.connect(str(GLOBALS.database_config.url))
+    try:
+        await conn.execute(
+            f"""INSERT INTO {schema}.{version} (alert__date, gfw_area__ha, geom_wm)
+                VALUES ('2020-01-01', 1,
+                    ST_Buffer(ST_SetSRID(ST_MakePoint(0, 0), 3857), 100000)),
+                       ('2020-01-01', 1,
+                    ST_Buffer(ST_SetSRID(ST_MakePoint(0, 0), 3857), 1))"""
+        )
+        await build_overview(conn, schema, version, overview)
+
+        # Feature smaller than a tile unit at zoom 5 is dropped
+        count = await conn.fetchval(f'SELECT count(*) FROM {schema}."v202003__z0_5"')
+        assert count == 1
+
+        table_exists.cache_clear()
+        assert await get_source_table(schema, version, 3, [overview]) == "v202003__z0_5"
+        assert await get_source_table(schema, version, 6, [overview]) == version
+    finally:
+        await conn.execute(f'DROP TABLE IF EXISTS {schema}."v202003__z0_5"')
+        await conn.execute(f"DELETE FROM {schema}.{version}")
+        await conn.close()
+        table_exists.cache_clear()
@@ -0,0 +1,75 @@
+from datetime import date
+
+import mercantile
+import pytest
+
+from app.crud.async_db.vector_tiles import nasa_viirs_fire_alerts
+from app.crud.async_db.vector_tiles.nasa_viirs_fire_alerts import get_rollup_table
+from app.jobs.viirs_rollups import rollup_select
+
+
+def test_rollup_select():
+    sql = rollup_select("v1", 6)
+    assert sql.startswith("SELECT alert__date, confidence__cat, ST_SnapToGrid(geom_wm")
+    assert 'sum("frp__MW") AS "frp__MW"' in sql
+    assert "GROUP BY 1, 2, 3" in sql
+    assert "$1" not in sql
+
+    assert "WHERE alert__date >= $1" in rollup_select("v1", 6, since=True)
+
+
+@pytest.mark.asyncio
+async def test_get_rollup_table(monkeypatch):
+    existing = {"v1__daily_z4", "v1__daily_z6"}
+
+    async def table_exists(schema_name, table_name):
+        return table_name in existing
+
+    async def get_rollup_max_date(table_name):
+        return date(2021, 3, 2)
+
+    monkeypatch.setattr(nasa_viirs_fire_alerts, "table_exists", table_exists)
+    monkeypatch.setattr(
+        nasa_viirs_fire_alerts, "get_rollup_max_date", get_rollup_max_date
+    )
+    monkeypatch.setattr(
+        nasa_viirs_fire_alerts,
+        "get_latest_date",
+        lambda dataset, version=None: "2021-03-02",
+    )
+
+    def bbox(z):
+        return tuple(mercantile.xy_bounds(0, 0, z))
+
+    assert await get_rollup_table("v1", bbox(1), 4096) == "v1__daily_z4"
+    assert await get_rollup_table("v1", bbox(3), 4096) == "v1__daily_z4"
+    assert await get_rollup_table("v1", bbox(5), 4096) == "v1__daily_z6"
+    assert await get_rollup_table("v1", bbox(6), 8192) is None
+    assert await get_rollup_table("v1", bbox(7), 4096) is None
+
+
+@pytest.mark.asyncio
+async def test_get_rollup_table_outdated(monkeypatch):
+    async def table_exists(schema_name, table_name):
+        return True
+
+    async def get_rollup_max_date(table_name):
+        return date(2021, 3, 2)
+
+    monkeypatch.setattr(nasa_viirs_fire_alerts, "table_exists", table_exists)
+    monkeypatch.setattr(
+        nasa_viirs_fire_alerts, "get_rollup_max_date", get_rollup_max_date
+    )
+    monkeypatch.setattr(
+        nasa_viirs_fire_alerts,
+        "get_latest_date",
+        lambda dataset, version=None: "2021-03-03",
+    )
+    bbox = tuple(mercantile.xy_bounds(0, 0, 1))
+
+    assert await get_rollup_table("v1", bbox, 4096, "2021-03-01") == "v1__daily_z2"
+    assert await get_rollup_table("v1", bbox, 4096, "2021-03-02") == "v1__daily_z2"
+    # Rollup job has not caught up with latest alerts yet
+    assert await get_rollup_table("v1", bbox, 4096, "2021-03-03") is None
+    assert await get_rollup_table("v1", bbox, 4096, "2022-01-01") is None
+    assert await get_rollup_table("v1", bbox, 4096) is None
@@ -0,0 +1,33 @@
+import pytest
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.enumerators import versions
+from app.models.enumerators.lazy import LazyEnum
+from app.models.enumerators.tile_caches import TileCacheType
+from app.models.enumerators.versions import get_versions_enum
+
+
+def test_versions_follow_registry(monkeypatch):
+    registered = ["v1"]
+    monkeypatch.setattr(versions, "get_versions", lambda dataset, _: list(registered))
+    adapter = TypeAdapter(
+        get_versions_enum("umd_tree_cover_loss", TileCacheType.raster_tile_cache)
+    )
+
+    assert adapter.validate_python("latest") == "latest"
+    assert adapter.validate_python("v1") == "v1"
+    with pytest.raises(ValidationError, match="Input should be 'latest', 'v1'"):
+        adapter.validate_python("v2")
+
+    # New versions are accepted without redeclaring the type
+    registered.append("v2")
+    assert adapter.validate_python("v2") == "v2"
+    assert adapter.json_schema()["enum"] == ["latest", "v1", "v2"]
+
+
+def test_no_values():
+    adapter = TypeAdapter(LazyEnum)
+
+    with pytest.raises(ValidationError):
+        adapter.validate_python("v1")
+    assert adapter.json_schema()["enum"] == []
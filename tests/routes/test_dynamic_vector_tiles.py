@@ -21,3 +21,89 @@ def test_umd_modis_burned_areas(z, x, y, client):
         assert (
             response.status_code == 200
         ), f"Bad response for request {response.request.url}: {response.json()}"
+
+
+def test_dynamic_vector_tile_cache(client):
+    """Second request for the same tile is served from the in-process tile
+    cache."""
+    from app.cache import tile_cache
+
+    tile_cache.purge()
+    params = {
+        "start_date": "2019-01-01",
+        "end_date": "2019-06-01",
+        "force_date_range": True,
+    }
+    url = "/umd_modis_burned_areas/v202003/dynamic/2/3/3.pbf"
+
+    first = client.get(url, params=params)
+    hits = tile_cache.stats()["hits"]
+    second = client.get(url, params=params)
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content
+    assert second.headers["Cache-Control"] == "max-age=31536000"
+    assert tile_cache.stats()["hits"] == hits + 1
+
+
+def test_dynamic_vector_tile_conditional_get(client):
+    """Tiles carry an ETag and matching conditional requests are answered
+    with 304 and without body."""
+    params = {
+        "start_date": "2019-01-01",
+        "end_date": "2019-06-01",
+        "force_date_range": True,
+    }
+    url = "/umd_modis_burned_areas/v202003/dynamic/8/10/10.pbf"
+
+    response = client.get(url, params=params)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(url, params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "max-age=31536000"
+    assert response.content == b""
+
+    params["end_date"] = "2019-06-02"
+    response = client.get(url, params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_dynamic_vector_tile_content_encoding(client):
+    """Cached tiles are served in the encoding accepted by the client, with
+    an ETag per encoding."""
+    params = {
+        "start_date": "2019-01-01",
+        "end_date": "2019-06-01",
+        "force_date_range": True,
+    }
+    url = "/umd_modis_burned_areas/v202003/dynamic/2/3/3.pbf"
+
+    identity = client.get(url, params=params, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(url, params=params, headers={"Accept-Encoding": "gzip"})
+
+    assert identity.status_code == gzipped.status_code == 200
+    assert "content-encoding" not in identity.headers
+    assert identity.content == gzipped.content
+    if gzipped.headers.get("content-encoding") == "gzip":
+        assert gzipped.headers["Vary"] == "Accept-Encoding"
+        assert gzipped.headers["ETag"] != identity.headers["ETag"]
+
+    response = client.get(
+        url,
+        params=params,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": identity.headers["ETag"]},
+    )
+    assert response.status_code == 304
+
+
+def test_dynamic_vector_tile_batch_dedicated_dataset(client):
+    """Datasets with their own tile routes can't be requested in batches."""
+    response = client.get(
+        "/umd_modis_burned_areas/v202003/dynamic/tiles",
+        params=[("tile", "2/3/3"), ("tile", "8/10/10")],
+    )
+    assert response.status_code == 400
@@ -0,0 +1,54 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app import middleware
+from app.middleware import tile_digest
+from app.utils.compression import MIN_SIZE
+
+DATASET = "nasa_viirs_fire_alerts"
+PATH = f"/{DATASET}/v1/dynamic/2/3/3.pbf"
+
+
+def test_tile_digest_follows_default_window(monkeypatch):
+    """Tiles of an older version with default date window change when the
+    latest version advances."""
+    default_end = ["2021-03-01"]
+    monkeypatch.setattr(
+        middleware, "get_latest_date", lambda dataset, version=None: "2021-03-01"
+    )
+    monkeypatch.setattr(middleware, "default_end", lambda dataset: default_end[0])
+
+    explicit = [("start_date", "2021-02-01"), ("end_date", "2021-02-08")]
+    default_window = tile_digest(DATASET, "v1", PATH, [])
+    explicit_window = tile_digest(DATASET, "v1", PATH, explicit)
+
+    default_end[0] = "2021-03-02"
+
+    assert tile_digest(DATASET, "v1", PATH, []) != default_window
+    assert tile_digest(DATASET, "v1", PATH, [("end_date", "")]) != default_window
+    assert tile_digest(DATASET, "v1", PATH, explicit) == explicit_window
+
+
+def test_compressed_response_varies_by_accept_encoding():
+    app = FastAPI()
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("tile")
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse("tile" * MIN_SIZE)
+
+    app.add_middleware(BaseHTTPMiddleware, dispatch=middleware.compressed_response)
+    client = TestClient(app)
+
+    for path in ("/small", "/large"):
+        for accept_encoding in ("identity", "gzip"):
+            response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+            assert response.headers["Vary"] == "Accept-Encoding"
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.notifications import NotificationListener
+
+
+class FakeConnection:
+    def __init__(self):
+        self.listeners = dict()
+        self.termination_listeners = list()
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def send(self, channel, payload=""):
+        self.listeners[channel](self, 1234, channel, payload)
+
+    def terminate(self):
+        self.closed = True
+        for callback in self.termination_listeners:
+            callback(self)
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+async def _until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("Condition not met")
+
+
+def _listener(connections, calls):
+    async def connect():
+        result = connections.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def callback():
+        calls.append(True)
+
+    return NotificationListener(
+        "tile_cache_assets", callback, connect, debounce=0.01, reconnect_interval=0
+    )
+
+
+@pytest.mark.asyncio
+async def test_notifications_are_coalesced():
+    connection = FakeConnection()
+    calls = list()
+    listener = _listener([connection], calls)
+    await listener.start()
+    try:
+        await _until(lambda: "tile_cache_assets" in connection.listeners)
+        for _ in range(5):
+            connection.send("tile_cache_assets", "assets")
+        await _until(lambda: calls)
+        await asyncio.sleep(0.05)
+        assert len(calls) == 1
+    finally:
+        await listener.close()
+    assert connection.closed
+
+
+@pytest.mark.asyncio
+async def test_reconnect_catches_up():
+    first, second = FakeConnection(), FakeConnection()
+    calls = list()
+    listener = _listener([ConnectionRefusedError(), first, second], calls)
+    await listener.start()
+    try:
+        await _until(lambda: "tile_cache_assets" in first.listeners)
+        # Notifications may have been missed while connecting again
+        await _until(lambda: calls)
+        calls.clear()
+
+        first.terminate()
+        await _until(lambda: "tile_cache_assets" in second.listeners)
+        await _until(lambda: calls)
+    finally:
+        await listener.close()
@@ -0,0 +1,29 @@
+from app.responses import MultipartResponse
+
+
+def test_multipart_response():
+    response = MultipartResponse(
+        [
+            ({"Content-Location": "/a/v1/dynamic/0/0/0.pbf"}, b"tile"),
+            ({"Content-Location": "/a/v1/dynamic/1/0/0.pbf"}, b""),
+        ]
+    )
+    boundary = response.boundary
+
+    assert response.media_type == f"multipart/mixed; boundary={boundary}"
+    assert (
+        response.body
+        == (
+            f"--{boundary}\r\n"
+            "Content-Location: /a/v1/dynamic/0/0/0.pbf\r\n"
+            "Content-Length: 4\r\n"
+            "\r\n"
+            "tile\r\n"
+            f"--{boundary}\r\n"
+            "Content-Location: /a/v1/dynamic/1/0/0.pbf\r\n"
+            "Content-Length: 0\r\n"
+            "\r\n"
+            "\r\n"
+            f"--{boundary}--\r\n"
+        ).encode()
+    )
@@ -0,0 +1,53 @@
+"""Worker startup benchmark.
+
+Imports the app and runs its startup in a fresh interpreter, like a
+booting worker. Run with `-s` to print timings.
+"""
+
+import json
+import subprocess
+import sys
+
+BENCHMARK = """
+import json
+import time
+
+from app.crud.sync_db.tile_cache_assets import registry_refresher
+
+loads = []
+load = registry_refresher.load
+registry_refresher.load = lambda: loads.append(None) or load()
+
+start = time.monotonic()
+from app.main import app
+imported = time.monotonic()
+loads_on_import = len(loads)
+
+from fastapi.testclient import TestClient
+
+with TestClient(app):
+    started = time.monotonic()
+    print(json.dumps({
+        "import": imported - start,
+        "startup": started - imported,
+        "loads_on_import": loads_on_import,
+        "loads_on_startup": len(loads) - loads_on_import,
+    }))
+"""
+
+
+def test_startup():
+    output = subprocess.run(
+        [sys.executable, "-c", BENCHMARK],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(
+        f"\nImport: {result['import']:.2f}s, startup: {result['startup']:.2f}s",
+    )
+
+    # Tile cache assets are only loaded once, in the startup phase
+    assert result["loads_on_import"] == 0
+    assert result["loads_on_startup"] == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from app.errors import ArchiveNotFoundError
+from app.tile_archives import TileArchives
+from app.utils.pmtiles import COMPRESSION_NONE, TILE_TYPE_PNG, PMTilesWriter
+
+
+@pytest.mark.asyncio
+async def test_tile_archives_local_files(tmp_path):
+    path = tmp_path / "dataset" / "v1" / "default.pmtiles"
+    path.parent.mkdir(parents=True)
+    with PMTilesWriter(str(path), TILE_TYPE_PNG, COMPRESSION_NONE, {}) as writer:
+        writer.write(0, 0, 0, b"png")
+
+    archives = TileArchives(
+        str(tmp_path / "{dataset}/{version}/{implementation}.pmtiles")
+    )
+    archive = await archives.open("dataset", "v1", "default")
+    assert await archive.get_tile(0, 0, 0) == b"png"
+    assert await archives.open("dataset", "v1", "default") is archive
+
+    with pytest.raises(ArchiveNotFoundError):
+        await archives.open("dataset", "v2", "default")
+    # Missing archives are remembered
+    (tmp_path / "dataset" / "v2").mkdir()
+    path.rename(tmp_path / "dataset" / "v2" / "default.pmtiles")
+    with pytest.raises(ArchiveNotFoundError):
+        await archives.open("dataset", "v2", "default")
+
+
+@pytest.mark.asyncio
+async def test_tile_archives_file_url(tmp_path):
+    path = tmp_path / "default.pmtiles"
+    with PMTilesWriter(str(path), TILE_TYPE_PNG, COMPRESSION_NONE, {}) as writer:
+        writer.write(1, 1, 0, b"png")
+
+    archives = TileArchives(f"file://{tmp_path}/{{implementation}}.pmtiles")
+    archive = await archives.open("dataset", "v1", "default")
+    assert await archive.get_tile(1, 1, 0) == b"png"
+    assert await archive.get_tile(1, 0, 0) is None
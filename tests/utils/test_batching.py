@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.utils.batching import MicroBatcher
+
+
+class Runs:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = list()
+
+    async def __call__(self, key, items):
+        self.batches.append((key, list(items)))
+        if self.fail:
+            raise ValueError(key)
+        return [f"{key}:{item}" for item in items]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_collects_items_by_key():
+    runs = Runs()
+    batcher = MicroBatcher(runs, window=0.01, max_size=10)
+
+    results = await asyncio.gather(
+        batcher.submit("a", 1), batcher.submit("b", 2), batcher.submit("a", 3)
+    )
+
+    assert results == ["a:1", "b:2", "a:3"]
+    assert sorted(runs.batches) == [("a", [1]), ("a", [3]), ("b", [2])]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_holds_calls_while_running():
+    runs = Runs()
+    batcher = MicroBatcher(runs, window=60, max_size=10)
+
+    # Lone calls are not held back
+    assert await asyncio.wait_for(batcher.submit("a", 0), timeout=1) == "a:0"
+
+    # Calls arriving while a batch is running are run together when it
+    # finishes
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit("a", i) for i in range(1, 4))), timeout=1
+    )
+
+    assert results == ["a:1", "a:2", "a:3"]
+    assert runs.batches == [("a", [0]), ("a", [1]), ("a", [2, 3])]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_runs_full_batches_immediately():
+    runs = Runs()
+    batcher = MicroBatcher(runs, window=60, max_size=2)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit("a", i) for i in range(4))), timeout=1
+    )
+
+    assert results == ["a:0", "a:1", "a:2", "a:3"]
+    assert runs.batches == [("a", [0]), ("a", [1, 2]), ("a", [3])]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_passes_errors_to_all_callers():
+    batcher = MicroBatcher(Runs(fail=True), window=0.01, max_size=10)
+
+    results = await asyncio.gather(
+        batcher.submit("a", 1), batcher.submit("a", 2), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_micro_batcher_enabled():
+    assert MicroBatcher(Runs()).enabled
+    assert not MicroBatcher(Runs(), window=0).enabled
+    assert not MicroBatcher(Runs(), max_size=1).enabled
@@ -0,0 +1,62 @@
+import gzip
+import os
+
+import pytest
+
+from app.utils.compression import (
+    ENCODINGS,
+    MIN_SIZE,
+    encode_all,
+    is_compressible,
+    negotiate,
+)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("", None),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip;q=0, br;q=0", None),
+        ("*", "br"),
+        ("*, br;q=0", "gzip"),
+        ("identity", None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, ("br", "gzip")) == expected
+
+
+def test_negotiate_only_available_encodings():
+    assert negotiate("br", ("gzip",)) is None
+    assert negotiate("br, gzip", {"gzip": b""}) == "gzip"
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [
+        ("application/x-protobuf", True),
+        ("application/json; charset=utf-8", True),
+        ("image/png", False),
+        ("image/jpeg", False),
+        (None, False),
+    ],
+)
+def test_is_compressible(content_type, expected):
+    assert is_compressible(content_type) == expected
+
+
+def test_encode_all():
+    body = b"tile" * MIN_SIZE
+    encoded = encode_all(body)
+
+    assert tuple(encoded) == ENCODINGS
+    assert gzip.decompress(encoded["gzip"]) == body
+    assert all(len(data) < len(body) for data in encoded.values())
+
+    # Small or incompressible bodies are served as is
+    assert encode_all(b"tile") == {}
+    assert encode_all(os.urandom(MIN_SIZE)) == {}
@@ -0,0 +1,24 @@
+import sqlite3
+
+from app.utils.mbtiles import MBTilesWriter
+
+
+def test_mbtiles_writer(tmp_path):
+    path = str(tmp_path / "tiles.mbtiles")
+    with MBTilesWriter(path, {"name": "test", "format": "pbf"}) as writer:
+        assert writer.write(1, 0, 0, b"land")
+        assert writer.write(1, 1, 0, b"ocean")
+        assert not writer.write(1, 0, 1, b"land")
+
+    db = sqlite3.connect(path)
+    tiles = db.execute(
+        "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles "
+        "ORDER BY tile_column, tile_row"
+    ).fetchall()
+    # Rows count from the south
+    assert tiles == [(1, 0, 0, b"land"), (1, 0, 1, b"land"), (1, 1, 1, b"ocean")]
+    assert db.execute("SELECT count(*) FROM images").fetchone() == (2,)
+    assert dict(db.execute("SELECT name, value FROM metadata")) == {
+        "name": "test",
+        "format": "pbf",
+    }
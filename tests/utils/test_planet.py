@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.utils.planet import PlanetProxy, tile_key
+
+MOSAIC = "planet_medres_normalized_analytic_2024-01_mosaic"
+
+
+class Planet:
+    """Fake Planet tile service."""
+
+    def __init__(self, status_code: int = 200, delay: float = 0):
+        self.status_code = status_code
+        self.delay = delay
+        self.requests = list()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        return httpx.Response(
+            self.status_code,
+            headers={"Content-Type": "image/png"},
+            content=f"{request.url.path} {request.url.params['proc']}".encode(),
+        )
+
+
+class TileCache:
+    def __init__(self, *keys):
+        self.tiles = {key: b"" for key in keys}
+
+    async def write_back(self, key, data):
+        self.tiles[key] = data
+        return True
+
+    async def exists(self, key):
+        return key in self.tiles
+
+
+def _proxy(planet: Planet, tile_cache: TileCache) -> PlanetProxy:
+    proxy = PlanetProxy(
+        "api_key",
+        tile_cache.write_back,
+        tile_cache.exists,
+        tile_cache_url="https://tiles.example.com",
+    )
+    proxy._client = httpx.AsyncClient(transport=httpx.MockTransport(planet))
+    return proxy
+
+
+async def _body(response) -> bytes:
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+
+@pytest.mark.asyncio
+async def test_planet_proxy_streams_and_writes_back():
+    planet, tile_cache = Planet(), TileCache()
+    proxy = _proxy(planet, tile_cache)
+
+    response = await proxy.tile_response(MOSAIC, "rgb", 3, 2, 1)
+    body = await _body(response)
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "max-age=31536000"
+    assert body == f"/basemaps/v1/planet-tiles/{MOSAIC}/gmap/3/2/1.png rgb".encode()
+    assert planet.requests[0].url.params["api_key"] == "api_key"
+    assert tile_cache.tiles[tile_key(MOSAIC, "rgb", 3, 2, 1)] == body
+
+    # Next request is redirected to the tile cache
+    response = await proxy.tile_response(MOSAIC, "rgb", 3, 2, 1)
+    assert response.status_code == 307
+    assert response.headers["Location"] == (
+        f"https://tiles.example.com/planet/{MOSAIC}/rgb/3/2/1.png"
+    )
+    assert len(planet.requests) == 1
+
+    # Other image modes are other tiles
+    response = await proxy.tile_response(MOSAIC, "cir", 3, 2, 1)
+    assert response.status_code == 200
+    await proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_planet_proxy_coalesces_requests():
+    planet, tile_cache = Planet(delay=0.02), TileCache()
+    proxy = _proxy(planet, tile_cache)
+
+    async def fetch():
+        response = await proxy.tile_response(MOSAIC, "rgb", 3, 2, 1)
+        return await _body(response)
+
+    bodies = await asyncio.gather(*[fetch() for _ in range(5)])
+
+    assert len(planet.requests) == 1
+    assert len(set(bodies)) == 1
+    await proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_planet_proxy_passes_errors_through():
+    planet, tile_cache = Planet(status_code=404), TileCache()
+    proxy = _proxy(planet, tile_cache)
+
+    response = await proxy.tile_response(MOSAIC, "rgb", 3, 2, 1)
+
+    assert response.status_code == 404
+    assert "Cache-Control" not in response.headers
+    assert not tile_cache.tiles
+    await proxy.close()
+
+
+@pytest.mark.asyncio
+async def test_planet_proxy_upstream_unavailable():
+    def unavailable(request):
+        raise httpx.ConnectError("Connection refused")
+
+    proxy = PlanetProxy("api_key", TileCache().write_back, TileCache().exists)
+    proxy._client = httpx.AsyncClient(transport=httpx.MockTransport(unavailable))
+
+    with pytest.raises(HTTPException) as e:
+        await proxy.tile_response(MOSAIC, "rgb", 3, 2, 1)
+    assert e.value.status_code == 502
+    assert not proxy._inflight
+    await proxy.close()
@@ -0,0 +1,118 @@
+import gzip
+import random
+
+import pytest
+from cachetools import LRUCache
+
+from app.utils import pmtiles
+from app.utils.pmtiles import (
+    COMPRESSION_GZIP,
+    HEADER_SIZE,
+    TILE_TYPE_MVT,
+    Entry,
+    Header,
+    PMTilesReader,
+    PMTilesWriter,
+    build_directories,
+    zxy_to_tile_id,
+)
+
+
+def test_zxy_to_tile_id():
+    assert zxy_to_tile_id(0, 0, 0) == 0
+    assert [zxy_to_tile_id(1, x, y) for x, y in [(0, 0), (0, 1), (1, 1), (1, 0)]] == [
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert zxy_to_tile_id(2, 0, 0) == 5
+    assert zxy_to_tile_id(12, 3423, 1763) == 19078479
+
+
+def test_build_directories_splits_large_directories():
+    rng = random.Random(0)
+    tile_ids = sorted(rng.sample(range(10_000_000), 100_000))
+    entries = [
+        Entry(tile_id, rng.randrange(10**9), rng.randrange(10**5), 1)
+        for tile_id in tile_ids
+    ]
+    root, leaves = build_directories(entries)
+    assert len(root) <= 16384 - HEADER_SIZE
+    assert leaves
+
+    small = entries[:10]
+    root, leaves = build_directories(small)
+    assert leaves == b""
+
+
+def test_pmtiles_writer(tmp_path):
+    path = str(tmp_path / "tiles.pmtiles")
+    with PMTilesWriter(
+        path, TILE_TYPE_MVT, COMPRESSION_GZIP, {"name": "test"}, bounds=(0, 0, 10, 10)
+    ) as writer:
+        assert writer.write(1, 1, 0, b"ocean")
+        assert writer.write(1, 0, 0, b"land")
+        # Consecutive tiles with the same data share one entry
+        assert not writer.write(1, 0, 1, b"land")
+
+    with open(path, "rb") as f:
+        data = f.read()
+    header = Header.unpack(data)
+    assert header.addressed_tiles == 3
+    assert header.tile_entries == 2
+    assert header.tile_contents == 2
+    assert (header.min_zoom, header.max_zoom) == (1, 1)
+    assert header.bounds == (0, 0, 10, 10)
+    assert header.center == (5, 5)
+    assert header.data_offset + header.data_length == len(data)
+    assert data[header.data_offset :] == b"oceanland"
+
+    metadata = data[
+        header.metadata_offset : header.metadata_offset + header.metadata_length
+    ]
+    assert gzip.decompress(metadata) == b'{"name": "test"}'
+
+
+def _file_reader(path):
+    async def read(offset, length):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    return read
+
+
+@pytest.mark.asyncio
+async def test_pmtiles_reader(tmp_path):
+    path = str(tmp_path / "tiles.pmtiles")
+    with PMTilesWriter(path, TILE_TYPE_MVT, COMPRESSION_GZIP, {}) as writer:
+        for x in range(8):
+            for y in range(8):
+                writer.write(3, x, y, b"empty" if x < 4 else f"{x}/{y}".encode())
+
+    reader = PMTilesReader(path, _file_reader(path), LRUCache(maxsize=8))
+    header = await reader.header()
+    assert header.tile_type == TILE_TYPE_MVT
+    assert await reader.get_tile(3, 1, 1) == b"empty"
+    assert await reader.get_tile(3, 5, 6) == b"5/6"
+    assert await reader.get_tile(2, 0, 0) is None
+
+
+@pytest.mark.asyncio
+async def test_pmtiles_reader_leaf_directories(tmp_path, monkeypatch):
+    monkeypatch.setattr(pmtiles, "MAX_ROOT_SIZE", 64)
+    monkeypatch.setattr(pmtiles, "LEAF_SIZE", 16)
+    path = str(tmp_path / "tiles.pmtiles")
+    with PMTilesWriter(path, TILE_TYPE_MVT, COMPRESSION_GZIP, {}) as writer:
+        for x in range(16):
+            for y in range(16):
+                writer.write(4, x, y, f"{x}/{y}".encode())
+
+    directories = LRUCache(maxsize=64)
+    reader = PMTilesReader(path, _file_reader(path), directories)
+    header = await reader.header()
+    assert header.leaf_length > 0
+    assert await reader.get_tile(4, 15, 3) == b"15/3"
+    assert await reader.get_tile(4, 0, 0) == b"0/0"
+    assert len(directories) == 2
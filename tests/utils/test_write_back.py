@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import pytest
+
+from app.utils.metrics import metrics
+from app.utils.write_back import WriteBackQueue
+
+
+class Uploads:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.keys = list()
+
+    async def __call__(self, data, key):
+        await asyncio.sleep(self.delay)
+        self.keys.append(key)
+
+
+@pytest.mark.asyncio
+async def test_write_back_queue_flushes_on_close():
+    uploads = Uploads()
+    queue = WriteBackQueue(uploads, maxsize=10, workers=2)
+    await queue.start()
+
+    for i in range(5):
+        assert await queue.enqueue(f"dataset/v1/default/0/0/{i}.png", b"tile")
+
+    await queue.close()
+
+    assert sorted(uploads.keys) == [f"dataset/v1/default/0/0/{i}.png" for i in range(5)]
+    assert queue.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_write_back_queue_deduplicates_keys():
+    uploads = Uploads(delay=0.01)
+    queue = WriteBackQueue(uploads, maxsize=10, workers=1)
+    await queue.start()
+
+    for _ in range(3):
+        await queue.enqueue("dataset/v1/default/0/0/0.png", b"tile")
+
+    await queue.close()
+
+    assert uploads.keys == ["dataset/v1/default/0/0/0.png"]
+
+
+@pytest.mark.asyncio
+async def test_write_back_queue_drops_when_full():
+    metrics.reset()
+    uploads = Uploads(delay=0.01)
+    queue = WriteBackQueue(uploads, maxsize=1, workers=1)
+    await queue.start()
+
+    assert await queue.enqueue("dataset/v1/default/0/0/0.png", b"tile")
+    assert not await queue.enqueue("dataset/v1/default/0/0/1.png", b"tile")
+
+    await queue.close()
+
+    assert uploads.keys == ["dataset/v1/default/0/0/0.png"]
+    assert metrics.snapshot()["counters"]["write_back.dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_back_queue_spills_to_disk(tmp_path):
+    uploads = Uploads(delay=0.01)
+    queue = WriteBackQueue(uploads, maxsize=1, workers=1, spill_dir=str(tmp_path))
+    await queue.start()
+
+    await queue.enqueue("dataset/v1/default/0/0/0.png", b"tile")
+    await queue.enqueue("dataset/v1/default/0/0/1.png", b"tile")
+    assert os.path.isfile(os.path.join(tmp_path, "dataset/v1/default/0/0/1.png"))
+
+    # Spilled tiles are picked up again once the queue has capacity
+    await asyncio.sleep(0.05)
+    await queue.close()
+
+    assert sorted(uploads.keys) == [
+        "dataset/v1/default/0/0/0.png",
+        "dataset/v1/default/0/0/1.png",
+    ]
+    assert not os.path.exists(os.path.join(tmp_path, "dataset/v1/default/0/0/1.png"))